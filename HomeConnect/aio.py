@@ -0,0 +1,26 @@
+"""
+Helpers for async views.
+
+``login_required_async`` resolves the user with the async auth API and
+pins it on ``request.user`` so templates and context processors never
+trigger a synchronous query from the event loop.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+
+# Template rendering may follow lazy relations and form querysets, so it
+# runs on the thread that owns the request's connection
+arender = sync_to_async(render)
+
+
+def login_required_async(view):
+    @login_required
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view(request, *args, **kwargs)
+
+    return wrapper
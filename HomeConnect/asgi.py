@@ -14,3 +14,21 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HomeConnect.settings')
 
 application = get_asgi_application()
+
+# Compile every template now so no worker's first request pays for it
+from django.conf import settings  # noqa: E402
+
+if not settings.DEBUG:
+    from HomeConnect.templates_warmup import warm_templates
+
+    warm_templates()
+
+# One event loop serves the whole worker, so Daraja calls can share a pooled client
+from connectmpesa import daraja  # noqa: E402
+
+daraja.share_async_client()
+
+# Collected static files (precompressed, fingerprinted) are answered before Django
+from HomeConnect.static_serving import StaticFilesASGI  # noqa: E402
+
+application = StaticFilesASGI(application)
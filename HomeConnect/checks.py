@@ -0,0 +1,30 @@
+"""
+Project-wide system checks (registered from AccountsConfig.ready).
+"""
+from django.core.checks import Error, Tags, Warning, register
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+from .templates_warmup import warm_templates
+
+
+@register(Tags.templates)
+def check_templates_compile(app_configs, **kwargs):
+    return [
+        Error(f"Template {name} does not compile: {error}", id='HomeConnect.E001')
+        for name, error in warm_templates()
+    ]
+
+
+@register(Tags.templates)
+def check_cached_template_loader(app_configs, **kwargs):
+    engine = engines['django'].engine
+    return [
+        Warning(
+            f"Template loader {type(loader).__module__}.{type(loader).__name__} is not wrapped in "
+            "django.template.loaders.cached.Loader.",
+            hint="Without it every render recompiles its templates and warming them at boot has no effect.",
+            id='HomeConnect.W001',
+        )
+        for loader in engine.template_loaders if not isinstance(loader, CachedLoader)
+    ]
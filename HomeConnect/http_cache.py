@@ -0,0 +1,86 @@
+"""
+Conditional GET and Cache-Control for HTML pages built from a few rows.
+
+A view decorated with ``conditional_page(state)`` answers If-None-Match /
+If-Modified-Since with a 304 before it queries or renders anything; ``state``
+is a cheap function returning the page's (last modified, version) pair.
+
+Anonymous responses are the same for everybody, so a reverse proxy may keep
+them for PROVIDER_PAGE_CACHE_SECONDS.  Logged-in pages carry per-user
+navigation and stay private, revalidated through a per-user ETag.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def shared_max_age():
+    return getattr(settings, 'PROVIDER_PAGE_CACHE_SECONDS', 300)
+
+
+def page_etag(request, last_modified, version=''):
+    """ETag over the page URL, its data state and who is looking at it."""
+    viewer = request.user.pk if request.user.is_authenticated else 'anon'
+    stamp = last_modified.isoformat() if last_modified else ''
+    key = '|'.join([request.get_full_path(), stamp, str(version), str(viewer)])
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def conditional_page(state):
+    """
+    GET/HEAD are open to everyone and answered conditionally; any other
+    method still requires a login.  ``state(request, *args, **kwargs)``
+    returns ``(last_modified, version)`` and may raise Http404.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                if not request.user.is_authenticated:
+                    return redirect_to_login(request.get_full_path())
+                return view(request, *args, **kwargs)
+
+            # Flash messages make this one response unique; don't let it be reused
+            if len(get_messages(request)):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_store=True)
+                return response
+
+            anonymous = not request.user.is_authenticated
+            last_modified, version = state(request, *args, **kwargs)
+            etag = page_etag(request, last_modified, version)
+            # Only anonymous pages are identical across viewers, so only they
+            # may be revalidated by date alone
+            last_modified = last_modified if anonymous else None
+
+            response = get_conditional_response(
+                request,
+                etag=etag,
+                last_modified=int(last_modified.timestamp()) if last_modified else None,
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+            if anonymous:
+                patch_cache_control(response, public=True, max_age=0, s_maxage=shared_max_age())
+            else:
+                patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,100 @@
+"""
+Whole-page cache for anonymous visitors.
+
+Pages are stored per path, query string and language under a version
+number that ``invalidate_anonymous_pages()`` bumps when the data they show
+(the service catalog) changes, so no stale entry can be served afterwards.
+
+Logged-in users, requests carrying a session, and responses with pending
+flash messages always bypass the cache.  Forms on cached pages still get a
+fresh CSRF token: the page is rendered with a placeholder in its place, and
+the placeholder is swapped for the visitor's own token on every response.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import translation
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+CSRF_PLACEHOLDER = 'ANONPAGECSRFTOKENPLACEHOLDER'
+VERSION_KEY = 'anonpage:version'
+
+
+def page_cache_seconds():
+    return getattr(settings, 'ANONYMOUS_PAGE_CACHE_SECONDS', 600)
+
+
+def current_version():
+    return cache.get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_anonymous_pages():
+    """Orphan every cached anonymous page; they expire from the backend on their own."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+
+
+def page_key(request):
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'anonpage:{current_version()}:{translation.get_language()}:{digest}'
+
+
+def cacheable(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and not len(get_messages(request))
+    )
+
+
+def csrf_placeholder(request):
+    """Context processor: render a placeholder instead of a CSRF token while a cached page is being built."""
+    if getattr(request, '_anonymous_page_cache', False):
+        return {'csrf_token': CSRF_PLACEHOLDER}
+    return {}
+
+
+def finish(request, content, content_type):
+    if CSRF_PLACEHOLDER.encode() in content:
+        content = content.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+    response = HttpResponse(content, content_type=content_type)
+    # The body carries this visitor's CSRF token: browsers only, no shared caches
+    patch_cache_control(response, private=True, max_age=0)
+    patch_vary_headers(response, ['Cookie', 'Accept-Language'])
+    return response
+
+
+def anonymous_page_cache(view):
+    """Serve ``view`` from the anonymous page cache when the request allows it."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not cacheable(request):
+            return view(request, *args, **kwargs)
+
+        key = page_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            return finish(request, *cached)
+
+        request._anonymous_page_cache = True
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            request._anonymous_page_cache = False
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return response
+
+        content, content_type = response.content, response['Content-Type']
+        cache.set(key, (content, content_type), page_cache_seconds())
+        return finish(request, content, content_type)
+
+    return wrapper
@@ -41,7 +41,8 @@ INSTALLED_APPS = [
     'services',
     'connectmpesa',
     'booking',
-    'cloudinary',
+    'notifications',
+    'api',
     'widget_tweaks',
     'django_daraja',
 ]
@@ -55,15 +56,22 @@ LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'services:dashboard'
 LOGOUT_REDIRECT_URL = 'accounts:login'
 
-# Cloudinary Configuration
-cloudinary_config = {
-    'cloud_name': config('CLOUDINARY_CLOUD_NAME'),
-    'api_key': config('CLOUDINARY_API_KEY'),
-    'api_secret': config('CLOUDINARY_API_SECRET'),
-}
-import cloudinary
-if cloudinary_config['cloud_name']:
-    cloudinary.config(**cloudinary_config)
+# How long a slot stays reserved while a homeowner fills in the booking form
+BOOKING_HOLD_MINUTES = config('BOOKING_HOLD_MINUTES', default=10, cast=int)
+
+# Reminders sent by `manage.py run_reminders`
+REMINDER_BOOKING_LEAD_MINUTES = config('REMINDER_BOOKING_LEAD_MINUTES', default=60, cast=int)
+REMINDER_REQUEST_PENDING_HOURS = config('REMINDER_REQUEST_PENDING_HOURS', default=24, cast=int)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='HomeConnect <noreply@homeconnect.local>')
+
+# Seconds a provider ranking snapshot is reused before being rebuilt (services.matching)
+MATCHING_SNAPSHOT_TTL = config('MATCHING_SNAPSHOT_TTL', default=300, cast=int)
+# How many providers a broadcast request is offered to at once (services.dispatch)
+DISPATCH_BROADCAST_SIZE = config('DISPATCH_BROADCAST_SIZE', default=5, cast=int)
+# Seconds a shared cache may keep anonymous provider pages (HomeConnect.http_cache)
+PROVIDER_PAGE_CACHE_SECONDS = config('PROVIDER_PAGE_CACHE_SECONDS', default=300, cast=int)
+# Seconds rendered home/login/register pages are reused for anonymous visitors (HomeConnect.page_cache)
+ANONYMOUS_PAGE_CACHE_SECONDS = config('ANONYMOUS_PAGE_CACHE_SECONDS', default=600, cast=int)
 
 # Middleware
 MIDDLEWARE = [
@@ -83,12 +91,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept per process; outside DEBUG every
+            # worker compiles them all at boot (HomeConnect.templates_warmup).
+            # Under runserver the autoreloader clears this cache on edits.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'HomeConnect.page_cache.csrf_placeholder',
             ],
         },
     },
@@ -104,6 +121,19 @@ DATABASES = {
     }
 }
 
+# Cache
+# Set REDIS_URL when running more than one process so cached pages are
+# shared and invalidated everywhere; the in-process default suits one worker.
+REDIS_URL = config('REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -130,6 +160,15 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# Outside DEBUG, collectstatic writes fingerprinted names plus .gz/.br variants
+# that HomeConnect.static_serving sends with far-future caching
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'HomeConnect.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -144,8 +183,13 @@ MPESA_CONSUMER_KEY = config('MPESA_CONSUMER_KEY', default='')
 MPESA_CONSUMER_SECRET = config('MPESA_CONSUMER_SECRET', default='')
 MPESA_SHORTCODE = config('MPESA_SHORTCODE', default='174379')
 MPESA_PASSKEY = config('MPESA_PASSKEY', default='')
+# Set to http://127.0.0.1:8001 to use `manage.py daraja_simulator` instead of Safaricom
 MPESA_BASE_URL = config('MPESA_BASE_URL', default='https://sandbox.safaricom.co.ke')
 MPESA_CALLBACK_URL = config('MPESA_CALLBACK_URL', default='/mpesa/callback/')
 
+# Callback payloads older than this are moved out of the DB by `archive_mpesa_payloads`
+MPESA_ARCHIVE_ROOT = config('MPESA_ARCHIVE_ROOT', default=str(BASE_DIR / 'archive' / 'mpesa'))
+MPESA_ARCHIVE_AFTER_DAYS = config('MPESA_ARCHIVE_AFTER_DAYS', default=90, cast=int)
+
 # NGROK (for testing / tunneling)
 NGROK_URL = config('NGROK_URL', default='http://localhost:8000')
\ No newline at end of file
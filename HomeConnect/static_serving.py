@@ -0,0 +1,170 @@
+"""
+Serve collected static files in front of Django, under WSGI or ASGI.
+
+At startup STATIC_ROOT is indexed once.  A request under STATIC_URL is then
+answered straight from that index without touching Django: the brotli or
+gzip variant written by HomeConnect.storage is sent when the client's
+Accept-Encoding allows it.  Fingerprinted names (the values of
+staticfiles.json) never change content, so they are cached for a year
+with ``immutable``; anything else gets a short max-age.
+
+Paths missing from the index fall through to the wrapped application.
+"""
+import asyncio
+import json
+import mimetypes
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.http import http_date
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+SHORT = 'public, max-age=60'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+CHUNK_SIZE = 64 * 1024
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        self.variants = {}
+        for encoding, suffix in (('identity', ''), *ENCODINGS):
+            candidate = Path(str(path) + suffix)
+            if candidate.is_file():
+                self.variants[encoding] = (candidate, candidate.stat().st_size)
+        stat = path.stat()
+        content_type, _ = mimetypes.guess_type(path.name)
+        if content_type is None:
+            content_type = 'application/octet-stream'
+        elif content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'):
+            content_type += '; charset=utf-8'
+        # Weak: the same validator covers every encoding of the file
+        self.etag = f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        self.base_headers = [
+            ('Content-Type', content_type),
+            ('Last-Modified', http_date(stat.st_mtime)),
+            ('ETag', self.etag),
+            ('Cache-Control', IMMUTABLE if immutable else SHORT),
+        ]
+        if len(self.variants) > 1:
+            self.base_headers.append(('Vary', 'Accept-Encoding'))
+
+    def choose(self, accept_encoding):
+        """(path, size, headers) of the best variant for ``accept_encoding``."""
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and encoding in accepted:
+                path, size = self.variants[encoding]
+                return path, size, self.base_headers + [('Content-Encoding', encoding), ('Content-Length', str(size))]
+        path, size = self.variants['identity']
+        return path, size, self.base_headers + [('Content-Length', str(size))]
+
+
+def parse_accept_encoding(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if coding and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.lower())
+    return accepted
+
+
+def build_index(root, prefix):
+    """Map every URL path under ``prefix`` to its StaticFile."""
+    root = Path(root)
+    if not root.is_dir():
+        return {}
+    manifest = root / 'staticfiles.json'
+    hashed = set()
+    if manifest.is_file():
+        hashed = set(json.loads(manifest.read_text()).get('paths', {}).values())
+
+    index = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(('.gz', '.br')) and (Path(dirpath) / filename[:-3]).is_file():
+                continue
+            path = Path(dirpath) / filename
+            name = path.relative_to(root).as_posix()
+            index[prefix + name] = StaticFile(path, immutable=name in hashed)
+    return index
+
+
+def static_prefix():
+    url = settings.STATIC_URL or ''
+    # Only a local path can be served here; a CDN STATIC_URL leaves the app alone
+    if not url.startswith('/') or url.startswith('//'):
+        return None
+    return url if url.endswith('/') else url + '/'
+
+
+def not_modified(static_file, if_none_match):
+    return bool(if_none_match) and static_file.etag in [t.strip() for t in if_none_match.split(',')]
+
+
+class StaticFilesWSGI:
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.prefix = prefix or static_prefix()
+        self.index = build_index(root or settings.STATIC_ROOT, self.prefix) if self.prefix else {}
+
+    def __call__(self, environ, start_response):
+        static_file = self.index.get(environ.get('PATH_INFO', ''))
+        if static_file is None or environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+
+        if not_modified(static_file, environ.get('HTTP_IF_NONE_MATCH', '')):
+            start_response('304 Not Modified', [h for h in static_file.base_headers if h[0] != 'Content-Type'])
+            return []
+        path, size, headers = static_file.choose(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        f = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(f, CHUNK_SIZE)
+        return iter_file(f)
+
+
+def iter_file(f):
+    with f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+class StaticFilesASGI:
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.prefix = prefix or static_prefix()
+        self.index = build_index(root or settings.STATIC_ROOT, self.prefix) if self.prefix else {}
+
+    async def __call__(self, scope, receive, send):
+        static_file = self.index.get(scope.get('path', '')) if scope['type'] == 'http' else None
+        if static_file is None or scope['method'] not in ('GET', 'HEAD'):
+            return await self.application(scope, receive, send)
+
+        request_headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+        if not_modified(static_file, request_headers.get('if-none-match', '')):
+            headers = [h for h in static_file.base_headers if h[0] != 'Content-Type']
+            await send({'type': 'http.response.start', 'status': 304, 'headers': encode_headers(headers)})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        path, size, headers = static_file.choose(request_headers.get('accept-encoding', ''))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': encode_headers(headers)})
+        if scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        with open(path, 'rb') as f:
+            while True:
+                # Disk reads go to a thread so the event loop keeps serving
+                chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                more = len(chunk) == CHUNK_SIZE
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+                if not more:
+                    break
+
+
+def encode_headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
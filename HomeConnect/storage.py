@@ -0,0 +1,50 @@
+"""
+Static files storage for production: hashed (fingerprinted) names plus
+gzip and brotli variants written next to each file at collectstatic time,
+so HomeConnect.static_serving never compresses on the request path.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always produced
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot')
+MIN_SIZE = 256
+
+
+def compress(data):
+    """Yield (suffix, bytes) for each encoding that actually shrinks ``data``."""
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, packed in variants:
+        if len(packed) < len(data):
+            yield suffix, packed
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        # Unhashed originals are compressed too: they stay reachable for
+        # anything that hardcodes a /static/ path
+        for name in list(paths) + list(self.hashed_files.values()):
+            self.write_compressed(name)
+
+    def write_compressed(self, name):
+        if not name.lower().endswith(COMPRESSIBLE) or not self.exists(name):
+            return
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < MIN_SIZE:
+            return
+        for suffix, packed in compress(data):
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(packed))
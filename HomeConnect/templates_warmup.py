@@ -0,0 +1,55 @@
+"""
+Compile every project template ahead of the first request.
+
+Django's cached loader keeps compiled templates per process, so each
+worker warms its own copy: wsgi.py and asgi.py call ``warm_templates()``
+on import, which happens in every worker after fork (or once before fork
+with a preloading server, where the workers then inherit the cache).
+``HomeConnect.checks`` uses the same pass to reject templates that don't
+compile.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+
+TEMPLATE_SUFFIXES = ('.html', '.txt')
+
+
+def project_template_dirs(engine):
+    """Template directories belonging to this project, not to installed packages."""
+    base_dir = Path(settings.BASE_DIR).resolve()
+    seen = []
+    for loader in engine.template_loaders:
+        for inner in getattr(loader, 'loaders', [loader]):
+            for directory in inner.get_dirs():
+                directory = Path(directory).resolve()
+                if directory.is_dir() and base_dir in directory.parents and directory not in seen:
+                    seen.append(directory)
+    return seen
+
+
+def project_template_names(engine):
+    names = []
+    for directory in project_template_dirs(engine):
+        for path in sorted(directory.rglob('*')):
+            if path.suffix in TEMPLATE_SUFFIXES and path.is_file():
+                name = path.relative_to(directory).as_posix()
+                if name not in names:
+                    names.append(name)
+    return names
+
+
+def warm_templates(using='django'):
+    """
+    Load (and so compile and cache) every project template.  Returns a list
+    of (name, error) pairs for templates that failed to compile.
+    """
+    engine = engines[using].engine
+    errors = []
+    for name in project_template_names(engine):
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError as e:
+            errors.append((name, e))
+    return errors
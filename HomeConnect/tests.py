@@ -0,0 +1,210 @@
+import asyncio
+import gzip
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import add_message, INFO
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from services.models import Service
+from .checks import check_cached_template_loader, check_templates_compile
+from .page_cache import CSRF_PLACEHOLDER, anonymous_page_cache
+from .static_serving import IMMUTABLE, SHORT, StaticFilesASGI, StaticFilesWSGI
+from .templates_warmup import project_template_names, warm_templates
+
+BOOTSTRAP_CSS = 'vendor/bootstrap/css/bootstrap.min.css'
+
+
+class CollectedStaticTests(SimpleTestCase):
+    """collectstatic with the production storage, then serving the result."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.root)
+        cls.settings = override_settings(
+            STATIC_ROOT=cls.root,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={**settings.STORAGES, 'staticfiles': {
+                'BACKEND': 'HomeConnect.storage.CompressedManifestStaticFilesStorage',
+            }},
+        )
+        cls.settings.enable()
+        cls.addClassCleanup(cls.settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.manifest = json.loads((Path(cls.root) / 'staticfiles.json').read_text())['paths']
+
+    def test_base_template_links_fingerprinted_vendor_files(self):
+        html = render_to_string('base.html')
+        self.assertNotIn('cdn.jsdelivr.net', html)
+        for name in (BOOTSTRAP_CSS, 'vendor/bootstrap/js/bootstrap.min.js', 'vendor/popper/popper.min.js'):
+            self.assertIn(staticfiles_storage.url(name), html)
+            self.assertNotEqual(self.manifest[name], name)
+
+    def test_hashed_files_have_compressed_variants(self):
+        hashed = Path(self.root) / self.manifest[BOOTSTRAP_CSS]
+        original = hashed.read_bytes()
+        self.assertEqual(gzip.decompress((Path(str(hashed) + '.gz')).read_bytes()), original)
+        # The source map comment points at the fingerprinted map
+        self.assertIn(Path(self.manifest[BOOTSTRAP_CSS + '.map']).name.encode(), original)
+
+    def wsgi(self, path, **headers):
+        fallthrough = []
+
+        def app(environ, start_response):
+            fallthrough.append(environ['PATH_INFO'])
+            start_response('404 Not Found', [])
+            return [b'']
+
+        response = {}
+
+        def start_response(status, response_headers):
+            response.update(status=status, headers=dict(response_headers))
+
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, **headers}
+        body = b''.join(StaticFilesWSGI(app, root=self.root, prefix='/static/')(environ, start_response))
+        return response['status'], response['headers'], body, fallthrough
+
+    def test_wsgi_serves_precompressed_hashed_file(self):
+        path = '/static/' + self.manifest[BOOTSTRAP_CSS]
+        original = (Path(self.root) / self.manifest[BOOTSTRAP_CSS]).read_bytes()
+
+        status, headers, body, _ = self.wsgi(path, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE)
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(body), original)
+
+        status, headers, body, _ = self.wsgi(path)
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(body, original)
+
+        status, _, body, _ = self.wsgi(path, HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+
+    def test_wsgi_unhashed_names_get_short_caching_and_misses_fall_through(self):
+        _, headers, _, _ = self.wsgi('/static/' + BOOTSTRAP_CSS)
+        self.assertEqual(headers['Cache-Control'], SHORT)
+
+        status, _, _, fallthrough = self.wsgi('/static/vendor/missing.css')
+        self.assertEqual((status, fallthrough), ('404 Not Found', ['/static/vendor/missing.css']))
+
+    def test_asgi_serves_precompressed_hashed_file(self):
+        async def app(scope, receive, send):
+            raise AssertionError("static file fell through to Django")
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/static/' + self.manifest[BOOTSTRAP_CSS],
+                 'headers': [(b'accept-encoding', b'br;q=0, gzip')]}
+        asyncio.run(StaticFilesASGI(app, root=self.root, prefix='/static/')(scope, None, send))
+
+        start, *chunks = sent
+        headers = dict(start['headers'])
+        self.assertEqual(start['status'], 200)
+        self.assertEqual(headers[b'content-encoding'], b'gzip')
+        self.assertEqual(headers[b'cache-control'], IMMUTABLE.encode())
+        body = b''.join(chunk['body'] for chunk in chunks)
+        self.assertFalse(chunks[-1].get('more_body'))
+        self.assertEqual(gzip.decompress(body), (Path(self.root) / self.manifest[BOOTSTRAP_CSS]).read_bytes())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.renders = 0
+
+        @anonymous_page_cache
+        def page(request):
+            self.renders += 1
+            return HttpResponse(engines['django'].from_string('<form>{% csrf_token %}</form>').render(request=request))
+
+        self.page = page
+
+    def get(self, **cookies):
+        request = RequestFactory().get('/page/')
+        request.COOKIES.update(cookies)
+        request.user = AnonymousUser()
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return request
+
+    def test_anonymous_page_is_rendered_once_with_a_fresh_token_each_time(self):
+        first, second = self.get(), self.get()
+        first_body = self.page(first).content.decode()
+        second_body = self.page(second).content.decode()
+        self.assertEqual(self.renders, 1)
+        for request, body in ((first, first_body), (second, second_body)):
+            self.assertNotIn(CSRF_PLACEHOLDER, body)
+            # Each visitor gets a token of their own, set as their CSRF cookie
+            self.assertTrue(request.META['CSRF_COOKIE_NEEDS_UPDATE'])
+        self.assertNotEqual(first_body, second_body)
+        self.assertNotEqual(first.META['CSRF_COOKIE'], second.META['CSRF_COOKIE'])
+
+    def test_sessions_and_messages_bypass_the_cache(self):
+        self.page(self.get(**{settings.SESSION_COOKIE_NAME: 'abc'}))
+        request = self.get()
+        add_message(request, INFO, "Hello")
+        self.page(request)
+        self.assertEqual(self.renders, 2)
+        self.page(self.get())
+        self.page(self.get())
+        self.assertEqual(self.renders, 3)
+
+    def test_catalog_changes_invalidate_once_committed(self):
+        self.assertNotContains(self.client.get('/accounts/register/'), 'Roofing')
+        with self.captureOnCommitCallbacks() as callbacks:
+            Service.objects.create(name='Roofing')
+        # Not committed yet: the cached page still stands
+        self.assertNotContains(self.client.get('/accounts/register/'), 'Roofing')
+        for callback in callbacks:
+            callback()
+        self.assertContains(self.client.get('/accounts/register/'), 'Roofing')
+
+
+class TemplateWarmupTests(SimpleTestCase):
+    def test_every_project_template_is_compiled_and_cached(self):
+        engine = engines['django'].engine
+        engine.template_loaders[0].reset()
+        names = project_template_names(engine)
+        self.assertIn('base.html', names)
+        self.assertIn('services/providers_list.html', names)
+
+        self.assertEqual(warm_templates(), [])
+        cached = engine.template_loaders[0].get_template_cache
+        self.assertEqual(set(names) - set(cached), set())
+        self.assertEqual(check_templates_compile(None), [])
+
+    def test_broken_template_fails_the_check(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        (root / 'templates').mkdir()
+        (root / 'templates' / 'broken.html').write_text('{% if %}')
+        templates = [{**settings.TEMPLATES[0], 'DIRS': [root / 'templates']}]
+        with override_settings(BASE_DIR=root, TEMPLATES=templates):
+            self.assertEqual([error.id for error in check_templates_compile(None)], ['HomeConnect.E001'])
+
+    def test_uncached_loader_is_flagged(self):
+        self.assertEqual(check_cached_template_loader(None), [])
+        templates = [{**settings.TEMPLATES[0], 'OPTIONS': {
+            **settings.TEMPLATES[0]['OPTIONS'], 'loaders': ['django.template.loaders.filesystem.Loader'],
+        }}]
+        with override_settings(TEMPLATES=templates):
+            self.assertEqual([warning.id for warning in check_cached_template_loader(None)], ['HomeConnect.W001'])
@@ -29,6 +29,7 @@ urlpatterns = [
     path('services/', include('services.urls')),
     path('connectmpesa/', include('connectmpesa.urls')),
     path('booking/', include('booking.urls')),
+    path('api/v1/', include('api.urls')),
         # Redirect root URL to services dashboard for now
     path('', RedirectView.as_view(pattern_name='services:dashboard', permanent=False)),
     # 'services' app URL include removed because the app isn't present in the project.
@@ -14,3 +14,16 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HomeConnect.settings')
 
 application = get_wsgi_application()
+
+# Compile every template now so no worker's first request pays for it
+from django.conf import settings  # noqa: E402
+
+if not settings.DEBUG:
+    from HomeConnect.templates_warmup import warm_templates
+
+    warm_templates()
+
+# Collected static files (precompressed, fingerprinted) are answered before Django
+from HomeConnect.static_serving import StaticFilesWSGI  # noqa: E402
+
+application = StaticFilesWSGI(application)
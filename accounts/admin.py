@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
+
+from HomeConnect.admin_utils import LargeTableAdmin
 from .models import User, Service, ServiceProvider, Profile
 
 
@@ -21,12 +23,14 @@ class ProfileInline(admin.StackedInline):
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(UserAdmin, LargeTableAdmin):
     inlines = [ProfileInline]
 
     list_display = ('username', 'email', 'user_type', 'city', 'is_staff', 'date_joined', 'display_services')
     list_filter = ('user_type', 'city', 'is_staff', 'is_superuser', 'is_active')
-    search_fields = ('username', 'email', 'first_name', 'last_name', 'profile__bio')
+    # Prefix/exact lookups only, so every search can use an index
+    search_fields = ('^username', '=email')
+    date_hierarchy = 'date_joined'
 
     fieldsets = (
         ('Login Credentials', {'fields': ('username', 'password')}),
@@ -45,6 +49,10 @@ class CustomUserAdmin(UserAdmin):
 
     filter_horizontal = ('services', 'groups', 'user_permissions')
 
+    def get_queryset(self, request):
+        # One query for every row's services instead of one per row
+        return super().get_queryset(request).prefetch_related('services')
+
     def display_services(self, obj):
         services = obj.services.all()
         return ", ".join([s.name for s in services]) if services else "-"
@@ -58,16 +66,20 @@ class ServiceAdmin(admin.ModelAdmin):
 
 
 @admin.register(ServiceProvider)
-class ServiceProviderAdmin(admin.ModelAdmin):
+class ServiceProviderAdmin(LargeTableAdmin):
     list_display = ('user', 'company_name', 'experience_years')
-    search_fields = ('company_name', 'user__username')
+    search_fields = ('^company_name', '^user__username')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user', 'services')
 
 
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(LargeTableAdmin):
     list_display = ('user', 'profile_image_tag', 'location')
     search_fields = ('user__username', 'user__email','location')
     list_filter = ('location',)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
 
     readonly_fields = ('profile_image_tag',)
 
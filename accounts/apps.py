@@ -5,3 +5,6 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
     verbose_name = "User Accounts & Authentication"
+
+    def ready(self):
+        import HomeConnect.checks  # noqa: F401
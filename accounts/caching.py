@@ -0,0 +1,27 @@
+"""
+Cache validators for the public provider pages (see HomeConnect.http_cache).
+
+Both read ServiceProvider.updated_at, which the signals in accounts.models
+also bump when a provider's user or offered services change.  The directory
+also lists matching catalog services, so it reads their state as well.
+"""
+from django.db.models import Count, Max
+from django.http import Http404
+
+from services.models import Service as CatalogService
+from .models import ServiceProvider
+
+
+def provider_directory_state(request, *args, **kwargs):
+    # The counts catch deletions, which leave no newer timestamp behind
+    providers = ServiceProvider.objects.aggregate(newest=Max('updated_at'), count=Count('pk'))
+    catalog = CatalogService.objects.aggregate(newest=Max('updated_at'), count=Count('pk'))
+    stamps = [stamp for stamp in (providers['newest'], catalog['newest']) if stamp]
+    return max(stamps, default=None), f"{providers['count']}-{catalog['count']}"
+
+
+def provider_page_state(request, pk, **kwargs):
+    updated_at = ServiceProvider.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        raise Http404("No ServiceProvider matches the given query.")
+    return updated_at, ''
@@ -1,11 +1,14 @@
 from django import forms
-from django.contrib.auth.forms import AuthenticationForm, UserChangeForm
+from django.contrib.auth.forms import AuthenticationForm, PasswordResetForm, UserChangeForm
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
+from django.template.loader import render_to_string
 
 from .models import ServiceProvider, User,Profile
 from services.models import Service
+from notifications import outbox
+from notifications.models import Notification
 
 User = get_user_model()
 
@@ -208,6 +211,21 @@ class ServiceProviderUpdateForm(forms.ModelForm):
         }
 
 
+# ------------------------------------------------
+# PASSWORD RESET FORM
+# ------------------------------------------------
+class OutboxPasswordResetForm(PasswordResetForm):
+    """Queue the reset email in the notification outbox instead of sending it during the request."""
+
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = "".join(render_to_string(subject_template_name, context).splitlines())
+        body = render_to_string(email_template_name, context)
+        html_body = render_to_string(html_email_template_name, context) if html_email_template_name else ""
+        outbox.enqueue(context["user"], Notification.KIND_PASSWORD_RESET, subject, body,
+                       html_body=html_body, digestible=False)
+
+
 # ------------------------------------------------
 # GENERAL USER UPDATE FORM
 # ------------------------------------------------
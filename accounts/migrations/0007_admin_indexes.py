@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:27
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_profile_city_profile_phone'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('services', '0004_servicerequest_created_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='serviceprovider',
+            name='company_name',
+            field=models.CharField(blank=True, db_index=True, max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='accounts_user_email_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_joined'], name='accounts_user_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['city'], name='accounts_user_city_idx'),
+        ),
+    ]
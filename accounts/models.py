@@ -1,9 +1,10 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.dispatch import receiver
-from django.db.models.signals import post_save
-from cloudinary.models import CloudinaryField
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.utils import timezone
 
 
 # -------------------------------------------------------
@@ -23,6 +24,15 @@ class User(AbstractUser):
     city = models.CharField(max_length=100, blank=True, null=True)
 
     services = models.ManyToManyField('services.Service', blank=True, related_name='users')
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Admin: "=email" search (case-insensitive), date hierarchy and city filter
+            models.Index(Upper('email'), name='accounts_user_email_upper_idx'),
+            models.Index(fields=['date_joined'], name='accounts_user_joined_idx'),
+            models.Index(fields=['city'], name='accounts_user_city_idx'),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -72,7 +82,7 @@ class ServiceProvider(models.Model):
         related_name="provider_profile"
     )
 
-    company_name = models.CharField(max_length=150, blank=True)
+    company_name = models.CharField(max_length=150, blank=True, db_index=True)
     skills = models.TextField(blank=True)
     experience_years = models.PositiveIntegerField(default=0)
 
@@ -87,6 +97,18 @@ class ServiceProvider(models.Model):
         blank=True,
         related_name='providers'
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Review aggregates, kept current by services.reviews (rebuild_provider_ratings recomputes them)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            # Directory sorted by rating
+            models.Index(fields=["-rating_avg", "-rating_count"], name="accounts_provider_rating_idx"),
+        ]
 
     def __str__(self):
         return self.company_name or self.user.username
@@ -110,11 +132,41 @@ def create_user_related_profiles(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_user_related_profiles(sender, instance, **kwargs):
+def save_user_related_profiles(sender, instance, update_fields=None, **kwargs):
     """
     Save linked profiles whenever User is saved.
     """
+    # Logging in only stamps last_login; don't invalidate cached provider pages for it
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
     instance.profile.save()
 
     if instance.user_type == 'service_provider':
         instance.provider_profile.save()
+
+
+# -------------------------------------------------------
+# KEEP ServiceProvider.updated_at CURRENT
+# (drives Last-Modified/ETag on provider pages; user edits
+#  reach it through save_user_related_profiles above)
+# -------------------------------------------------------
+def touch_providers(providers):
+    providers.update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=ServiceProvider.services.through)
+def provider_services_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        touch_providers(ServiceProvider.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        touch_providers(instance.providers.all())
+    else:
+        touch_providers(ServiceProvider.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Service)
+@receiver(pre_delete, sender=Service)
+def offered_service_changed(sender, instance, **kwargs):
+    touch_providers(ServiceProvider.objects.filter(services=instance))
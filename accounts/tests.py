@@ -1,3 +1,87 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+from django.utils.http import http_date
+
+from services.models import Service
+from .models import User, Service as ProviderService
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Changelist pages must cost the same number of queries at any table size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        cls.service = Service.objects.create(name='Plumbing')
+        cls.offering = ProviderService.objects.create(name='Plumbing')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_users(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            homeowner = User.objects.create(username=f'home{i}', email=f'home{i}@example.com', city='Nairobi')
+            homeowner.services.add(self.service)
+            provider = User.objects.create(username=f'pro{i}', user_type='service_provider')
+            provider.provider_profile.services.add(self.offering)
+
+    def assertChangelistQueries(self, url, expected):
+        for rows in (2, 20):
+            self.add_users(rows)
+            with self.assertNumQueries(expected):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_user_changelist(self):
+        # session, user, count, page, prefetched services, date hierarchy (2), city filter
+        self.assertChangelistQueries('/admin/accounts/user/', 9)
+
+    def test_user_search(self):
+        self.assertChangelistQueries('/admin/accounts/user/?q=home1', 8)
+
+    def test_provider_changelist(self):
+        self.assertChangelistQueries('/admin/accounts/serviceprovider/', 5)
+
+
+class ConditionalProviderPageTests(TestCase):
+    def setUp(self):
+        self.provider = User.objects.create(username='pro', user_type='service_provider').provider_profile
+
+    def test_anonymous_pages_are_public_and_dated(self):
+        for url in ('/services/providers/', f'/services/providers/{self.provider.pk}/', '/accounts/providers/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('public', response['Cache-Control'])
+            self.assertIn('s-maxage', response['Cache-Control'])
+            self.assertIn('Last-Modified', response)
+
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_logged_in_pages_are_private_and_revalidated_by_etag_only(self):
+        anonymous_etag = self.client.get('/services/providers/')['ETag']
+        self.client.force_login(User.objects.create(username='viewer'))
+        response = self.client.get('/services/providers/')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotEqual(response['ETag'], anonymous_etag)
+
+        # A date alone can't validate a page that differs per viewer
+        tomorrow = http_date((timezone.now() + timedelta(days=1)).timestamp())
+        self.assertEqual(self.client.get('/services/providers/', HTTP_IF_MODIFIED_SINCE=tomorrow).status_code, 200)
+
+    def test_catalog_changes_invalidate_the_directory(self):
+        etag = self.client.get('/services/providers/')['ETag']
+        service = Service.objects.create(name='Plumbing')
+        self.assertEqual(self.client.get('/services/providers/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/services/providers/')['ETag']
+        Service.objects.filter(pk=service.pk).update(name='Pipes', updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.client.get('/services/providers/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
 
-# Create your tests here.
+    def test_missing_provider_is_404(self):
+        self.assertEqual(self.client.get('/services/providers/999/').status_code, 404)
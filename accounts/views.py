@@ -10,11 +10,17 @@ from django.db import transaction, IntegrityError # <-- transaction and Integrit
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.views import PasswordResetView, PasswordResetConfirmView
+from asgiref.sync import sync_to_async
 
-from services.models import ServiceRequest, Service
+from services.models import ServiceRequest, Service, RequestOffer
 from accounts.models import ServiceProvider, Profile # <-- Ensure Profile is imported
+from .caching import provider_directory_state, provider_page_state
+from HomeConnect.aio import arender, login_required_async
+from HomeConnect.http_cache import conditional_page
+from HomeConnect.page_cache import anonymous_page_cache
 from services.forms import ServiceRequestForm
 from .forms import (
+    OutboxPasswordResetForm,
     ProviderSkillsForm,
     UserRegistrationForm,
     UserLoginForm,
@@ -34,6 +40,7 @@ User = get_user_model()
 # -------------------------
 # HOME PAGE
 # -------------------------
+@anonymous_page_cache
 def home_view(request):
     return render(request, 'accounts/home_page.html')
 
@@ -41,6 +48,7 @@ def home_view(request):
 # -------------------------
 # AUTHENTICATION
 # -------------------------
+@anonymous_page_cache
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('accounts:redirect_after_login')
@@ -73,6 +81,7 @@ def logout_view(request):
     return redirect("accounts:login")
 
 
+@anonymous_page_cache
 def register_view(request):
     """
     HANDLED: Safely creates the User and the associated Profile or ServiceProvider 
@@ -146,22 +155,24 @@ def redirect_after_login(request):
 # -------------------------
 # DASHBOARDS
 # -------------------------
-@login_required
-def provider_dashboard(request):
+@login_required_async
+async def provider_dashboard(request):
     if request.user.user_type != "service_provider":
         return HttpResponseForbidden("Access denied.")
 
-    # Using request.user.provider_profile requires that the ServiceProvider model 
-    # has a related_name or the default related_name is used.
-    # Assuming 'provider_profile' is the correct reverse lookup name.
     try:
-        provider = request.user.provider_profile
+        provider = await ServiceProvider.objects.aget(user=request.user)
     except ServiceProvider.DoesNotExist:
         messages.warning(request, "Please complete your provider profile.")
         return redirect('accounts:provider_create') # Direct user to create their profile
 
-    requests_list = ServiceRequest.objects.filter(provider=provider).select_related('homeowner', 'service')
-    return render(request, "services/provider_dashboard.html", {"provider": provider, "requests": requests_list})
+    requests_list = await sync_to_async(list)(
+        ServiceRequest.objects.filter(provider=provider).select_related('homeowner', 'service')
+    )
+    offers = await sync_to_async(list)(
+        RequestOffer.objects.inbox(provider).select_related('service_request__homeowner', 'service_request__service')
+    )
+    return await arender(request, "services/provider_dashboard.html", {"provider": provider, "requests": requests_list, "offers": offers})
 
 
 @login_required
@@ -293,12 +304,12 @@ def provider_update_view(request):
 # -------------------------
 # SERVICE PROVIDER MANAGEMENT (CRUD)
 # -------------------------
-@login_required
+@conditional_page(provider_directory_state)
 def provider_list(request):
     """
-    List all service providers
+    List all service providers (public, HTTP-cacheable)
     """
-    providers = ServiceProvider.objects.all()
+    providers = ServiceProvider.objects.select_related('user').prefetch_related('services')
     return render(request, 'services/providers_list.html', {'providers': providers})
 
 
@@ -329,12 +340,12 @@ def provider_create(request):
     return render(request, 'services/provider_create.html', {'form': form})
 
 
-@login_required
+@conditional_page(provider_page_state)
 def provider_detail(request, pk):
     """
-    Show details of a specific service provider
+    Show details of a specific service provider (public, HTTP-cacheable)
     """
-    provider = get_object_or_404(ServiceProvider, pk=pk)
+    provider = get_object_or_404(ServiceProvider.objects.select_related('user'), pk=pk)
 
     # Homeowners can submit service requests from this page
     form = ServiceRequestForm(request.POST or None)
@@ -606,6 +617,7 @@ def provider_profile_view(request):
 # PASSWORD RESET
 # -------------------------
 class CustomPasswordResetView(PasswordResetView):
+    form_class = OutboxPasswordResetForm
     template_name = "accounts/password_reset.html"
     email_template_name = "accounts/password_reset_email.html"
     subject_template_name = "accounts/password_reset_subject.txt"
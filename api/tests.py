@@ -0,0 +1,74 @@
+from django.test import TestCase
+
+from accounts.models import User
+from services.models import Service, ServiceRequest
+from .utils import encode_cursor
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.homeowner = User.objects.create_user('homeowner')
+        self.other = User.objects.create_user('other')
+        provider_user = User.objects.create(username='pro', user_type='service_provider', city='Nairobi')
+        self.provider = provider_user.provider_profile
+        self.services = [Service.objects.create(name=f'Service {i}') for i in range(5)]
+        self.client.force_login(self.homeowner)
+
+    def request_for(self, homeowner, provider=None):
+        return ServiceRequest.objects.create(homeowner=homeowner, provider=provider, service=self.services[0])
+
+    def test_sparse_fields(self):
+        data = self.client.get('/api/v1/services/', {'fields': 'id,name'}).json()['data']
+        self.assertEqual(data[0], {'id': self.services[0].pk, 'name': 'Service 0'})
+
+        response = self.client.get('/api/v1/services/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+
+    def test_cursor_pages_round_trip(self):
+        seen = []
+        url, params = '/api/v1/services/', {'limit': 2, 'fields': 'id'}
+        while url:
+            payload = self.client.get(url, params).json()
+            seen.extend(row['id'] for row in payload['data'])
+            url, params = payload['next'], None
+        self.assertEqual(seen, [s.pk for s in self.services])
+
+        payload = self.client.get('/api/v1/services/', {'cursor': encode_cursor(self.services[3].pk)}).json()
+        self.assertEqual([row['id'] for row in payload['data']], [self.services[4].pk])
+        self.assertIsNone(payload['next'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-a-cursor', encode_cursor('abc'), 'e30'):
+            response = self.client.get('/api/v1/services/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': "Invalid cursor."})
+
+    def test_requests_are_scoped_to_the_caller(self):
+        mine = self.request_for(self.homeowner)
+        theirs = self.request_for(self.other)
+        assigned = self.request_for(self.other, provider=self.provider)
+
+        ids = [row['id'] for row in self.client.get('/api/v1/requests/').json()['data']]
+        self.assertEqual(ids, [mine.pk])
+        self.assertEqual(self.client.get(f'/api/v1/requests/{theirs.pk}/').status_code, 404)
+
+        self.client.force_login(self.provider.user)
+        ids = [row['id'] for row in self.client.get('/api/v1/requests/').json()['data']]
+        self.assertEqual(ids, [assigned.pk])
+
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/v1/requests/').status_code, 401)
+
+    def test_if_none_match_returns_304_until_rows_change(self):
+        request = self.request_for(self.homeowner)
+        for url in ('/api/v1/requests/', f'/api/v1/requests/{request.pk}/'):
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+
+        etag = self.client.get('/api/v1/requests/')['ETag']
+        request.description = "Changed"
+        request.save()
+        self.assertEqual(self.client.get('/api/v1/requests/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import views
+
+app_name = 'api'
+
+# Versioned by prefix (see HomeConnect/urls.py); breaking changes get a new module
+urlpatterns = [
+    path('services/', views.services_list, name='services'),
+    path('providers/', views.providers_list, name='providers'),
+    path('providers/<int:pk>/', views.provider_detail, name='provider_detail'),
+    path('requests/', views.requests_list, name='requests'),
+    path('requests/<int:pk>/', views.request_detail, name='request_detail'),
+]
@@ -0,0 +1,171 @@
+"""
+Plumbing shared by the API views: sparse fieldsets, cursor pagination and
+conditional GET.
+
+ETags are computed from a small aggregate over exactly the rows a response
+would contain (count, id sum, newest ``updated_at``), which the database
+answers from its indexes.  When the client's If-None-Match matches, the view
+returns 304 before fetching or serializing any rows.
+"""
+import base64
+import hashlib
+import json
+from functools import wraps
+
+from django.db.models import Count, Max, Sum
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+API_VERSION = 'v1'
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_view(view):
+    """Require a logged-in user (JSON 401 instead of a login redirect) and turn ApiError into JSON."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return error("Method not allowed.", status=405)
+        if not request.user.is_authenticated:
+            return error("Authentication required.", status=401)
+        try:
+            response = view(request, *args, **kwargs)
+        except ApiError as e:
+            return error(str(e), status=e.status)
+        except Http404:
+            return error("Not found.", status=404)
+        response['API-Version'] = API_VERSION
+        # Per-user data: caches may store it but must revalidate with the ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
+    return wrapper
+
+
+# -------------------------
+# SPARSE FIELDSETS
+# -------------------------
+class Resource:
+    """
+    How to serialize one model.  ``fields`` maps a public field name to a
+    getter; ``select`` and ``prefetch`` name the relations a field needs, so
+    only requested fields cost joins.
+    """
+
+    def __init__(self, fields, default, select=None, prefetch=None):
+        self.fields = fields
+        self.default = default
+        self.select = select or {}
+        self.prefetch = prefetch or {}
+
+    def requested(self, request):
+        raw = request.GET.get('fields')
+        if not raw:
+            return list(self.default)
+        names = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.fields)}.")
+        return names
+
+    def prepare(self, queryset, names):
+        select = sorted({path for name in names for path in self.select.get(name, ())})
+        prefetch = sorted({path for name in names for path in self.prefetch.get(name, ())})
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def serialize(self, obj, names):
+        return {name: self.fields[name](obj) for name in names}
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+# -------------------------
+# CURSOR PAGINATION
+# -------------------------
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(json.dumps({'after': pk}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))['after'])
+    except (ValueError, KeyError, TypeError):
+        raise ApiError("Invalid cursor.")
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError("limit must be a number.")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def page_queryset(request, queryset, descending=False):
+    """
+    The slice of ``queryset`` for this page, keyed on the primary key so
+    every page is an index range scan however deep the client has paged.
+    One extra row is included to tell whether there is a next page.
+    """
+    limit = page_limit(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        after = decode_cursor(cursor)
+        queryset = queryset.filter(pk__lt=after) if descending else queryset.filter(pk__gt=after)
+    return queryset.order_by('-pk' if descending else 'pk')[:limit + 1], limit
+
+
+def next_url(request, last_pk):
+    params = request.GET.copy()
+    params['cursor'] = encode_cursor(last_pk)
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+# -------------------------
+# CONDITIONAL GET
+# -------------------------
+def etag_for(request, *parts):
+    """Strong ETag over the API version, the full request path and ``parts``."""
+    key = '|'.join([API_VERSION, request.get_full_path(), *[str(p) for p in parts]])
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def queryset_etag(request, queryset):
+    """ETag for exactly the rows of ``queryset`` (which may be sliced)."""
+    state = queryset.aggregate(count=Count('pk'), ids=Sum('pk'), newest=Max('updated_at'))
+    return etag_for(request, state['count'], state['ids'], iso(state['newest']))
+
+
+def not_modified(request, etag):
+    """A 304 response if the client already has ``etag``, else None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def json_response(payload, etag):
+    response = JsonResponse(payload)
+    response['ETag'] = etag
+    return response
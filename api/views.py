@@ -0,0 +1,148 @@
+from django.db.models import Q
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from accounts.models import ServiceProvider
+from services.models import Service, ServiceRequest
+from .utils import (
+    ApiError, Resource, api_view, etag_for, iso, json_response, next_url,
+    not_modified, page_queryset, queryset_etag,
+)
+
+
+SERVICE = Resource(
+    fields={
+        'id': lambda s: s.pk,
+        'name': lambda s: s.name,
+        'description': lambda s: s.description,
+        'updated_at': lambda s: iso(s.updated_at),
+    },
+    default=('id', 'name', 'description'),
+)
+
+PROVIDER = Resource(
+    fields={
+        'id': lambda p: p.pk,
+        'name': lambda p: p.company_name or p.user.username,
+        'username': lambda p: p.user.username,
+        'city': lambda p: p.user.city,
+        'experience_years': lambda p: p.experience_years,
+        'skills': lambda p: p.skills,
+        'services': lambda p: [s.name for s in p.services.all()],
+        'rating': lambda p: round(p.rating_avg, 2) if p.rating_count else None,
+        'review_count': lambda p: p.rating_count,
+        'updated_at': lambda p: iso(p.updated_at),
+    },
+    default=('id', 'name', 'city', 'experience_years', 'services'),
+    select={'name': ['user'], 'username': ['user'], 'city': ['user']},
+    prefetch={'services': ['services']},
+)
+
+REQUEST = Resource(
+    fields={
+        'id': lambda r: r.pk,
+        'status': lambda r: r.status,
+        'service': lambda r: {'id': r.service_id, 'name': r.service.name},
+        'provider': lambda r: r.provider and {'id': r.provider_id, 'name': r.provider.company_name or r.provider.user.username},
+        'homeowner': lambda r: r.homeowner.username,
+        'description': lambda r: r.description,
+        'broadcast': lambda r: r.broadcast,
+        'created_at': lambda r: iso(r.created_at),
+        'updated_at': lambda r: iso(r.updated_at),
+    },
+    default=('id', 'status', 'service', 'provider', 'created_at', 'updated_at'),
+    select={'service': ['service'], 'provider': ['provider__user'], 'homeowner': ['homeowner']},
+)
+
+
+def list_response(request, resource, queryset, descending=False):
+    """Cursor-paginated list with an ETag over just this page's rows."""
+    names = resource.requested(request)
+    page, limit = page_queryset(request, queryset, descending=descending)
+
+    etag = queryset_etag(request, page)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    rows = list(resource.prepare(page, names))
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return json_response({
+        'data': [resource.serialize(obj, names) for obj in rows],
+        'next': next_url(request, rows[-1].pk) if more else None,
+    }, etag)
+
+
+def detail_response(request, resource, queryset, pk):
+    names = resource.requested(request)
+    # One indexed lookup of the row's timestamp decides between 304 and a full read
+    updated_at = queryset.filter(pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        raise Http404
+
+    etag = etag_for(request, pk, iso(updated_at))
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    obj = get_object_or_404(resource.prepare(queryset, names), pk=pk)
+    return json_response({'data': resource.serialize(obj, names)}, etag)
+
+
+# -------------------------
+# SERVICES
+# -------------------------
+@api_view
+def services_list(request):
+    """GET /api/v1/services/?fields=&cursor=&limit="""
+    return list_response(request, SERVICE, Service.objects.all())
+
+
+# -------------------------
+# PROVIDERS
+# -------------------------
+@api_view
+def providers_list(request):
+    """GET /api/v1/providers/?service=<id>&city=&fields=&cursor=&limit="""
+    providers = ServiceProvider.objects.all()
+    if request.GET.get('service'):
+        try:
+            service = Service.objects.get(pk=int(request.GET['service']))
+        except (ValueError, Service.DoesNotExist):
+            raise ApiError("Unknown service.")
+        # Providers list their offerings in the accounts catalogue; match by name
+        providers = providers.filter(services__name__iexact=service.name)
+    if request.GET.get('city'):
+        providers = providers.filter(user__city__iexact=request.GET['city'])
+    return list_response(request, PROVIDER, providers)
+
+
+@api_view
+def provider_detail(request, pk):
+    """GET /api/v1/providers/<id>/?fields="""
+    return detail_response(request, PROVIDER, ServiceProvider.objects.all(), pk)
+
+
+# -------------------------
+# THE CALLER'S REQUESTS
+# -------------------------
+def own_requests(user):
+    return ServiceRequest.objects.filter(Q(homeowner=user) | Q(provider__user=user))
+
+
+@api_view
+def requests_list(request):
+    """GET /api/v1/requests/?status=&fields=&cursor=&limit= (newest first)"""
+    requests_qs = own_requests(request.user)
+    if request.GET.get('status'):
+        if request.GET['status'] not in dict(ServiceRequest.STATUS_CHOICES):
+            raise ApiError("Unknown status.")
+        requests_qs = requests_qs.filter(status=request.GET['status'])
+    return list_response(request, REQUEST, requests_qs, descending=True)
+
+
+@api_view
+def request_detail(request, pk):
+    """GET /api/v1/requests/<id>/?fields="""
+    return detail_response(request, REQUEST, own_requests(request.user), pk)
@@ -1 +1,24 @@
 from django.contrib import admin
+from .models import Booking, BookingException, SlotHold
+
+
+class BookingExceptionInline(admin.TabularInline):
+    model = BookingException
+    extra = 0
+
+
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    list_display = ('id', 'homeowner', 'provider', 'service', 'scheduled_time', 'end_time', 'recurrence_frequency', 'status')
+    list_filter = ('status', 'recurrence_frequency', 'scheduled_time')
+    inlines = [BookingExceptionInline]
+    search_fields = ('homeowner__username', 'provider__company_name', 'service__name')
+    list_select_related = ('homeowner', 'provider__user', 'service')
+    autocomplete_fields = ('homeowner', 'provider', 'service')
+
+
+@admin.register(SlotHold)
+class SlotHoldAdmin(admin.ModelAdmin):
+    list_display = ('id', 'homeowner', 'provider', 'scheduled_time', 'end_time', 'expires_at', 'status')
+    list_filter = ('status',)
+    list_select_related = ('homeowner', 'provider__user')
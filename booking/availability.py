@@ -0,0 +1,86 @@
+"""
+Availability queries over a provider's calendar.
+
+Both helpers only read the bookings intersecting the requested window (see
+``BookingQuerySet.overlapping``), so their cost grows with the window, not
+with how many bookings the provider has accumulated.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Booking
+from .recurrence import provider_occurrences
+
+# Hours during which providers can be booked (local time)
+WORKDAY_START = time(8, 0)
+WORKDAY_END = time(18, 0)
+
+
+def busy_intervals(provider, start, end, exclude=None):
+    """
+    Sorted (start, end) intervals occupied in the window: one-off bookings
+    plus the window's slice of every recurring series.
+    """
+    singles = Booking.objects.in_window(provider, start, end)
+    if exclude is not None:
+        singles = singles.exclude(pk=exclude.pk)
+    busy = list(singles)
+    busy.extend((o.start, o.end) for o in provider_occurrences(provider, start, end, exclude=exclude))
+    busy.sort()
+    return busy
+
+
+def is_free(provider, start, end):
+    if Booking.objects.overlapping(provider, start, end).exists():
+        return False
+    return next(provider_occurrences(provider, start, end), None) is None
+
+
+def merge_intervals(intervals):
+    """Merge sorted (start, end) intervals that touch or overlap."""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def working_hours(start, end):
+    """Yield the (open, close) working-hour intervals inside [start, end)."""
+    tz = timezone.get_current_timezone()
+    day = timezone.localtime(start).date()
+    last_day = timezone.localtime(end).date()
+    while day <= last_day:
+        opens = timezone.make_aware(datetime.combine(day, WORKDAY_START), tz)
+        closes = timezone.make_aware(datetime.combine(day, WORKDAY_END), tz)
+        opens, closes = max(opens, start), min(closes, end)
+        if opens < closes:
+            yield opens, closes
+        day += timedelta(days=1)
+
+
+def free_slots(provider, start, end, min_length=timedelta(hours=1)):
+    """
+    Free (start, end) gaps of at least ``min_length`` in the provider's
+    working hours between ``start`` and ``end``.
+    """
+    busy = merge_intervals(busy_intervals(provider, start, end))
+    slots = []
+    i = 0
+    for opens, closes in working_hours(start, end):
+        cursor = opens
+        # Skip busy blocks that ended before this working period
+        while i < len(busy) and busy[i][1] <= opens:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < closes:
+            if busy[j][0] - cursor >= min_length:
+                slots.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if closes - cursor >= min_length:
+            slots.append((cursor, closes))
+    return slots
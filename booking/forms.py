@@ -1,15 +1,61 @@
+from datetime import timedelta
+
 from django import forms
 from .models import Booking
+from .availability import busy_intervals, merge_intervals
+from .recurrence import expand
 from django.utils import timezone
 
+# How far ahead a new recurring series is checked for clashes
+RECURRENCE_CHECK_HORIZON = timedelta(weeks=26)
+
 class BookingForm(forms.ModelForm):
     scheduled_time = forms.DateTimeField(widget=forms.DateTimeInput(attrs={'type':'datetime-local','class':'form-control'}))
+    end_time = forms.DateTimeField(widget=forms.DateTimeInput(attrs={'type':'datetime-local','class':'form-control'}))
 
     class Meta:
         model = Booking
-        fields = ('provider','service','scheduled_time','notes')
+        fields = ('provider','service','scheduled_time','end_time',
+                  'recurrence_frequency','recurrence_interval','recurrence_until','notes')
         widgets = {
+            'recurrence_frequency': forms.Select(attrs={'class':'form-control'}),
+            'recurrence_interval': forms.NumberInput(attrs={'class':'form-control','min':1}),
+            'recurrence_until': forms.DateTimeInput(attrs={'type':'datetime-local','class':'form-control'}),
             'notes': forms.Textarea(attrs={'class':'form-control','rows':4}),
             'service': forms.Select(attrs={'class':'form-control'}),
             'provider': forms.Select(attrs={'class':'form-control'}),
         }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('scheduled_time')
+        end = cleaned_data.get('end_time')
+        provider = cleaned_data.get('provider')
+
+        if start and start < timezone.now():
+            self.add_error('scheduled_time', "Bookings must be in the future.")
+        if provider and start and end and end > start:
+            if cleaned_data.get('recurrence_frequency'):
+                self._check_series(provider, start, end)
+            elif Booking.objects.overlapping(provider, start, end).exists():
+                raise forms.ValidationError("The provider is already booked during that time.")
+        return cleaned_data
+
+    def _check_series(self, provider, start, end):
+        """Check the series' occurrences over the horizon against the calendar."""
+        horizon = start + RECURRENCE_CHECK_HORIZON
+        candidate = Booking(
+            scheduled_time=start, end_time=end,
+            recurrence_frequency=self.cleaned_data['recurrence_frequency'],
+            recurrence_interval=self.cleaned_data.get('recurrence_interval') or 1,
+            recurrence_until=self.cleaned_data.get('recurrence_until'),
+        )
+        busy = merge_intervals(busy_intervals(provider, start, horizon))
+        i = 0
+        for occ in expand(candidate, start, horizon, exceptions={}):
+            while i < len(busy) and busy[i][1] <= occ.start:
+                i += 1
+            if i < len(busy) and busy[i][0] < occ.end:
+                raise forms.ValidationError(
+                    f"The provider is already booked on {timezone.localtime(occ.start):%a %d %b %H:%M}."
+                )
@@ -0,0 +1,153 @@
+"""
+Expiring slot holds.
+
+A hold claims every SLOT_GRANULARITY-sized granule its interval touches by
+inserting SlotClaim rows under a unique (provider, slot_start) constraint.
+Whoever inserts first wins; the loser gets an IntegrityError and nothing is
+locked beyond the index entries involved, so bookings for other providers
+(or other times) never wait on each other.  Converting a hold into a Booking
+is a compare-and-set on the hold's status and expiry.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Booking, SlotHold, SlotClaim
+from .recurrence import provider_occurrences
+
+SLOT_GRANULARITY = timedelta(minutes=15)
+
+
+class SlotUnavailable(Exception):
+    """The requested interval is booked or held by someone else."""
+
+
+class HoldExpired(Exception):
+    """The hold was released, converted or timed out before it was used."""
+
+
+def hold_minutes():
+    return getattr(settings, 'BOOKING_HOLD_MINUTES', 10)
+
+
+def granules(start, end):
+    """Start times of every granule that [start, end) touches."""
+    step = int(SLOT_GRANULARITY.total_seconds())
+    first = start - timedelta(seconds=int(start.timestamp()) % step, microseconds=start.microsecond)
+    slots = []
+    while first < end:
+        slots.append(first)
+        first += SLOT_GRANULARITY
+    return slots
+
+
+def validate_interval(start, end, now=None):
+    """Raise ValidationError unless [start, end) is a bookable future interval."""
+    if start < (now or timezone.now()):
+        raise ValidationError("Bookings must be in the future.")
+    Booking(scheduled_time=start, end_time=end).clean()
+
+
+def is_held(provider, start, end, now=None):
+    """Whether somebody holds any granule of [start, end) right now."""
+    return SlotClaim.objects.filter(
+        provider=provider, slot_start__in=granules(start, end),
+        hold__status=SlotHold.STATUS_ACTIVE, hold__expires_at__gt=now or timezone.now(),
+    ).exists()
+
+
+def acquire_hold(provider, homeowner, start, end):
+    """
+    Take a hold over [start, end) or raise SlotUnavailable (ValidationError
+    if the interval itself is not bookable).  A homeowner holds at most one
+    slot per provider: asking for the slot they already hold returns that
+    hold, and asking for another one releases it.
+    """
+    now = timezone.now()
+    validate_interval(start, end, now)
+    slots = granules(start, end)
+
+    try:
+        with transaction.atomic():
+            # Reclaim granules whose holders let their hold lapse.  Writing
+            # first takes SQLite's write lock before anything is read.
+            SlotClaim.objects.filter(
+                provider=provider, slot_start__in=slots,
+                hold__status=SlotHold.STATUS_ACTIVE, hold__expires_at__lte=now,
+            ).delete()
+
+            mine = SlotHold.objects.filter(
+                provider=provider, homeowner=homeowner, status=SlotHold.STATUS_ACTIVE, expires_at__gt=now,
+            )
+            if mine.exclude(scheduled_time=start, end_time=end).update(status=SlotHold.STATUS_RELEASED):
+                SlotClaim.objects.filter(
+                    provider=provider, hold__homeowner=homeowner, hold__status=SlotHold.STATUS_RELEASED,
+                ).delete()
+            current = mine.first()
+            if current is not None:
+                return current
+
+            hold = SlotHold.objects.create(
+                provider=provider, homeowner=homeowner,
+                scheduled_time=start, end_time=end,
+                expires_at=now + timedelta(minutes=hold_minutes()),
+            )
+            SlotClaim.objects.bulk_create([
+                SlotClaim(provider=provider, slot_start=slot, hold=hold) for slot in slots
+            ])
+
+            # Bookings made before holds existed, and later occurrences of
+            # recurring series, have no claims
+            if (Booking.objects.overlapping(provider, start, end).filter(hold__isnull=True).exists()
+                    or next(provider_occurrences(provider, start, end), None) is not None):
+                raise SlotUnavailable("The provider is already booked during that time.")
+    except IntegrityError:
+        raise SlotUnavailable("Someone else is booking that time. Please pick another slot.")
+    return hold
+
+
+def confirm_hold(hold, service, notes='', **recurrence):
+    """
+    Turn an active, unexpired hold into a Booking.  The status flip is a
+    single conditional UPDATE, so a hold can only ever be converted once.
+    """
+    with transaction.atomic():
+        won = SlotHold.objects.filter(
+            pk=hold.pk, status=SlotHold.STATUS_ACTIVE, expires_at__gt=timezone.now(),
+        ).update(status=SlotHold.STATUS_CONVERTED)
+        if not won:
+            raise HoldExpired("Your reservation expired. Please pick the slot again.")
+
+        booking = Booking.objects.create(
+            homeowner=hold.homeowner, provider=hold.provider, service=service,
+            scheduled_time=hold.scheduled_time, end_time=hold.end_time, notes=notes,
+            **recurrence,
+        )
+        SlotHold.objects.filter(pk=hold.pk).update(booking=booking)
+    hold.status = SlotHold.STATUS_CONVERTED
+    hold.booking = booking
+    return booking
+
+
+def release_hold(hold):
+    """Give an unused hold back early (e.g. the homeowner picked another slot)."""
+    with transaction.atomic():
+        if SlotHold.objects.filter(pk=hold.pk, status=SlotHold.STATUS_ACTIVE).update(status=SlotHold.STATUS_RELEASED):
+            SlotClaim.objects.filter(hold=hold).delete()
+
+
+def sweep_expired_holds(now=None):
+    """
+    Free every lapsed hold and every cancelled booking's claims in a few
+    set-based statements.  Returns the number of holds expired.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        SlotClaim.objects.filter(hold__status=SlotHold.STATUS_ACTIVE, hold__expires_at__lte=now).delete()
+        SlotClaim.objects.filter(hold__booking__status=Booking.STATUS_CANCELLED).delete()
+        return SlotHold.objects.filter(
+            status=SlotHold.STATUS_ACTIVE, expires_at__lte=now
+        ).update(status=SlotHold.STATUS_EXPIRED)
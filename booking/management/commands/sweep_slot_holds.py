@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from booking.holds import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Expire lapsed slot holds and free the time they claimed. Run every minute or so."
+
+    def handle(self, *args, **options):
+        expired = sweep_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} slot hold(s)."))
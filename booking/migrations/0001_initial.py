@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0006_profile_city_profile_phone'),
+        ('services', '0002_alter_servicerequest_provider_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('notes', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('homeowner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to=settings.AUTH_USER_MODEL)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='accounts.serviceprovider')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='services.service')),
+            ],
+            options={
+                'ordering': ['scheduled_time'],
+                'indexes': [models.Index(fields=['provider', 'scheduled_time', 'end_time'], name='booking_provider_time_idx'), models.Index(fields=['homeowner', 'scheduled_time'], name='booking_homeowner_time_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('scheduled_time'))), name='booking_end_after_start')],
+            },
+        ),
+    ]
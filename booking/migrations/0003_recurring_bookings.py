@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_profile_city_profile_phone'),
+        ('booking', '0002_slot_holds'),
+        ('services', '0002_alter_servicerequest_provider_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_start', models.DateTimeField()),
+                ('skipped', models.BooleanField(default=False)),
+                ('new_start', models.DateTimeField(blank=True, null=True)),
+                ('new_end', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='recurrence_frequency',
+            field=models.CharField(blank=True, choices=[('', 'Does not repeat'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='recurrence_interval',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='recurrence_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['provider', 'recurrence_frequency', 'recurrence_until'], name='booking_provider_series_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookingexception',
+            name='booking',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='booking.booking'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookingexception',
+            constraint=models.UniqueConstraint(fields=('booking', 'original_start'), name='booking_exception_unique'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:20
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def fix_zero_intervals(apps, schema_editor):
+    # Rows saved with 0 before the constraint existed meant "every period"
+    Booking = apps.get_model('booking', 'Booking')
+    Booking.objects.filter(recurrence_interval__lt=1).update(recurrence_interval=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_recurring_bookings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='recurrence_interval',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(fix_zero_intervals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.CheckConstraint(condition=models.Q(('recurrence_interval__gte', 1)), name='booking_recurrence_interval_positive'),
+        ),
+    ]
@@ -1,3 +1,219 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.db import models
 
-# Create your models here.
+from accounts.models import ServiceProvider
+from services.models import Service
+
+
+# Upper bound on a single booking. Because no booking is longer than this,
+# "does anything overlap [start, end)" only has to look at bookings that
+# *start* in (start - MAX_BOOKING_DURATION, end) -- a bounded range scan on
+# the (provider, scheduled_time) index instead of the provider's whole history.
+MAX_BOOKING_DURATION = timedelta(hours=12)
+
+
+class BookingQuerySet(models.QuerySet):
+    def active(self):
+        """Bookings that still occupy the provider's calendar."""
+        return self.filter(status__in=Booking.ACTIVE_STATUSES)
+
+    def single(self):
+        return self.filter(recurrence_frequency='')
+
+    def recurring(self):
+        return self.exclude(recurrence_frequency='')
+
+    def overlapping(self, provider, start, end):
+        """
+        Active one-off bookings for ``provider`` that intersect [start, end).
+        Recurring series are expanded separately (see booking.recurrence).
+        """
+        return self.active().single().filter(
+            provider=provider,
+            scheduled_time__gt=start - MAX_BOOKING_DURATION,
+            scheduled_time__lt=end,
+            end_time__gt=start,
+        )
+
+    def in_window(self, provider, start, end):
+        """Busy intervals in a window, ordered by start, as (start, end) tuples."""
+        return self.overlapping(provider, start, end).order_by('scheduled_time').values_list(
+            'scheduled_time', 'end_time'
+        )
+
+
+class Booking(models.Model):
+    """A homeowner's reservation of a provider for a time interval."""
+
+    STATUS_PENDING = "pending"
+    STATUS_CONFIRMED = "confirmed"
+    STATUS_COMPLETED = "completed"
+    STATUS_CANCELLED = "cancelled"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_CONFIRMED, "Confirmed"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_CANCELLED, "Cancelled"),
+    ]
+    ACTIVE_STATUSES = (STATUS_PENDING, STATUS_CONFIRMED)
+
+    REPEAT_NONE = ""
+    REPEAT_WEEKLY = "weekly"
+    REPEAT_MONTHLY = "monthly"
+
+    REPEAT_CHOICES = [
+        (REPEAT_NONE, "Does not repeat"),
+        (REPEAT_WEEKLY, "Weekly"),
+        (REPEAT_MONTHLY, "Monthly"),
+    ]
+
+    homeowner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="bookings",
+    )
+    provider = models.ForeignKey(
+        ServiceProvider,
+        on_delete=models.CASCADE,
+        related_name="bookings",
+    )
+    service = models.ForeignKey(
+        Service,
+        on_delete=models.CASCADE,
+        related_name="bookings",
+    )
+
+    scheduled_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    notes = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Recurrence rule: scheduled_time/end_time describe the first occurrence,
+    # later ones are generated on demand by booking.recurrence
+    recurrence_frequency = models.CharField(max_length=10, choices=REPEAT_CHOICES, default=REPEAT_NONE, blank=True)
+    recurrence_interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    recurrence_until = models.DateTimeField(blank=True, null=True)
+
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["scheduled_time"]
+        indexes = [
+            # Serves overlap checks and free-slot listing (see MAX_BOOKING_DURATION)
+            models.Index(fields=["provider", "scheduled_time", "end_time"], name="booking_provider_time_idx"),
+            models.Index(fields=["homeowner", "scheduled_time"], name="booking_homeowner_time_idx"),
+            models.Index(fields=["provider", "recurrence_frequency", "recurrence_until"], name="booking_provider_series_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(end_time__gt=models.F("scheduled_time")),
+                name="booking_end_after_start",
+            ),
+            # booking.recurrence divides by the interval
+            models.CheckConstraint(
+                condition=models.Q(recurrence_interval__gte=1),
+                name="booking_recurrence_interval_positive",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Booking {self.id} - {self.provider} @ {self.scheduled_time:%Y-%m-%d %H:%M}"
+
+    def clean(self):
+        if self.scheduled_time and self.end_time:
+            if self.end_time <= self.scheduled_time:
+                raise ValidationError("End time must be after the start time.")
+            if self.end_time - self.scheduled_time > MAX_BOOKING_DURATION:
+                raise ValidationError(
+                    f"A booking cannot be longer than {int(MAX_BOOKING_DURATION.total_seconds() // 3600)} hours."
+                )
+
+    @property
+    def is_recurring(self):
+        return self.recurrence_frequency != self.REPEAT_NONE
+
+    @property
+    def duration(self):
+        return self.end_time - self.scheduled_time
+
+    def conflicts(self):
+        """Other active bookings of the same provider that overlap this one."""
+        return Booking.objects.overlapping(self.provider, self.scheduled_time, self.end_time).exclude(pk=self.pk)
+
+
+class BookingException(models.Model):
+    """
+    A skipped or moved occurrence of a recurring booking.  Only occurrences
+    that differ from the rule get a row, so a series stays one Booking plus
+    a handful of these no matter how long it runs.
+    """
+
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name="exceptions")
+    original_start = models.DateTimeField()
+    skipped = models.BooleanField(default=False)
+    new_start = models.DateTimeField(blank=True, null=True)
+    new_end = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["booking", "original_start"], name="booking_exception_unique"),
+        ]
+
+    def __str__(self):
+        action = "skipped" if self.skipped else f"moved to {self.new_start:%Y-%m-%d %H:%M}"
+        return f"Booking {self.booking_id} on {self.original_start:%Y-%m-%d %H:%M} {action}"
+
+
+class SlotHold(models.Model):
+    """
+    A short-lived reservation of a provider's time, taken when the booking
+    form opens and converted into a Booking on submit.  The interval itself
+    is locked by the SlotClaim rows below, not by this row.
+    """
+
+    STATUS_ACTIVE = "active"
+    STATUS_CONVERTED = "converted"
+    STATUS_RELEASED = "released"
+    STATUS_EXPIRED = "expired"
+
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, "Active"),
+        (STATUS_CONVERTED, "Converted"),
+        (STATUS_RELEASED, "Released"),
+        (STATUS_EXPIRED, "Expired"),
+    ]
+
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name="slot_holds")
+    homeowner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="slot_holds")
+    scheduled_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    booking = models.OneToOneField(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name="hold")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Hold {self.id} - {self.provider} @ {self.scheduled_time:%Y-%m-%d %H:%M} ({self.status})"
+
+
+class SlotClaim(models.Model):
+    """
+    One fixed-size time granule of a provider's calendar owned by a hold.
+    The unique constraint is what makes taking a hold atomic: two holds over
+    the same time cannot both insert their claims.
+    """
+
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name="slot_claims")
+    slot_start = models.DateTimeField()
+    hold = models.ForeignKey(SlotHold, on_delete=models.CASCADE, related_name="claims")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "slot_start"], name="booking_slotclaim_unique"),
+        ]
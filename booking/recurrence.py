@@ -0,0 +1,121 @@
+"""
+Lazy expansion of recurring bookings.
+
+A recurring Booking stores only its rule (first occurrence, frequency,
+interval, optional end); skipped and moved occurrences live sparsely in
+BookingException.  Nothing is materialised: occurrences are generated for
+whatever window is asked about, jumping straight to the first relevant
+occurrence instead of walking the series from its start.
+"""
+import calendar
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Booking, BookingException, MAX_BOOKING_DURATION
+
+Occurrence = namedtuple('Occurrence', 'booking start end original_start')
+
+
+def add_months(dt, months):
+    """Shift a datetime by whole months, clamping the day (Jan 31 -> Feb 28)."""
+    index = dt.month - 1 + months
+    year, month = dt.year + index // 12, index % 12 + 1
+    return dt.replace(year=year, month=month, day=min(dt.day, calendar.monthrange(year, month)[1]))
+
+
+def nth_start(booking, n):
+    # Step in local wall-clock time so a 10:00 booking stays at 10:00 across DST
+    first = timezone.localtime(booking.scheduled_time).replace(tzinfo=None)
+    if booking.recurrence_frequency == Booking.REPEAT_WEEKLY:
+        local = first + timedelta(weeks=n * booking.recurrence_interval)
+    else:
+        local = add_months(first, n * booking.recurrence_interval)
+    return timezone.make_aware(local)
+
+
+def first_index(booking, window_start):
+    """Index of the first occurrence that might still be running at window_start."""
+    earliest = window_start - booking.duration
+    if earliest <= booking.scheduled_time:
+        return 0
+    if booking.recurrence_frequency == Booking.REPEAT_WEEKLY:
+        # One period of slack for DST shifts between UTC and wall-clock steps
+        return max(0, (earliest - booking.scheduled_time) // timedelta(weeks=booking.recurrence_interval) - 1)
+    months = (earliest.year - booking.scheduled_time.year) * 12 + earliest.month - booking.scheduled_time.month
+    # Back off one period; month lengths make the estimate approximate
+    return max(0, months // booking.recurrence_interval - 1)
+
+
+def rule_starts(booking, window_start, window_end):
+    """Start times the rule produces for occurrences intersecting the window."""
+    if not booking.is_recurring:
+        if booking.scheduled_time < window_end and booking.end_time > window_start:
+            yield booking.scheduled_time
+        return
+
+    duration = booking.duration
+    n = first_index(booking, window_start)
+    while True:
+        start = nth_start(booking, n)
+        if start >= window_end or (booking.recurrence_until and start > booking.recurrence_until):
+            return
+        if start + duration > window_start:
+            yield start
+        n += 1
+
+
+def expand(booking, window_start, window_end, exceptions=None):
+    """
+    Yield the booking's occurrences intersecting [window_start, window_end).
+    ``exceptions`` maps original_start -> BookingException; it is loaded from
+    the database when not supplied.
+    """
+    if exceptions is None:
+        exceptions = {e.original_start: e for e in booking.exceptions.all()}
+
+    duration = booking.duration
+    for start in rule_starts(booking, window_start, window_end):
+        if start not in exceptions:
+            yield Occurrence(booking, start, start + duration, start)
+
+    # Moved occurrences land wherever they were moved to, whatever the rule says
+    for exc in exceptions.values():
+        if not exc.skipped and exc.new_start < window_end and exc.new_end > window_start:
+            yield Occurrence(booking, exc.new_start, exc.new_end, exc.original_start)
+
+
+def provider_occurrences(provider, window_start, window_end, exclude=None):
+    """
+    Yield occurrences of the provider's active recurring bookings in the
+    window.  Only series whose rule can reach the window, and only the
+    exceptions near it, are read.
+    """
+    moved_here = BookingException.objects.filter(
+        booking__provider=provider, skipped=False,
+        new_start__lt=window_end, new_end__gt=window_start,
+    ).values('booking_id')
+
+    series = Booking.objects.active().recurring().filter(provider=provider).filter(
+        Q(scheduled_time__lt=window_end) & (
+            Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=window_start - MAX_BOOKING_DURATION)
+        ) | Q(pk__in=moved_here)
+    )
+    if exclude is not None:
+        series = series.exclude(pk=exclude.pk)
+    series = list(series)
+    if not series:
+        return
+
+    exceptions = defaultdict(dict)
+    nearby = BookingException.objects.filter(booking__in=series).filter(
+        Q(original_start__gt=window_start - MAX_BOOKING_DURATION, original_start__lt=window_end)
+        | Q(new_start__lt=window_end, new_end__gt=window_start)
+    )
+    for exc in nearby:
+        exceptions[exc.booking_id][exc.original_start] = exc
+
+    for booking in series:
+        yield from expand(booking, window_start, window_end, exceptions[booking.pk])
@@ -1,3 +1,210 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, close_old_connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from accounts.models import User, ServiceProvider
+from services.models import Service
+from .models import Booking, BookingException, SlotHold, SlotClaim
+from . import availability, holds, recurrence
+
+
+class BookingTestMixin:
+    def make_fixtures(self, homeowners=1):
+        provider_user = User.objects.create_user('provider', user_type='service_provider')
+        self.provider = ServiceProvider.objects.get(user=provider_user)
+        self.service = Service.objects.create(name='Plumbing')
+        self.homeowners = [
+            User.objects.create_user(f'homeowner{i}') for i in range(homeowners)
+        ]
+        self.start = timezone.make_aware(datetime(2030, 1, 7, 10, 0))
+        self.end = self.start + timedelta(hours=2)
+
+
+class SlotHoldTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        self.make_fixtures(homeowners=2)
+
+    def test_overlapping_hold_is_refused(self):
+        holds.acquire_hold(self.provider, self.homeowners[0], self.start, self.end)
+        with self.assertRaises(holds.SlotUnavailable):
+            holds.acquire_hold(self.provider, self.homeowners[1],
+                               self.start + timedelta(hours=1), self.end + timedelta(hours=1))
+
+    def test_hold_converts_once(self):
+        hold = holds.acquire_hold(self.provider, self.homeowners[0], self.start, self.end)
+        booking = holds.confirm_hold(hold, self.service)
+        self.assertEqual(booking.scheduled_time, self.start)
+        with self.assertRaises(holds.HoldExpired):
+            holds.confirm_hold(hold, self.service)
+
+    def test_expired_hold_is_swept_and_slot_freed(self):
+        hold = holds.acquire_hold(self.provider, self.homeowners[0], self.start, self.end)
+        SlotHold.objects.filter(pk=hold.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        with self.assertRaises(holds.HoldExpired):
+            holds.confirm_hold(hold, self.service)
+        self.assertEqual(holds.sweep_expired_holds(), 1)
+        self.assertFalse(SlotClaim.objects.exists())
+        holds.acquire_hold(self.provider, self.homeowners[1], self.start, self.end)
+
+    def test_same_homeowner_reuses_or_moves_their_hold(self):
+        hold = holds.acquire_hold(self.provider, self.homeowners[0], self.start, self.end)
+        self.assertEqual(holds.acquire_hold(self.provider, self.homeowners[0], self.start, self.end), hold)
+
+        later = holds.acquire_hold(self.provider, self.homeowners[0],
+                                   self.start + timedelta(hours=1), self.end + timedelta(hours=1))
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, SlotHold.STATUS_RELEASED)
+        self.assertEqual(SlotClaim.objects.filter(hold=later).count(), SlotClaim.objects.count())
+
+    def test_unbookable_interval_is_not_held(self):
+        for start, end in [
+            (timezone.now() - timedelta(hours=1), timezone.now() + timedelta(hours=1)),
+            (self.start, self.start + timedelta(days=30)),
+        ]:
+            with self.assertRaises(ValidationError):
+                holds.acquire_hold(self.provider, self.homeowners[0], start, end)
+        self.assertFalse(SlotClaim.objects.exists())
+
+
+class RecurringBookingTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        self.make_fixtures()
+
+    def book(self, **kwargs):
+        return Booking.objects.create(
+            homeowner=self.homeowners[0], provider=self.provider, service=self.service,
+            scheduled_time=self.start, end_time=self.end, **kwargs
+        )
+
+    def test_weekly_series_expands_only_the_window(self):
+        series = self.book(recurrence_frequency=Booking.REPEAT_WEEKLY)
+        window_start = self.start + timedelta(weeks=520)
+        occurrences = list(recurrence.expand(series, window_start, window_start + timedelta(weeks=2)))
+        self.assertEqual([o.start for o in occurrences],
+                         [window_start, window_start + timedelta(weeks=1)])
+
+    def test_monthly_series_clamps_to_month_end(self):
+        self.start = timezone.make_aware(datetime(2030, 1, 31, 9, 0))
+        self.end = self.start + timedelta(hours=3)
+        series = self.book(recurrence_frequency=Booking.REPEAT_MONTHLY)
+        starts = [o.start.date() for o in recurrence.expand(
+            series, self.start, timezone.make_aware(datetime(2030, 4, 1)))]
+        self.assertEqual([d.isoformat() for d in starts], ['2030-01-31', '2030-02-28', '2030-03-31'])
+
+    def test_skipped_and_moved_occurrences(self):
+        series = self.book(recurrence_frequency=Booking.REPEAT_WEEKLY)
+        week2 = self.start + timedelta(weeks=1)
+        week3 = self.start + timedelta(weeks=2)
+        BookingException.objects.create(booking=series, original_start=week2, skipped=True)
+        BookingException.objects.create(booking=series, original_start=week3,
+                                        new_start=week3 + timedelta(days=1),
+                                        new_end=week3 + timedelta(days=1, hours=2))
+
+        self.assertTrue(availability.is_free(self.provider, week2, week2 + timedelta(hours=2)))
+        self.assertTrue(availability.is_free(self.provider, week3, week3 + timedelta(hours=2)))
+        self.assertFalse(availability.is_free(self.provider, week3 + timedelta(days=1),
+                                              week3 + timedelta(days=1, hours=1)))
+
+    def test_zero_interval_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            Booking(homeowner=self.homeowners[0], provider=self.provider, service=self.service,
+                    scheduled_time=self.start, end_time=self.end,
+                    recurrence_frequency=Booking.REPEAT_WEEKLY, recurrence_interval=0).full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.book(recurrence_frequency=Booking.REPEAT_WEEKLY, recurrence_interval=0)
+
+    def test_hold_refused_on_later_occurrence(self):
+        self.book(recurrence_frequency=Booking.REPEAT_WEEKLY)
+        later = self.start + timedelta(weeks=30)
+        with self.assertRaises(holds.SlotUnavailable):
+            holds.acquire_hold(self.provider, self.homeowners[0], later, later + timedelta(hours=1))
+
+
+class ImpossibleDateTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        self.make_fixtures()
+        self.client.force_login(self.homeowners[0])
+
+    def test_impossible_dates_are_ignored_not_500(self):
+        response = self.client.get('/booking/create/', {'provider': self.provider.pk, 'start': '2025-02-30T10:00',
+                                                        'end': '2025-02-30T12:00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(SlotHold.objects.exists())
+
+        response = self.client.get(f'/booking/providers/{self.provider.pk}/availability/',
+                                   {'start': '2025-02-30T10:00'})
+        self.assertEqual(response.status_code, 200)
+
+
+class OccurrenceExceptionTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        self.make_fixtures(homeowners=2)
+        self.series = Booking.objects.create(
+            homeowner=self.homeowners[0], provider=self.provider, service=self.service,
+            scheduled_time=self.start, end_time=self.end, recurrence_frequency=Booking.REPEAT_WEEKLY,
+        )
+        self.client.force_login(self.homeowners[0])
+
+    def reschedule(self, new_start):
+        return self.client.post(f'/booking/{self.series.pk}/occurrences/exception/', {
+            'action': 'reschedule', 'original_start': self.start.isoformat(), 'new_start': new_start.isoformat(),
+        })
+
+    def test_reschedule_is_validated_like_a_booking(self):
+        response = self.reschedule(timezone.now() - timedelta(days=1))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BookingException.objects.exists())
+
+    def test_reschedule_onto_a_held_slot_is_refused(self):
+        moved = self.start + timedelta(days=1)
+        hold = holds.acquire_hold(self.provider, self.homeowners[1], moved, moved + timedelta(hours=1))
+        self.assertEqual(self.reschedule(moved).status_code, 409)
+
+        holds.release_hold(hold)
+        self.assertEqual(self.reschedule(moved).json(), {'status': 'ok'})
+        self.assertEqual(BookingException.objects.get().new_start, moved)
+
+
+class SlotHoldConcurrencyTests(BookingTestMixin, TransactionTestCase):
+    THREADS = 16
+
+    def setUp(self):
+        self.make_fixtures(homeowners=self.THREADS)
+
+    def test_many_homeowners_racing_for_one_slot(self):
+        barrier = threading.Barrier(self.THREADS)
+        outcomes = []
+
+        def race(homeowner):
+            barrier.wait()
+            try:
+                for _ in range(50):
+                    try:
+                        hold = holds.acquire_hold(self.provider, homeowner, self.start, self.end)
+                        holds.confirm_hold(hold, self.service)
+                        outcomes.append('booked')
+                        return
+                    except (holds.SlotUnavailable, holds.HoldExpired):
+                        outcomes.append('refused')
+                        return
+                    except OperationalError:
+                        # SQLite reports writer contention as "database is locked"; retry
+                        continue
+                outcomes.append('gave up')
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=race, args=(h,)) for h in self.homeowners]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(outcomes.count('booked'), 1)
+        self.assertEqual(outcomes.count('refused'), self.THREADS - 1)
+        self.assertEqual(Booking.objects.filter(provider=self.provider).count(), 1)
@@ -7,4 +7,7 @@ urlpatterns = [
     path('create/', views.create_booking, name='create_booking'),
     path('mine/', views.my_bookings, name='my_bookings'),
     path('provider/', views.provider_bookings, name='provider_bookings'),
+    path('providers/<int:pk>/availability/', views.provider_availability, name='provider_availability'),
+    path('<int:pk>/occurrences/', views.booking_occurrences, name='booking_occurrences'),
+    path('<int:pk>/occurrences/exception/', views.occurrence_exception, name='occurrence_exception'),
 ]
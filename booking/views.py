@@ -1,11 +1,186 @@
-from django.shortcuts import render
+from datetime import timedelta
 
-# Create your views here.
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseForbidden, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import ServiceProvider
+from .forms import BookingForm
+from django.views.decorators.http import require_POST
+
+from .models import Booking, BookingException, SlotHold
+from . import availability, holds, recurrence
+
+
+def _parse_when(value):
+    """
+    Parse an ISO datetime from the query string, assuming local time if naive.
+    Returns None for anything unparseable, including well-formed but impossible
+    dates such as 2025-02-30T10:00.
+    """
+    try:
+        when = parse_datetime(value or '')
+    except ValueError:
+        return None
+    if when is not None and timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+@login_required
 def create_booking(request):
-    return render(request, 'booking/create.html')
+    """
+    Homeowner books a provider for a time interval.
+    Opening the form for a specific slot (?provider=&start=&end=) places a
+    short hold on it so nobody else can take it while the form is filled in;
+    the slot is validated like a booking first.
+    """
+    if request.user.user_type != 'homeowner':
+        messages.error(request, "Only homeowners can book services.")
+        return redirect('booking:provider_bookings')
 
+    if request.method == 'POST':
+        form = BookingForm(request.POST)
+        hold = SlotHold.objects.filter(
+            pk=request.POST.get('hold') or None, homeowner=request.user, status=SlotHold.STATUS_ACTIVE
+        ).first()
+
+        if form.is_valid():
+            data = form.cleaned_data
+            try:
+                # The form may have been edited away from the held slot
+                if hold and (hold.provider_id, hold.scheduled_time, hold.end_time) != (
+                    data['provider'].pk, data['scheduled_time'], data['end_time']
+                ):
+                    holds.release_hold(hold)
+                    hold = None
+                if hold is None:
+                    hold = holds.acquire_hold(data['provider'], request.user, data['scheduled_time'], data['end_time'])
+                holds.confirm_hold(
+                    hold, data['service'], data['notes'],
+                    recurrence_frequency=data['recurrence_frequency'],
+                    recurrence_interval=data['recurrence_interval'] or 1,
+                    recurrence_until=data['recurrence_until'],
+                )
+            except (holds.SlotUnavailable, holds.HoldExpired) as e:
+                form.add_error(None, str(e))
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                messages.success(request, "Booking requested successfully!")
+                return redirect('booking:my_bookings')
+        return render(request, 'booking/booking_form.html', {'form': form, 'hold': hold})
+
+    initial = {}
+    hold = None
+    provider_pk = request.GET.get('provider')
+    start = _parse_when(request.GET.get('start'))
+    end = _parse_when(request.GET.get('end'))
+    if provider_pk:
+        initial['provider'] = provider_pk
+    if provider_pk and start and end and end > start:
+        initial.update(scheduled_time=start, end_time=end)
+        provider = get_object_or_404(ServiceProvider, pk=provider_pk)
+        try:
+            hold = holds.acquire_hold(provider, request.user, start, end)
+        except holds.SlotUnavailable as e:
+            messages.warning(request, str(e))
+        except ValidationError as e:
+            messages.warning(request, " ".join(e.messages))
+
+    form = BookingForm(initial=initial)
+    return render(request, 'booking/booking_form.html', {'form': form, 'hold': hold})
+
+
+@login_required
 def my_bookings(request):
-    return render(request, 'booking/my_bookings.html')
+    """Homeowner's bookings"""
+    bookings = Booking.objects.filter(homeowner=request.user).select_related('provider__user', 'service')
+    return render(request, 'booking/booking_list.html', {'bookings': bookings})
+
 
+@login_required
 def provider_bookings(request):
-    return render(request, 'booking/provider_bookings.html')
+    """Bookings assigned to the logged-in provider"""
+    if request.user.user_type != 'service_provider':
+        return HttpResponseForbidden("Access denied.")
+
+    provider = get_object_or_404(ServiceProvider, user=request.user)
+    bookings = Booking.objects.filter(provider=provider).select_related('homeowner', 'service')
+    return render(request, 'booking/provider_bookings.html', {'provider': provider, 'bookings': bookings})
+
+
+@login_required
+def provider_availability(request, pk):
+    """
+    JSON: free slots for a provider, defaulting to the next 7 days.
+    Pass ?start=...&end=... (ISO datetimes) to check a specific interval.
+    """
+    provider = get_object_or_404(ServiceProvider, pk=pk)
+
+    start = _parse_when(request.GET.get('start')) or timezone.now()
+    end = _parse_when(request.GET.get('end')) or start + timedelta(days=7)
+    if end <= start or end - start > timedelta(days=31):
+        return JsonResponse({'status': 'error', 'message': 'Invalid window (max 31 days).'}, status=400)
+
+    slots = availability.free_slots(provider, start, end)
+    return JsonResponse({
+        'status': 'ok',
+        'provider': provider.pk,
+        'is_free': availability.is_free(provider, start, end),
+        'free_slots': [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in slots],
+    })
+
+
+@login_required
+def booking_occurrences(request, pk):
+    """JSON: occurrences of one of the homeowner's bookings, default next 8 weeks"""
+    booking = get_object_or_404(Booking, pk=pk, homeowner=request.user)
+    start = _parse_when(request.GET.get('start')) or timezone.now()
+    end = _parse_when(request.GET.get('end')) or start + timedelta(weeks=8)
+    if end <= start or end - start > timedelta(days=366):
+        return JsonResponse({'status': 'error', 'message': 'Invalid window (max 1 year).'}, status=400)
+
+    occurrences = sorted(recurrence.expand(booking, start, end), key=lambda o: o.start)
+    return JsonResponse({'status': 'ok', 'occurrences': [
+        {'start': o.start.isoformat(), 'end': o.end.isoformat(), 'original_start': o.original_start.isoformat()}
+        for o in occurrences
+    ]})
+
+
+@login_required
+@require_POST
+def occurrence_exception(request, pk):
+    """Skip or reschedule a single occurrence of a recurring booking"""
+    booking = get_object_or_404(Booking, pk=pk, homeowner=request.user)
+    original_start = _parse_when(request.POST.get('original_start'))
+    if not booking.is_recurring or original_start is None:
+        return JsonResponse({'status': 'error', 'message': 'Not a recurring booking occurrence.'}, status=400)
+    if original_start not in recurrence.rule_starts(booking, original_start, original_start + booking.duration):
+        return JsonResponse({'status': 'error', 'message': 'No occurrence starts at that time.'}, status=400)
+
+    action = request.POST.get('action')
+    if action == 'skip':
+        defaults = {'skipped': True, 'new_start': None, 'new_end': None}
+    elif action == 'reschedule':
+        new_start = _parse_when(request.POST.get('new_start'))
+        if new_start is None:
+            return JsonResponse({'status': 'error', 'message': 'new_start is required.'}, status=400)
+        new_end = new_start + booking.duration
+        try:
+            holds.validate_interval(new_start, new_end)
+        except ValidationError as e:
+            return JsonResponse({'status': 'error', 'message': " ".join(e.messages)}, status=400)
+        busy = availability.busy_intervals(booking.provider, new_start, new_end, exclude=booking)
+        if busy or holds.is_held(booking.provider, new_start, new_end):
+            return JsonResponse({'status': 'error', 'message': 'The provider is busy at that time.'}, status=409)
+        defaults = {'skipped': False, 'new_start': new_start, 'new_end': new_end}
+    else:
+        return JsonResponse({'status': 'error', 'message': 'Invalid action.'}, status=400)
+
+    BookingException.objects.update_or_create(booking=booking, original_start=original_start, defaults=defaults)
+    return JsonResponse({'status': 'ok'})
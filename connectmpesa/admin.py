@@ -1,15 +1,60 @@
 from django.contrib import admin
-from .models import PaymentRequest, MpesaTransaction
+
+from HomeConnect.admin_utils import LargeTableAdmin
+from HomeConnect.exports import export_actions
+from .exports import (
+    MPESA_TRANSACTION_COLUMNS, PAYMENT_REQUEST_COLUMNS,
+    mpesa_transaction_export_queryset, payment_request_export_queryset,
+)
+from .models import PaymentRequest, MpesaTransaction, DailyPaymentStats, DailyCompletionBucket
 
 
 @admin.register(PaymentRequest)
-class PaymentRequestAdmin(admin.ModelAdmin):
+class PaymentRequestAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'amount', 'phone_number', 'status', 'created_at')
     list_filter = ('status', 'created_at')
-    search_fields = ('user__username', 'phone_number', 'checkout_request_id')
+    search_fields = ('^user__username', 'phone_number', 'checkout_request_id')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    actions = export_actions(PAYMENT_REQUEST_COLUMNS, 'payment-requests', payment_request_export_queryset)
 
 
 @admin.register(MpesaTransaction)
-class MpesaTransactionAdmin(admin.ModelAdmin):
+class MpesaTransactionAdmin(LargeTableAdmin):
     list_display = ('mpesa_transaction_id', 'payment_request', 'amount', 'result_code', 'created_at')
+    list_select_related = ('payment_request__user',)
+    raw_id_fields = ('payment_request',)
+    actions = export_actions(MPESA_TRANSACTION_COLUMNS, 'mpesa-transactions', mpesa_transaction_export_queryset)
     search_fields = ('mpesa_transaction_id',)
+    exclude = ('raw_payload',)
+    readonly_fields = ('payload', 'archive_month', 'archive_offset', 'archive_length')
+
+    def get_queryset(self, request):
+        # The changelist never shows the payload, so don't drag it out of the DB
+        return super().get_queryset(request).defer('raw_payload')
+
+
+class DailyCompletionBucketInline(admin.TabularInline):
+    model = DailyCompletionBucket
+    extra = 0
+    can_delete = False
+    readonly_fields = ('upper_bound', 'count')
+
+
+@admin.register(DailyPaymentStats)
+class DailyPaymentStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'requests_created', 'requests_completed', 'requests_failed', 'revenue', 'success_rate')
+    date_hierarchy = 'day'
+    inlines = [DailyCompletionBucketInline]
+    readonly_fields = (
+        'day', 'requests_created', 'requests_completed', 'requests_failed', 'revenue',
+        'seconds_to_complete', 'success_rate', 'average_seconds_to_complete',
+        'median_seconds_to_complete', 'updated_at',
+    )
+
+    # Rows are owned by connectmpesa.rollups; edit via `manage.py rollup_payments`
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,53 @@
+"""
+Cold storage for MpesaTransaction.raw_payload.
+
+Each month gets one append-only file under MPESA_ARCHIVE_ROOT.  Every payload
+is written as its own gzip member, so the file as a whole is still a valid
+``.gz`` stream (``zcat 2025-12.jsonl.gz`` works), while a single payload can
+be read back from its (offset, length) without decompressing its neighbours.
+The offsets are kept on the transaction rows, which act as the lookup index.
+"""
+import gzip
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+
+
+def archive_path(month):
+    return Path(settings.MPESA_ARCHIVE_ROOT) / f"{month}.jsonl.gz"
+
+
+def month_key(dt):
+    return dt.strftime('%Y-%m')
+
+
+def append_payloads(month, payloads):
+    """
+    Append payloads to the month's archive and return their (offset, length)
+    pairs in the same order.  The file is fsynced before returning so the
+    caller can safely drop the inline copies.
+    """
+    path = archive_path(month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    locations = []
+    with open(path, 'ab') as fh:
+        offset = fh.seek(0, os.SEEK_END)
+        for payload in payloads:
+            line = json.dumps(payload, separators=(',', ':')).encode('utf-8') + b'\n'
+            member = gzip.compress(line, mtime=0)
+            fh.write(member)
+            locations.append((offset, len(member)))
+            offset += len(member)
+        fh.flush()
+        os.fsync(fh.fileno())
+    return locations
+
+
+def read_payload(month, offset, length):
+    with open(archive_path(month), 'rb') as fh:
+        fh.seek(offset)
+        member = fh.read(length)
+    return json.loads(gzip.decompress(member))
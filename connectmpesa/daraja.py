@@ -0,0 +1,227 @@
+"""
+Minimal Daraja (M-Pesa Express) client.
+
+Talks to whatever ``settings.MPESA_BASE_URL`` points at, so the same code
+path works against the Safaricom sandbox, production, or the local
+``daraja_simulator`` management command.
+
+Every call has an ``a``-prefixed coroutine twin (``astk_push`` ...) built on
+httpx, for async views: the request then waits on Daraja without holding a
+worker thread.  Under ASGI (see ``share_async_client``) the coroutines
+share one pooled httpx client, so STK pushes reuse open connections to
+Daraja instead of paying a TCP and TLS handshake for every call.
+"""
+import asyncio
+import base64
+import contextlib
+import threading
+import time
+import weakref
+from datetime import datetime
+
+from django.conf import settings
+from django.urls import reverse
+
+
+class DarajaError(Exception):
+    """Raised when the Daraja API cannot be reached or rejects a call."""
+
+
+# -------------------------
+# ACCESS TOKEN (cached per process)
+# -------------------------
+_token_lock = threading.Lock()
+_token = {'value': None, 'expires_at': 0.0}
+
+
+def _http():
+    """The requests library, imported on the first API call rather than at worker boot."""
+    import requests
+    return requests
+
+
+def _base_url():
+    return settings.MPESA_BASE_URL.rstrip('/')
+
+
+def _token_request():
+    return {
+        'url': f"{_base_url()}/oauth/v1/generate",
+        'params': {'grant_type': 'client_credentials'},
+        'auth': (settings.MPESA_CONSUMER_KEY, settings.MPESA_CONSUMER_SECRET),
+    }
+
+
+def _cached_token():
+    if _token['value'] and time.monotonic() < _token['expires_at']:
+        return _token['value']
+    return None
+
+
+def _store_token(data):
+    # Refresh a minute early so in-flight calls never carry a stale token
+    _token['value'] = data['access_token']
+    _token['expires_at'] = time.monotonic() + int(data.get('expires_in', 3599)) - 60
+    return _token['value']
+
+
+def access_token():
+    """Return a valid OAuth token, fetching a new one shortly before expiry."""
+    with _token_lock:
+        if _cached_token():
+            return _cached_token()
+
+        requests = _http()
+        try:
+            r = requests.get(**_token_request(), timeout=10)
+            r.raise_for_status()
+            data = r.json()
+        except (requests.RequestException, ValueError) as e:
+            raise DarajaError(f"Unable to generate access token: {e}")
+        return _store_token(data)
+
+
+def _password(timestamp):
+    raw = f"{settings.MPESA_SHORTCODE}{settings.MPESA_PASSKEY}{timestamp}"
+    return base64.b64encode(raw.encode('ascii')).decode('utf-8')
+
+
+def _post(path, payload):
+    headers = {'Authorization': f"Bearer {access_token()}"}
+    requests = _http()
+    try:
+        r = requests.post(f"{_base_url()}{path}", json=payload, headers=headers, timeout=30)
+        return r.json()
+    except (requests.RequestException, ValueError) as e:
+        raise DarajaError(str(e))
+
+
+# -------------------------
+# ASYNC CLIENT
+# -------------------------
+def _ahttp():
+    """httpx, imported on the first async API call."""
+    import httpx
+    return httpx
+
+
+# A client's pooled connections belong to the event loop that opened them.
+# Under an ASGI server one loop lives as long as the worker, so one client
+# can serve every request.  Async views run under WSGI get a fresh loop per
+# request instead, and a client kept past its loop could never be closed.
+_aclient_state = {'shared': False, 'current': None}  # current: (weakref to loop, client)
+
+
+def share_async_client():
+    """Keep one pooled httpx client per event loop.  Called by HomeConnect.asgi."""
+    _aclient_state['shared'] = True
+
+
+@contextlib.asynccontextmanager
+async def _aclient():
+    if not _aclient_state['shared']:
+        # Closed before the loop that owns its connections goes away
+        async with _ahttp().AsyncClient() as client:
+            yield client
+        return
+    loop = asyncio.get_running_loop()
+    current = _aclient_state['current']
+    if current is None or current[0]() is not loop:
+        # Swapped as one value, so concurrent callers never see half an update
+        current = _aclient_state['current'] = (weakref.ref(loop), _ahttp().AsyncClient())
+    yield current[1]
+
+
+async def _atoken(client):
+    if _cached_token():
+        return _cached_token()
+
+    httpx = _ahttp()
+    try:
+        r = await client.get(**_token_request(), timeout=10)
+        r.raise_for_status()
+        data = r.json()
+    except (httpx.HTTPError, ValueError) as e:
+        raise DarajaError(f"Unable to generate access token: {e}")
+    return _store_token(data)
+
+
+async def aaccess_token():
+    """
+    Coroutine version of access_token(), sharing its cache.  Two coroutines
+    may both refresh an expired token; either result is valid.
+    """
+    async with _aclient() as client:
+        return await _atoken(client)
+
+
+async def _apost(path, payload):
+    httpx = _ahttp()
+    async with _aclient() as client:
+        headers = {'Authorization': f"Bearer {await _atoken(client)}"}
+        try:
+            r = await client.post(f"{_base_url()}{path}", json=payload, headers=headers, timeout=30)
+            return r.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise DarajaError(str(e))
+
+
+def build_callback_url():
+    """
+    Absolute URL Daraja should post results to.
+    MPESA_CALLBACK_URL wins when it is absolute; otherwise the callback route
+    is joined onto NGROK_URL.
+    """
+    configured = settings.MPESA_CALLBACK_URL
+    if configured.startswith(('http://', 'https://')):
+        return configured
+    return settings.NGROK_URL.rstrip('/') + reverse('connectmpesa:mpesa_callback')
+
+
+def _stk_push_payload(phone_number, amount, account_reference, transaction_desc, callback_url):
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    return {
+        'BusinessShortCode': settings.MPESA_SHORTCODE,
+        'Password': _password(timestamp),
+        'Timestamp': timestamp,
+        'TransactionType': 'CustomerPayBillOnline',
+        'Amount': int(amount),
+        'PartyA': phone_number,
+        'PartyB': settings.MPESA_SHORTCODE,
+        'PhoneNumber': phone_number,
+        'CallBackURL': callback_url,
+        'AccountReference': account_reference,
+        'TransactionDesc': transaction_desc,
+    }
+
+
+def _stk_query_payload(checkout_request_id):
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    return {
+        'BusinessShortCode': settings.MPESA_SHORTCODE,
+        'Password': _password(timestamp),
+        'Timestamp': timestamp,
+        'CheckoutRequestID': checkout_request_id,
+    }
+
+
+def stk_push(phone_number, amount, account_reference, transaction_desc, callback_url):
+    """Send an STK prompt to the customer's phone and return the JSON reply."""
+    return _post('/mpesa/stkpush/v1/processrequest', _stk_push_payload(
+        phone_number, amount, account_reference, transaction_desc, callback_url,
+    ))
+
+
+def stk_query(checkout_request_id):
+    """Ask Daraja for the current state of an STK push."""
+    return _post('/mpesa/stkpushquery/v1/query', _stk_query_payload(checkout_request_id))
+
+
+async def astk_push(phone_number, amount, account_reference, transaction_desc, callback_url):
+    return await _apost('/mpesa/stkpush/v1/processrequest', _stk_push_payload(
+        phone_number, amount, account_reference, transaction_desc, callback_url,
+    ))
+
+
+async def astk_query(checkout_request_id):
+    return await _apost('/mpesa/stkpushquery/v1/query', _stk_query_payload(checkout_request_id))
@@ -0,0 +1,36 @@
+"""Export column layouts for payments (see HomeConnect.exports)."""
+from .models import MpesaTransaction, PaymentRequest
+
+PAYMENT_REQUEST_COLUMNS = (
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+    ('status', 'status'),
+    ('user', 'user.username'),
+    ('amount', 'amount'),
+    ('phone_number', 'phone_number'),
+    ('checkout_request_id', 'checkout_request_id'),
+)
+
+MPESA_TRANSACTION_COLUMNS = (
+    ('mpesa_transaction_id', 'mpesa_transaction_id'),
+    ('created_at', 'created_at'),
+    ('amount', 'amount'),
+    ('result_code', 'result_code'),
+    ('result_desc', 'result_desc'),
+    ('payment_request_id', 'payment_request_id'),
+    ('user', 'payment_request.user.username'),
+    ('phone_number', 'payment_request.phone_number'),
+    ('archive_month', 'archive_month'),
+)
+
+
+def payment_request_export_queryset(queryset=None):
+    queryset = PaymentRequest.objects.all() if queryset is None else queryset
+    return queryset.select_related('user')
+
+
+def mpesa_transaction_export_queryset(queryset=None):
+    queryset = MpesaTransaction.objects.all() if queryset is None else queryset
+    # The payload is not exported; keep the (possibly large) column out of the query
+    return queryset.select_related('payment_request__user').defer('raw_payload')
@@ -0,0 +1,63 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from connectmpesa import archive
+from connectmpesa.models import MpesaTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Move raw_payload of old M-Pesa transactions into compressed monthly "
+        "archive files. Safe to interrupt and re-run; each batch commits on its own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.MPESA_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches (default: run to completion).")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        batch_size = options['batch_size']
+        batches = moved = 0
+        last_pk = 0
+
+        while options['max_batches'] is None or batches < options['max_batches']:
+            with transaction.atomic():
+                rows = list(
+                    MpesaTransaction.objects
+                    .select_for_update()
+                    .filter(pk__gt=last_pk, created_at__lt=cutoff,
+                            raw_payload__isnull=False, archive_month__isnull=True)
+                    .only('pk', 'created_at', 'raw_payload')
+                    .order_by('pk')[:batch_size]
+                )
+                if not rows:
+                    break
+
+                rows.sort(key=lambda t: (archive.month_key(t.created_at), t.pk))
+                for month, group in groupby(rows, key=lambda t: archive.month_key(t.created_at)):
+                    group = list(group)
+                    locations = archive.append_payloads(month, [t.raw_payload for t in group])
+                    for txn, (offset, length) in zip(group, locations):
+                        txn.archive_month = month
+                        txn.archive_offset = offset
+                        txn.archive_length = length
+                        txn.raw_payload = None
+
+                MpesaTransaction.objects.bulk_update(
+                    rows, ['archive_month', 'archive_offset', 'archive_length', 'raw_payload']
+                )
+
+            last_pk = max(t.pk for t in rows)
+            batches += 1
+            moved += len(rows)
+            self.stdout.write(f"Batch {batches}: archived {len(rows)} payloads (up to id {last_pk})")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} payloads older than {cutoff:%Y-%m-%d}."))
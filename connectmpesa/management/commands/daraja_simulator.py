@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from connectmpesa.simulator import DarajaSimulator, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local Daraja simulator (OAuth, STK push, STK query) that posts "
+        "stkCallback payloads back to HomeConnect. Point MPESA_BASE_URL at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--callback-delay', type=float, default=2.0,
+                            help="Seconds between an STK push and its callback.")
+        parser.add_argument('--failure-rate', type=float, default=0.1,
+                            help="Fraction of pushes the customer cancels or cannot pay.")
+        parser.add_argument('--timeout-rate', type=float, default=0.05,
+                            help="Fraction of pushes that never call back.")
+        parser.add_argument('--callback-url', default=None,
+                            help="Override the CallBackURL sent with each push, "
+                                 "e.g. http://127.0.0.1:8000/connectmpesa/callback/")
+        parser.add_argument('--workers', type=int, default=32,
+                            help="Threads used to deliver callbacks.")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--response-latency', type=float, default=0.0,
+                            help="Seconds to wait before answering STK push/query calls.")
+
+    def handle(self, *args, **options):
+        failure_rate = options['failure_rate']
+        timeout_rate = options['timeout_rate']
+        if not (0 <= failure_rate <= 1 and 0 <= timeout_rate <= 1) or failure_rate + timeout_rate > 1:
+            raise CommandError("Failure and timeout rates must be between 0 and 1 and sum to at most 1.")
+
+        simulator = DarajaSimulator(
+            callback_delay=options['callback_delay'],
+            failure_rate=failure_rate,
+            timeout_rate=timeout_rate,
+            callback_url=options['callback_url'],
+            workers=options['workers'],
+            seed=options['seed'],
+            response_latency=options['response_latency'],
+            log=lambda msg: self.stderr.write(msg),
+        )
+        server = make_server(simulator, options['host'], options['port'])
+        simulator.start()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Daraja simulator listening on http://{options['host']}:{options['port']}/ "
+            f"(set MPESA_BASE_URL to this address)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            simulator.stop()
+            self.stdout.write(", ".join(f"{k}={v}" for k, v in simulator.stats.items()))
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connectmpesa', '0002_mpesatransaction_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPaymentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('requests_created', models.PositiveIntegerField(default=0)),
+                ('requests_completed', models.PositiveIntegerField(default=0)),
+                ('requests_failed', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('seconds_to_complete', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily payment stats',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='paymentrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='DailyCompletionBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upper_bound', models.PositiveIntegerField(help_text='Bucket ceiling in seconds')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('stats', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latency_buckets', to='connectmpesa.dailypaymentstats')),
+            ],
+            options={
+                'ordering': ['upper_bound'],
+                'unique_together': {('stats', 'upper_bound')},
+            },
+        ),
+    ]
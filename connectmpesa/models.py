@@ -2,6 +2,8 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from . import archive
+
 
 class PaymentRequest(models.Model):
     STATUS_PENDING = 'PENDING'
@@ -22,7 +24,8 @@ class PaymentRequest(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
     checkout_request_id = models.CharField(max_length=128, blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
-    updated_at = models.DateTimeField(auto_now=True)
+    # Indexed: the rollup catch-up job scans by it
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"MPESA Request #{self.pk} - {self.user} - {self.amount} ({self.status})"
@@ -37,5 +40,95 @@ class MpesaTransaction(models.Model):
     raw_payload = models.JSONField(blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Location of raw_payload once moved to cold storage (see connectmpesa.archive)
+    archive_month = models.CharField(max_length=7, blank=True, null=True)
+    archive_offset = models.BigIntegerField(blank=True, null=True)
+    archive_length = models.PositiveIntegerField(blank=True, null=True)
+
     def __str__(self):
         return f"Txn {self.mpesa_transaction_id} ({self.amount})"
+
+    @property
+    def is_archived(self):
+        return self.archive_month is not None
+
+    @property
+    def payload(self):
+        """
+        The callback payload, read from the inline column for recent rows and
+        from the monthly archive file for archived ones.
+        """
+        if not self.is_archived:
+            return self.raw_payload
+        if not hasattr(self, '_archived_payload'):
+            self._archived_payload = archive.read_payload(
+                self.archive_month, self.archive_offset, self.archive_length
+            )
+        return self._archived_payload
+
+
+# -------------------------------------------------------
+# REPORTING ROLLUPS (maintained by connectmpesa.rollups)
+# -------------------------------------------------------
+class DailyPaymentStats(models.Model):
+    day = models.DateField(unique=True)
+    requests_created = models.PositiveIntegerField(default=0)
+    requests_completed = models.PositiveIntegerField(default=0)
+    requests_failed = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    seconds_to_complete = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name_plural = 'Daily payment stats'
+
+    def __str__(self):
+        return f"{self.day}: {self.requests_completed} completed, KES {self.revenue}"
+
+    @property
+    def success_rate(self):
+        finished = self.requests_completed + self.requests_failed
+        return round(self.requests_completed / finished, 4) if finished else None
+
+    @property
+    def average_seconds_to_complete(self):
+        if not self.requests_completed:
+            return None
+        return self.seconds_to_complete // self.requests_completed
+
+    @property
+    def median_seconds_to_complete(self):
+        """Upper bound of the latency bucket holding the median completion."""
+        buckets = sorted(self.latency_buckets.all(), key=lambda b: b.upper_bound)
+        total = sum(b.count for b in buckets)
+        seen = 0
+        for b in buckets:
+            seen += b.count
+            if seen * 2 >= total and total:
+                return b.upper_bound
+        return None
+
+
+class DailyCompletionBucket(models.Model):
+    """Histogram of PENDING → COMPLETED latency, one row per day and bucket."""
+    stats = models.ForeignKey(DailyPaymentStats, on_delete=models.CASCADE, related_name='latency_buckets')
+    upper_bound = models.PositiveIntegerField(help_text="Bucket ceiling in seconds")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('stats', 'upper_bound')
+        ordering = ['upper_bound']
+
+
+class RollupWatermark(models.Model):
+    """
+    How far the ``rollup_payments`` catch-up has got: every payment touched
+    before ``covered_until`` has been folded in.  Kept apart from the stats
+    rows, whose updated_at also moves on every live increment.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    covered_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.covered_until:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,125 @@
+"""
+Incremental daily rollups of M-Pesa payments.
+
+Views call ``record_created`` and ``record_status_change`` as payments move
+through the funnel; each call is a couple of single-row ``UPDATE ... SET
+x = x + n`` statements, so concurrent callbacks never lose increments.
+``rebuild_days`` recomputes whole days from PaymentRequest and is used by the
+``rollup_payments`` catch-up command.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import PaymentRequest, DailyPaymentStats, DailyCompletionBucket, RollupWatermark
+
+WATERMARK = 'payments'
+
+# Ceilings (seconds) of the PENDING → COMPLETED latency histogram
+LATENCY_BOUNDS = [15, 30, 60, 120, 300, 600, 1800, 3600, 6 * 3600, 24 * 3600, 2 ** 31 - 1]
+
+FINAL_STATUSES = (PaymentRequest.STATUS_COMPLETED, PaymentRequest.STATUS_FAILED)
+
+
+def latency_bucket(seconds):
+    for bound in LATENCY_BOUNDS:
+        if seconds <= bound:
+            return bound
+    return LATENCY_BOUNDS[-1]
+
+
+def _stats_for(day):
+    stats, _ = DailyPaymentStats.objects.get_or_create(day=day)
+    return stats
+
+
+def _bump(day, **increments):
+    stats = _stats_for(day)
+    DailyPaymentStats.objects.filter(pk=stats.pk).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + value for field, value in increments.items()}
+    )
+    return stats
+
+
+def record_created(payment):
+    _bump(timezone.localdate(payment.created_at), requests_created=1)
+
+
+def record_status_change(payment, old_status):
+    """
+    Count a payment reaching COMPLETED or FAILED.  Repeated callbacks for a
+    payment that is already final are ignored so nothing is counted twice.
+    """
+    if old_status in FINAL_STATUSES or payment.status not in FINAL_STATUSES:
+        return
+
+    finished_at = payment.updated_at or timezone.now()
+    day = timezone.localdate(finished_at)
+
+    with transaction.atomic():
+        if payment.status == PaymentRequest.STATUS_FAILED:
+            _bump(day, requests_failed=1)
+            return
+
+        seconds = max(int((finished_at - payment.created_at).total_seconds()), 0)
+        stats = _bump(day, requests_completed=1, revenue=payment.amount, seconds_to_complete=seconds)
+        bucket, _ = DailyCompletionBucket.objects.get_or_create(
+            stats=stats, upper_bound=latency_bucket(seconds)
+        )
+        DailyCompletionBucket.objects.filter(pk=bucket.pk).update(count=F('count') + 1)
+
+
+def rebuild_days(days):
+    """Recompute the given days from scratch.  Returns the number of days rebuilt."""
+    rebuilt = 0
+    for day in sorted(set(days)):
+        created = PaymentRequest.objects.filter(created_at__date=day).count()
+        finished = PaymentRequest.objects.filter(updated_at__date=day, status__in=FINAL_STATUSES)
+        failed = finished.filter(status=PaymentRequest.STATUS_FAILED).count()
+
+        revenue = Decimal('0')
+        total_seconds = 0
+        histogram = Counter()
+        completed = finished.filter(status=PaymentRequest.STATUS_COMPLETED)
+        for amount, created_at, updated_at in completed.values_list('amount', 'created_at', 'updated_at').iterator():
+            seconds = max(int((updated_at - created_at).total_seconds()), 0)
+            revenue += amount
+            total_seconds += seconds
+            histogram[latency_bucket(seconds)] += 1
+
+        with transaction.atomic():
+            stats = _stats_for(day)
+            stats.requests_created = created
+            stats.requests_completed = sum(histogram.values())
+            stats.requests_failed = failed
+            stats.revenue = revenue
+            stats.seconds_to_complete = total_seconds
+            stats.save()
+            stats.latency_buckets.all().delete()
+            DailyCompletionBucket.objects.bulk_create([
+                DailyCompletionBucket(stats=stats, upper_bound=bound, count=count)
+                for bound, count in histogram.items()
+            ])
+        rebuilt += 1
+    return rebuilt
+
+
+def dirty_days(since):
+    """Days whose figures may have changed for payments touched since ``since``."""
+    touched = PaymentRequest.objects.filter(updated_at__gte=since)
+    days = set(touched.dates('created_at', 'day'))
+    days.update(touched.dates('updated_at', 'day'))
+    return days
+
+
+def watermark():
+    """When the last catch-up run started, or None if none has finished."""
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('covered_until', flat=True).first()
+
+
+def set_watermark(covered_until):
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'covered_until': covered_until})
@@ -0,0 +1,269 @@
+"""
+In-process stand-in for the Safaricom Daraja API.
+
+Implements the three endpoints HomeConnect uses (OAuth, STK push and STK
+query) and fires ``stkCallback`` payloads back at the caller's CallBackURL
+after a configurable delay.  Used by the ``daraja_simulator`` command.
+"""
+import heapq
+import json
+import random
+import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+
+# Result codes Daraja actually returns for STK pushes
+RESULT_SUCCESS = (0, "The service request is processed successfully.")
+RESULT_FAILURES = [
+    (1032, "Request cancelled by user"),
+    (1, "The balance is insufficient for the transaction."),
+    (2001, "The initiator information is invalid."),
+]
+RESULT_TIMEOUT = (1037, "DS timeout user cannot be reached")
+
+
+class Checkout:
+    """One STK push as the simulator sees it."""
+
+    def __init__(self, merchant_request_id, checkout_request_id, amount, phone, callback_url):
+        self.merchant_request_id = merchant_request_id
+        self.checkout_request_id = checkout_request_id
+        self.amount = amount
+        self.phone = phone
+        self.callback_url = callback_url
+        self.outcome = None        # (result_code, result_desc) once decided
+        self.receipt = None
+        self.completed_at = None   # monotonic time the outcome becomes visible
+
+    def callback_payload(self):
+        code, desc = self.outcome
+        callback = {
+            "MerchantRequestID": self.merchant_request_id,
+            "CheckoutRequestID": self.checkout_request_id,
+            "ResultCode": code,
+            "ResultDesc": desc,
+        }
+        if code == 0:
+            callback["CallbackMetadata"] = {"Item": [
+                {"Name": "Amount", "Value": self.amount},
+                {"Name": "MpesaReceiptNumber", "Value": self.receipt},
+                {"Name": "TransactionDate", "Value": int(datetime.now().strftime('%Y%m%d%H%M%S'))},
+                {"Name": "PhoneNumber", "Value": self.phone},
+            ]}
+        return {"Body": {"stkCallback": callback}}
+
+
+class DarajaSimulator:
+    """
+    Shared state for the HTTP handler: issued tokens, checkouts and a
+    time-ordered queue of callbacks waiting to be delivered.
+    """
+
+    def __init__(self, callback_delay=2.0, failure_rate=0.1, timeout_rate=0.05,
+                 callback_url=None, workers=32, seed=None, log=print, response_latency=0.0):
+        self.callback_delay = callback_delay
+        self.response_latency = response_latency
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self.callback_url = callback_url
+        self.log = log
+        self.random = random.Random(seed)
+
+        self.tokens = set()
+        self.checkouts = {}
+        self.stats = {'pushes': 0, 'succeeded': 0, 'failed': 0, 'timed_out': 0,
+                      'delivered': 0, 'delivery_errors': 0}
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue = []   # heap of (due_at, checkout_request_id)
+        self._running = False
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='daraja-callback')
+        self._dispatcher = threading.Thread(target=self._dispatch, name='daraja-dispatcher', daemon=True)
+
+    # -------------------------
+    # API OPERATIONS
+    # -------------------------
+    def issue_token(self):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self.tokens.add(token)
+        return {"access_token": token, "expires_in": "3599"}
+
+    def is_authorized(self, header):
+        if not header or not header.startswith('Bearer '):
+            return False
+        with self._lock:
+            return header[len('Bearer '):] in self.tokens
+
+    def stk_push(self, payload):
+        checkout = Checkout(
+            merchant_request_id=f"{self.random.randint(10000, 99999)}-{uuid.uuid4().int % 10**8}-1",
+            checkout_request_id=f"ws_CO_{datetime.now():%d%m%Y%H%M%S}{uuid.uuid4().hex[:12]}",
+            amount=payload.get('Amount'),
+            phone=payload.get('PhoneNumber'),
+            callback_url=self.callback_url or payload.get('CallBackURL'),
+        )
+
+        # Decide the outcome up front so the STK query can answer consistently
+        roll = self.random.random()
+        due_at = time.monotonic() + self.callback_delay
+        with self._lock:
+            if roll < self.timeout_rate:
+                checkout.outcome = RESULT_TIMEOUT
+                self.stats['timed_out'] += 1
+            elif roll < self.timeout_rate + self.failure_rate:
+                checkout.outcome = self.random.choice(RESULT_FAILURES)
+                self.stats['failed'] += 1
+            else:
+                checkout.outcome = RESULT_SUCCESS
+                checkout.receipt = uuid.uuid4().hex[:10].upper()
+                self.stats['succeeded'] += 1
+            checkout.completed_at = due_at
+            self.checkouts[checkout.checkout_request_id] = checkout
+            self.stats['pushes'] += 1
+
+            # Timed-out pushes never call back; only the STK query sees them
+            if checkout.outcome is not RESULT_TIMEOUT and checkout.callback_url:
+                heapq.heappush(self._queue, (due_at, checkout.checkout_request_id))
+                self._wakeup.notify()
+
+        return {
+            "MerchantRequestID": checkout.merchant_request_id,
+            "CheckoutRequestID": checkout.checkout_request_id,
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing",
+        }
+
+    def stk_query(self, payload):
+        """Returns (http_status, body)."""
+        with self._lock:
+            checkout = self.checkouts.get(payload.get('CheckoutRequestID'))
+        if checkout is None:
+            return 400, {"requestId": uuid.uuid4().hex, "errorCode": "400.002.02",
+                         "errorMessage": "Bad Request - Invalid CheckoutRequestID"}
+        if time.monotonic() < checkout.completed_at:
+            return 500, {"requestId": uuid.uuid4().hex, "errorCode": "500.001.1001",
+                         "errorMessage": "The transaction is being processed"}
+
+        code, desc = checkout.outcome
+        return 200, {
+            "ResponseCode": "0",
+            "ResponseDescription": "The service request has been accepted successsfully",
+            "MerchantRequestID": checkout.merchant_request_id,
+            "CheckoutRequestID": checkout.checkout_request_id,
+            "ResultCode": str(code),
+            "ResultDesc": desc,
+        }
+
+    # -------------------------
+    # CALLBACK DELIVERY
+    # -------------------------
+    def start(self):
+        self._running = True
+        self._dispatcher.start()
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            self._wakeup.notify()
+        self._dispatcher.join()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self):
+        """Sleep until the earliest callback is due, then hand it to the pool."""
+        while True:
+            with self._lock:
+                while self._running and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    timeout = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._wakeup.wait(timeout)
+                if not self._running:
+                    return
+                _, checkout_id = heapq.heappop(self._queue)
+                checkout = self.checkouts[checkout_id]
+            self._pool.submit(self._deliver, checkout)
+
+    def _deliver(self, checkout):
+        body = json.dumps(checkout.callback_payload()).encode('utf-8')
+        req = Request(checkout.callback_url, data=body, method='POST',
+                      headers={'Content-Type': 'application/json'})
+        try:
+            with urlopen(req, timeout=30) as resp:
+                resp.read()
+            key = 'delivered'
+        except Exception as e:
+            self.log(f"Callback for {checkout.checkout_request_id} failed: {e}")
+            key = 'delivery_errors'
+        with self._lock:
+            self.stats[key] += 1
+
+
+def make_handler(simulator):
+    """Bind a request handler class to a simulator instance."""
+
+    class DarajaHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_json(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                return json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return None
+
+        def do_GET(self):
+            if urlparse(self.path).path != '/oauth/v1/generate':
+                return self._send(404, {"errorMessage": "Resource not found"})
+            if not self.headers.get('Authorization', '').startswith('Basic '):
+                return self._send(400, {"errorCode": "400.008.01", "errorMessage": "Invalid Authentication passed"})
+            self._send(200, simulator.issue_token())
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            if path not in ('/mpesa/stkpush/v1/processrequest', '/mpesa/stkpushquery/v1/query'):
+                return self._send(404, {"errorMessage": "Resource not found"})
+            if not simulator.is_authorized(self.headers.get('Authorization')):
+                return self._send(401, {"requestId": uuid.uuid4().hex, "errorCode": "404.001.03",
+                                        "errorMessage": "Invalid Access Token"})
+            payload = self._read_json()
+            if payload is None:
+                return self._send(400, {"errorCode": "400.002.02", "errorMessage": "Bad Request - Invalid JSON"})
+
+            # Real Daraja takes a second or more to answer; benchmarks need that wait
+            if simulator.response_latency:
+                time.sleep(simulator.response_latency)
+            if path.endswith('processrequest'):
+                self._send(200, simulator.stk_push(payload))
+            else:
+                self._send(*simulator.stk_query(payload))
+
+        def log_message(self, format, *args):
+            # Access logs would drown the output during load tests
+            pass
+
+    return DarajaHandler
+
+
+class SimulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Thousands of checkouts arrive at once during load tests
+    request_queue_size = 1024
+
+
+def make_server(simulator, host='127.0.0.1', port=8001):
+    return SimulatorServer((host, port), make_handler(simulator))
@@ -0,0 +1,332 @@
+import asyncio
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from notifications.models import Notification
+from .models import DailyCompletionBucket, DailyPaymentStats, MpesaTransaction, PaymentRequest
+from .simulator import DarajaSimulator, make_server
+from . import archive, daraja, rollups
+
+
+def run_in_thread(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+
+class CallbackTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('payer', email='payer@example.com')
+        self.payment = PaymentRequest.objects.create(user=self.user, amount=500, phone_number='254700000000',
+                                                     checkout_request_id='ws_CO_1')
+
+    def post(self, payload):
+        return self.client.post('/connectmpesa/callback/', json.dumps(payload), content_type='application/json')
+
+    def callback(self, result_code=0, receipt='RCPT1'):
+        callback = {'CheckoutRequestID': 'ws_CO_1', 'ResultCode': result_code, 'ResultDesc': 'done'}
+        if result_code == 0:
+            callback['CallbackMetadata'] = {'Item': [
+                {'Name': 'Amount', 'Value': 500}, {'Name': 'MpesaReceiptNumber', 'Value': receipt},
+            ]}
+        return {'Body': {'stkCallback': callback}}
+
+    def test_success_completes_the_payment_once(self):
+        for _ in range(2):
+            response = self.post(self.callback())
+            self.assertEqual(response.json(), {'received': True, 'transaction_id': 'RCPT1'})
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, PaymentRequest.STATUS_COMPLETED)
+        self.assertEqual(MpesaTransaction.objects.get().payment_request, self.payment)
+        self.assertEqual(Notification.objects.filter(kind=Notification.KIND_PAYMENT_RECEIVED).count(), 1)
+
+    def test_failure_marks_the_payment_failed(self):
+        self.post(self.callback(result_code=1032))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, PaymentRequest.STATUS_FAILED)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_malformed_payloads_are_refused(self):
+        for body in ('not json', '[1, 2]', '{"Body": {"stkCallback": []}}'):
+            response = self.client.post('/connectmpesa/callback/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(MpesaTransaction.objects.exists())
+
+
+class CallbackReceiver(BaseHTTPRequestHandler):
+    """Collects the bodies the simulator posts back."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        self.server.payloads.append(json.loads(body))
+        self.server.arrived.set()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SimulatorMixin:
+    """Runs a DarajaSimulator on a free port and points MPESA_BASE_URL at it."""
+
+    def start_simulator(self, **options):
+        receiver = HTTPServer(('127.0.0.1', 0), CallbackReceiver)
+        receiver.payloads, receiver.arrived = [], threading.Event()
+        self.receiver = receiver
+        callback_url = run_in_thread(receiver) + '/callback/'
+        self.addCleanup(stop, receiver)
+
+        options = {'callback_delay': 0, 'failure_rate': 0, 'timeout_rate': 0, 'seed': 1, **options}
+        self.simulator = DarajaSimulator(callback_url=callback_url, log=lambda msg: None, **options)
+        self.simulator.start()
+        self.addCleanup(self.simulator.stop)
+        server = make_server(self.simulator, port=0)
+        base_url = run_in_thread(server)
+        self.addCleanup(stop, server)
+
+        settings = override_settings(MPESA_BASE_URL=base_url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        daraja._token.update(value=None, expires_at=0.0)
+        self.addCleanup(daraja._token.update, value=None, expires_at=0.0)
+
+
+class DarajaSimulatorTests(SimulatorMixin, TestCase):
+    def setUp(self):
+        self.start_simulator()
+
+    def test_push_query_and_callback_round_trip(self):
+        user = User.objects.create_user('payer')
+        reply = daraja.stk_push('254700000000', 500, 'Invoice-1', 'Test', 'http://unused.invalid/')
+        self.assertEqual(reply['ResponseCode'], '0')
+        payment = PaymentRequest.objects.create(user=user, amount=500, phone_number='254700000000',
+                                                checkout_request_id=reply['CheckoutRequestID'])
+
+        self.assertEqual(daraja.stk_query(reply['CheckoutRequestID'])['ResultCode'], '0')
+        self.assertTrue(self.receiver.arrived.wait(5))
+        payload, = self.receiver.payloads
+        self.assertEqual(payload['Body']['stkCallback']['CheckoutRequestID'], reply['CheckoutRequestID'])
+
+        self.client.post('/connectmpesa/callback/', json.dumps(payload), content_type='application/json')
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, PaymentRequest.STATUS_COMPLETED)
+        self.assertEqual(self.simulator.stats['succeeded'], 1)
+
+    def test_unknown_checkout_and_bad_token(self):
+        self.assertEqual(daraja.stk_query('ws_CO_missing')['errorCode'], '400.002.02')
+        daraja._token.update(value='forged', expires_at=float('inf'))
+        self.assertEqual(daraja.stk_query('ws_CO_missing')['errorCode'], '404.001.03')
+
+
+class AsyncPaymentViewTests(SimulatorMixin, TestCase):
+    def setUp(self):
+        self.start_simulator(callback_delay=60)
+        self.user = User.objects.create_user('payer')
+
+    async def test_start_payment_records_the_checkout(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post('/connectmpesa/start/', {'amount': '250', 'phone': '254700000000'})
+        data = response.json()
+        self.assertEqual(data['status'], 'ok')
+
+        payment = await PaymentRequest.objects.aget(user=self.user)
+        self.assertEqual(payment.checkout_request_id, data['checkout_request_id'])
+        self.assertEqual((await DailyPaymentStats.objects.aget()).requests_created, 1)
+        # Outside ASGI every call closes its own client rather than keeping one
+        self.assertIsNone(daraja._aclient_state['current'])
+
+        response = await self.async_client.get(f'/connectmpesa/connectmpesa/status/{payment.pk}/')
+        self.assertEqual(response.json(), {'status': 'ok', 'payment_status': PaymentRequest.STATUS_PENDING})
+
+    def test_missing_fields_and_other_users_payments(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post('/connectmpesa/start/', {'amount': '250'}).json()['status'], 'error')
+        self.assertFalse(PaymentRequest.objects.exists())
+
+        other = PaymentRequest.objects.create(user=User.objects.create_user('other'), amount=1, phone_number='1')
+        response = self.client.get(f'/connectmpesa/connectmpesa/status/{other.pk}/')
+        self.assertEqual(response.json()['status'], 'error')
+
+    def test_shared_client_is_reused_on_one_loop(self):
+        self.addCleanup(daraja._aclient_state.update, shared=False, current=None)
+        daraja.share_async_client()
+
+        async def two_queries():
+            clients = []
+            for _ in range(2):
+                await daraja.astk_query('ws_CO_missing')
+                clients.append(daraja._aclient_state['current'][1])
+            await clients[0].aclose()
+            return clients
+
+        first, second = asyncio.run(two_queries())
+        self.assertIs(first, second)
+
+
+class DarajaSimulatorCommandTests(SimpleTestCase):
+    def test_rates_are_validated(self):
+        for rates in (['--failure-rate', '1.5'], ['--failure-rate', '0.6', '--timeout-rate', '0.6']):
+            with self.assertRaises(CommandError):
+                call_command('daraja_simulator', *rates)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('payer')
+        payment = PaymentRequest.objects.create(user=self.user, amount=500, phone_number='254700000000')
+        MpesaTransaction.objects.create(mpesa_transaction_id='RCPT1', payment_request=payment, amount=500,
+                                        result_code=0, raw_payload={'Body': {}})
+
+    def test_transactions_export_is_staff_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/connectmpesa/transactions/export/')
+        self.assertEqual(response.status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/connectmpesa/transactions/export/', {'format': 'jsonl'})
+        row = json.loads(b''.join(response.streaming_content))
+        self.assertEqual((row['mpesa_transaction_id'], row['user']), ('RCPT1', 'payer'))
+
+    def test_since_is_validated(self):
+        self.client.force_login(self.user)
+        for since in ('2025-02-30', 'last-week'):
+            self.assertEqual(self.client.get('/connectmpesa/payments/export/', {'since': since}).status_code, 400)
+        response = self.client.get('/connectmpesa/payments/export/', {'since': '2000-01-01'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(MPESA_ARCHIVE_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.old = [
+            self.transaction(f'OLD{i}', timezone.make_aware(datetime(2024, month, 10 + i)))
+            for i, month in enumerate([1, 1, 1, 2])
+        ]
+        self.recent = self.transaction('NEW', timezone.now())
+
+    def transaction(self, receipt, created_at):
+        return MpesaTransaction.objects.create(mpesa_transaction_id=receipt, amount=1, created_at=created_at,
+                                               raw_payload={'receipt': receipt, 'items': [1, 2, 3]})
+
+    def archive(self):
+        out = StringIO()
+        call_command('archive_mpesa_payloads', '--batch-size', '2', stdout=out)
+        return out.getvalue()
+
+    def test_payloads_move_to_the_monthly_file(self):
+        self.assertIn("Archived 4 payloads", self.archive())
+
+        lines = gzip.decompress(archive.archive_path('2024-01').read_bytes()).decode().splitlines()
+        self.assertEqual([json.loads(line)['receipt'] for line in lines], ['OLD0', 'OLD1', 'OLD2'])
+        self.assertTrue(archive.archive_path('2024-02').exists())
+
+        for txn in self.old:
+            txn = MpesaTransaction.objects.get(pk=txn.pk)
+            self.assertIsNone(txn.raw_payload)
+            self.assertTrue(txn.is_archived)
+            self.assertEqual(txn.payload, {'receipt': txn.mpesa_transaction_id, 'items': [1, 2, 3]})
+        recent = MpesaTransaction.objects.get(pk=self.recent.pk)
+        self.assertFalse(recent.is_archived)
+        self.assertEqual(recent.payload['receipt'], 'NEW')
+
+    def test_rerun_is_idempotent(self):
+        self.archive()
+        sizes = {path.name: path.stat().st_size for path in self.root.iterdir()}
+        self.assertIn("Archived 0 payloads", self.archive())
+        self.assertEqual({path.name: path.stat().st_size for path in self.root.iterdir()}, sizes)
+        self.assertEqual(MpesaTransaction.objects.get(pk=self.old[2].pk).payload['receipt'], 'OLD2')
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('payer')
+
+    def pay(self, amount, status, seconds_ago):
+        payment = PaymentRequest.objects.create(user=self.user, amount=amount, phone_number='254700000000',
+                                                created_at=timezone.now() - timedelta(seconds=seconds_ago))
+        rollups.record_created(payment)
+        if status != PaymentRequest.STATUS_PENDING:
+            payment.status = status
+            payment.save()
+            rollups.record_status_change(payment, PaymentRequest.STATUS_PENDING)
+            # A repeated callback is not counted again
+            rollups.record_status_change(payment, status)
+        return payment
+
+    def figures(self):
+        return (
+            list(DailyPaymentStats.objects.order_by('day').values_list(
+                'day', 'requests_created', 'requests_completed', 'requests_failed', 'revenue', 'seconds_to_complete')),
+            list(DailyCompletionBucket.objects.order_by('stats__day', 'upper_bound').values_list(
+                'stats__day', 'upper_bound', 'count')),
+        )
+
+    def test_incremental_counters_match_a_rebuild(self):
+        self.pay(100, PaymentRequest.STATUS_COMPLETED, 10)
+        self.pay(250, PaymentRequest.STATUS_COMPLETED, 100)
+        self.pay(40, PaymentRequest.STATUS_COMPLETED, 4000)
+        self.pay(75, PaymentRequest.STATUS_FAILED, 50)
+        self.pay(60, PaymentRequest.STATUS_PENDING, 5)
+
+        incremental = self.figures()
+        stats = DailyPaymentStats.objects.get(day=timezone.localdate())
+        self.assertEqual((stats.requests_completed, stats.requests_failed), (3, 1))
+        self.assertEqual(sum(s[1] for s in incremental[0]), 5)
+        self.assertEqual(sum(s[4] for s in incremental[0]), 390)
+
+        DailyPaymentStats.objects.update(requests_created=0, requests_completed=0, revenue=0)
+        DailyCompletionBucket.objects.all().delete()
+        days = rollups.dirty_days(timezone.now() - timedelta(days=1))
+        self.assertEqual(rollups.rebuild_days(days), len(days))
+        self.assertEqual(self.figures(), incremental)
+
+    def test_catch_up_advances_the_watermark(self):
+        self.assertIsNone(rollups.watermark())
+        self.pay(100, PaymentRequest.STATUS_COMPLETED, 10)
+        DailyPaymentStats.objects.all().delete()
+
+        out = StringIO()
+        call_command('rollup_payments', stdout=out)
+        self.assertIn("for 1 day(s)", out.getvalue())
+        first = rollups.watermark()
+        self.assertIsNotNone(first)
+        self.assertEqual(DailyPaymentStats.objects.get().requests_completed, 1)
+
+        # Payments untouched since the watermark are left alone by the next run
+        self.assertEqual(rollups.dirty_days(first + timedelta(minutes=1)), set())
+
+        # A --since past the watermark would leave a gap, so it doesn't move it
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        call_command('rollup_payments', '--since', tomorrow.isoformat(), stdout=StringIO())
+        self.assertEqual(rollups.watermark(), first)
+        call_command('rollup_payments', stdout=StringIO())
+        self.assertGreater(rollups.watermark(), first)
+
+        with self.assertRaises(CommandError):
+            call_command('rollup_payments', '--since', '2025-02-30')
@@ -7,4 +7,7 @@ urlpatterns = [
     path('start/', views.start_payment, name='start_payment'),
     path('callback/', views.mpesa_callback, name='mpesa_callback'),
     path('connectmpesa/status/<int:pk>/', views.payment_status, name='payment_status'),
+    path('reports/daily/', views.daily_report, name='daily_report'),
+    path('payments/export/', views.export_payments, name='export_payments'),
+    path('transactions/export/', views.export_transactions, name='export_transactions'),
 ]
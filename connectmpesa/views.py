@@ -2,14 +2,25 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from asgiref.sync import sync_to_async
 
 from .models import PaymentRequest, MpesaTransaction
 from .forms import MpesaPaymentForm
-from django.conf import settings
-from django_daraja.mpesa.core import MpesaClient
-
-@login_required
-def start_payment(request):
+from notifications import outbox
+from . import daraja, rollups
+from .models import DailyPaymentStats
+from .exports import (
+    MPESA_TRANSACTION_COLUMNS, PAYMENT_REQUEST_COLUMNS,
+    mpesa_transaction_export_queryset, payment_request_export_queryset,
+)
+from HomeConnect.aio import arender, login_required_async
+from HomeConnect.exports import FORMATS as EXPORT_FORMATS, export_response
+
+@login_required_async
+async def start_payment(request):
     """
     Initiates an M-Pesa STK Push for the logged-in user.
     """
@@ -21,37 +32,29 @@ def start_payment(request):
             return JsonResponse({'status': 'error', 'message': 'Amount and phone number are required.'})
 
         # Create a payment request with pending status
-        payment_request = PaymentRequest.objects.create(
+        payment_request = await PaymentRequest.objects.acreate(
             user=request.user,
             amount=amount,
             phone_number=phone,
             status=PaymentRequest.STATUS_PENDING
         )
+        await sync_to_async(rollups.record_created)(payment_request)
 
-        # Initialize M-Pesa client with settings
-        cl = MpesaClient(
-            consumer_key=settings.MPESA_CONSUMER_KEY,
-            consumer_secret=settings.MPESA_CONSUMER_SECRET,
-            environment=settings.MPESA_ENVIRONMENT
-        )
-
+        # MPESA_BASE_URL decides whether this hits Safaricom or the local simulator
         try:
-            response = cl.stk_push(
+            resp_data = await daraja.astk_push(
                 phone_number=phone,
                 amount=int(amount),
                 account_reference=f"Invoice-{payment_request.pk}",
                 transaction_desc="Payment for HomeConnect service",
-                callback_url=' https://unhonied-salutatorily-christena.ngrok-free.dev/connectmpesa/callback/',
+                callback_url=daraja.build_callback_url(),
             )
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)})
 
-        # Parse response
-        resp_data = response.json() if hasattr(response, 'json') else response
-
         # Save CheckoutRequestID to payment request
         payment_request.checkout_request_id = resp_data.get('CheckoutRequestID')
-        payment_request.save()
+        await payment_request.asave()
 
         return JsonResponse({
             'status': 'ok',
@@ -61,7 +64,7 @@ def start_payment(request):
         })
 
     # GET request: render a simple payment form
-    return render(request, 'connectmpesa/start_payment.html', {})
+    return await arender(request, 'connectmpesa/start_payment.html', {})
 
 @csrf_exempt
 def mpesa_callback(request):
@@ -78,32 +81,58 @@ def mpesa_callback(request):
     except Exception:
         return HttpResponseBadRequest("Invalid JSON payload.")
 
-    checkout_id = data.get('CheckoutRequestID') or data.get('checkout_request_id')
-    receipt = data.get('MpesaReceiptNumber') or data.get('mpesa_transaction_id')
-    amount = data.get('Amount') or data.get('amount')
-    result_code = data.get('ResultCode') or data.get('result_code')
-    result_desc = data.get('ResultDesc') or data.get('result_desc')
+    if not isinstance(data, dict):
+        return HttpResponseBadRequest("Callback payload must be a JSON object.")
+
+    # Daraja nests the result under Body.stkCallback; older clients post it flat
+    if 'Body' in data:
+        callback = data['Body'].get('stkCallback') if isinstance(data['Body'], dict) else None
+        if not isinstance(callback, dict):
+            return HttpResponseBadRequest("Body.stkCallback must be a JSON object.")
+        fields = dict(callback)
+        metadata = callback.get('CallbackMetadata')
+        items = metadata.get('Item') if isinstance(metadata, dict) else None
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, dict):
+                fields[item.get('Name')] = item.get('Value')
+    else:
+        fields = data
+
+    checkout_id = fields.get('CheckoutRequestID') or fields.get('checkout_request_id')
+    receipt = fields.get('MpesaReceiptNumber') or fields.get('mpesa_transaction_id')
+    amount = fields.get('Amount') or fields.get('amount')
+    result_code = fields.get('ResultCode', fields.get('result_code'))
+    result_desc = fields.get('ResultDesc') or fields.get('result_desc')
 
     # Find the corresponding payment request (if any)
     payment_request = PaymentRequest.objects.filter(checkout_request_id=checkout_id).first()
 
-    # Save transaction record
-    txn = MpesaTransaction.objects.create(
-        payment_request=payment_request,
-        mpesa_transaction_id=receipt or f"UNK-{checkout_id or 'no-checkout'}",
-        amount=amount or 0,
-        result_code=result_code,
-        result_desc=result_desc,
-        raw_payload=data
-    )
-
-    # Update payment request status
-    if payment_request:
-        if str(result_code) in ['0', 0]:
-            payment_request.status = PaymentRequest.STATUS_COMPLETED
-        else:
-            payment_request.status = PaymentRequest.STATUS_FAILED
-        payment_request.save()
+    # The transaction row and the status change commit together, so a crash
+    # between them can't leave a callback that is recorded but never applied
+    with transaction.atomic():
+        # Save transaction record; Daraja retries callbacks, so a repeat is a no-op
+        txn, created = MpesaTransaction.objects.get_or_create(
+            mpesa_transaction_id=receipt or f"UNK-{checkout_id or 'no-checkout'}",
+            defaults={
+                'payment_request': payment_request,
+                'amount': amount or 0,
+                'result_code': result_code,
+                'result_desc': result_desc,
+                'raw_payload': data,
+            },
+        )
+        if created and payment_request:
+            # Re-read under lock: another callback for this checkout may have moved it
+            payment_request = PaymentRequest.objects.select_for_update().get(pk=payment_request.pk)
+            old_status = payment_request.status
+            if str(result_code) in ['0', 0]:
+                payment_request.status = PaymentRequest.STATUS_COMPLETED
+            else:
+                payment_request.status = PaymentRequest.STATUS_FAILED
+            payment_request.save()
+            rollups.record_status_change(payment_request, old_status)
+            if payment_request.status == PaymentRequest.STATUS_COMPLETED and old_status != PaymentRequest.STATUS_COMPLETED:
+                outbox.notify_payment_received(payment_request, receipt)
 
     return JsonResponse({'received': True, 'transaction_id': txn.mpesa_transaction_id})
 
@@ -116,17 +145,105 @@ def payment_history(request):
     requests = PaymentRequest.objects.filter(user=request.user).order_by('-created_at')
     return render(request, 'connectmpesa/payment_history.html', {'requests': requests})
 
-@login_required
-def payment_status(request, pk):
+@login_required_async
+async def payment_status(request, pk):
     """
     Return the current status of a payment request.
     """
-    try:
-        payment = PaymentRequest.objects.get(pk=pk, user=request.user)
-    except PaymentRequest.DoesNotExist:
+    status = await PaymentRequest.objects.filter(pk=pk, user=request.user).values_list('status', flat=True).afirst()
+    if status is None:
         return JsonResponse({'status': 'error', 'message': 'Payment not found'})
 
     return JsonResponse({
         'status': 'ok',
-        'payment_status': payment.status
+        'payment_status': status
     })
+
+
+def _date_param(request, name):
+    """
+    ?name=YYYY-MM-DD as a date, or None if absent.  Raises ValueError for
+    anything else, including a date that doesn't exist (2025-02-30).
+    """
+    value = request.GET.get(name)
+    if not value:
+        return None
+    when = parse_date(value)
+    if when is None:
+        raise ValueError(f"{name} is not a YYYY-MM-DD date")
+    return when
+
+
+@staff_member_required
+def daily_report(request):
+    """
+    Daily revenue and funnel figures from the rollup tables.
+    Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD bounds (inclusive).
+    """
+    stats = DailyPaymentStats.objects.prefetch_related('latency_buckets')
+    try:
+        start = _date_param(request, 'start')
+        end = _date_param(request, 'end')
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid date.'}, status=400)
+    if start:
+        stats = stats.filter(day__gte=start)
+    if end:
+        stats = stats.filter(day__lte=end)
+
+    return JsonResponse({'days': [
+        {
+            'day': s.day.isoformat(),
+            'requests_created': s.requests_created,
+            'requests_completed': s.requests_completed,
+            'requests_failed': s.requests_failed,
+            'revenue': str(s.revenue),
+            'success_rate': s.success_rate,
+            'average_seconds_to_complete': s.average_seconds_to_complete,
+            'median_seconds_to_complete': s.median_seconds_to_complete,
+        }
+        for s in stats[:366]
+    ]})
+
+
+@login_required
+def export_payments(request):
+    """
+    Stream payment requests as CSV or JSONL: the user's own, or everyone's
+    for staff.  ?format=csv|jsonl&status=&since=YYYY-MM-DD
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("format must be csv or jsonl")
+
+    payments = PaymentRequest.objects.all() if request.user.is_staff else PaymentRequest.objects.filter(user=request.user)
+    if request.GET.get('status'):
+        payments = payments.filter(status=request.GET['status'])
+    try:
+        since = _date_param(request, 'since')
+    except ValueError:
+        return HttpResponseBadRequest("since must be a valid YYYY-MM-DD date")
+    if since:
+        payments = payments.filter(created_at__date__gte=since)
+
+    return export_response(payment_request_export_queryset(payments).order_by('pk'),
+                           PAYMENT_REQUEST_COLUMNS, fmt, 'payment-requests')
+
+
+@staff_member_required
+def export_transactions(request):
+    """Stream M-Pesa transactions as CSV or JSONL.  ?format=csv|jsonl&since=YYYY-MM-DD"""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("format must be csv or jsonl")
+
+    transactions = MpesaTransaction.objects.all()
+    try:
+        since = _date_param(request, 'since')
+    except ValueError:
+        return HttpResponseBadRequest("since must be a valid YYYY-MM-DD date")
+    if since:
+        transactions = transactions.filter(created_at__date__gte=since)
+
+    return export_response(mpesa_transaction_export_queryset(transactions).order_by('pk'),
+                           MPESA_TRANSACTION_COLUMNS, fmt, 'mpesa-transactions')
@@ -0,0 +1,26 @@
+from django.contrib import admin
+from .models import Notification, Reminder
+
+
+@admin.register(Reminder)
+class ReminderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'recipient', 'due_at', 'sent_at', 'cancelled')
+    list_filter = ('kind', 'cancelled')
+    search_fields = ('recipient__username',)
+    list_select_related = ('recipient',)
+    raw_id_fields = ('recipient', 'booking', 'service_request')
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'to_email', 'created_at', 'locked_until', 'sent_at', 'attempts')
+    list_filter = ('kind',)
+    search_fields = ('to_email', 'recipient__username')
+    list_select_related = ('recipient',)
+    raw_id_fields = ('recipient',)
+
+    def get_exclude(self, request, obj=None):
+        # The body holds a live reset link for the recipient's account
+        if obj is not None and obj.kind == Notification.KIND_PASSWORD_RESET:
+            return ('body', 'html_body')
+        return super().get_exclude(request, obj)
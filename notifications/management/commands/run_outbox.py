@@ -0,0 +1,42 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = "Send queued notification emails in batches over one mail connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds between polls when the outbox is empty.")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--once', action='store_true', help="Send everything queued now and exit.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        connection = get_connection()
+        try:
+            while True:
+                try:
+                    claimed, sent, failed = outbox.drain(connection, batch_size)
+                except Exception as e:
+                    # The batch was released; it is retried on the next poll
+                    self.stderr.write(f"Sending failed: {e!r}")
+                    claimed = sent = failed = 0
+                    if options['once']:
+                        break
+                if sent:
+                    self.stdout.write(f"Sent {sent} email(s) for {claimed} notification(s).")
+                if failed:
+                    self.stderr.write(f"{failed} email(s) failed and will be retried.")
+                # A full batch means more are probably waiting
+                if claimed < batch_size:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
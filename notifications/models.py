@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+
+
+class Reminder(models.Model):
+    """
+    A message to send at ``due_at``.  The worker follows new rows with an id
+    cursor instead of re-reading the table.  Rows are stamped sent before
+    their email goes out; a failed send clears the stamp again, and only the
+    worker's periodic full resync picks those rows back up.
+    """
+
+    KIND_BOOKING_UPCOMING = "booking_upcoming"
+    KIND_REQUEST_PENDING = "request_pending"
+
+    KIND_CHOICES = [
+        (KIND_BOOKING_UPCOMING, "Upcoming booking"),
+        (KIND_REQUEST_PENDING, "Request still pending"),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reminders")
+    due_at = models.DateTimeField()
+
+    booking = models.ForeignKey("booking.Booking", on_delete=models.CASCADE, null=True, blank=True, related_name="reminders")
+    occurrence_start = models.DateTimeField(null=True, blank=True)
+    service_request = models.ForeignKey(
+        "services.ServiceRequest", on_delete=models.CASCADE, null=True, blank=True, related_name="reminders"
+    )
+
+    sent_at = models.DateTimeField(null=True, blank=True)
+    cancelled = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["due_at"]
+        indexes = [
+            # Only unsent reminders are ever scanned by due time
+            models.Index(fields=["due_at"], name="reminder_unsent_due_idx", condition=Q(sent_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.recipient} at {self.due_at:%Y-%m-%d %H:%M}"
+
+
+class Notification(models.Model):
+    """
+    An email waiting in the outbox.  Rows are written in the same transaction
+    as the change they announce, so a rolled-back change never mails anyone
+    and a committed one always does; the ``run_outbox`` worker sends them
+    (see notifications.outbox).
+    """
+
+    KIND_PASSWORD_RESET = "password_reset"
+    KIND_REQUEST_NEW = "request_new"
+    KIND_REQUEST_ACCEPTED = "request_accepted"
+    KIND_PAYMENT_RECEIVED = "payment_received"
+
+    KIND_CHOICES = [
+        (KIND_PASSWORD_RESET, "Password reset"),
+        (KIND_REQUEST_NEW, "New request"),
+        (KIND_REQUEST_ACCEPTED, "Request accepted"),
+        (KIND_PAYMENT_RECEIVED, "Payment received"),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notifications")
+    # Address at the time of the change, so a later profile edit doesn't redirect it
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    # May be folded into one digest email with the recipient's other queued notifications
+    digestible = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set while a worker is sending the row; a lapsed lease makes it claimable again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # The worker only ever scans the unsent tail of the table
+            models.Index(fields=["id"], name="outbox_unsent_idx", condition=Q(sent_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email}"
@@ -0,0 +1,217 @@
+"""
+Notification outbox.
+
+Emails are queued as Notification rows inside the transaction that makes
+the change they announce (a request created or accepted, a payment
+confirmed, a password reset asked for), so the email exists exactly when
+the change does.  The ``run_outbox`` worker leases unsent rows in batches
+(for NOTIFICATION_LEASE_SECONDS) and sends them one email at a time over
+one EMAIL_BACKEND connection that stays open between batches, stamping
+each row sent as soon as its email is accepted.  When
+``NOTIFICATION_DIGEST_THRESHOLD`` or more notifications for the same
+recipient are in a batch they go out as a single digest email.
+
+Delivery is at least once: an email the server refuses has its rows
+released for the next poll and charged an attempt (up to
+NOTIFICATION_MAX_ATTEMPTS) while the rest of the batch still goes out,
+and a batch held by a worker that died is claimed again once its lease
+lapses, which may repeat messages the server had already accepted.
+Password reset links are wiped from a row once it is sent.
+"""
+import smtplib
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from services.models import ServiceRequest
+from .models import Notification
+
+
+def digest_threshold():
+    return getattr(settings, 'NOTIFICATION_DIGEST_THRESHOLD', 3)
+
+
+def max_attempts():
+    return getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 5)
+
+
+def lease_seconds():
+    # Must outlast sending one batch, or another worker sends it too
+    return getattr(settings, 'NOTIFICATION_LEASE_SECONDS', 300)
+
+
+def provider_name(provider):
+    return provider.company_name or provider.user.username
+
+
+# -------------------------
+# ENQUEUEING
+# -------------------------
+def enqueue(recipient, kind, subject, body, html_body='', digestible=True):
+    """Queue one email for ``recipient``.  Returns None if they have no address."""
+    if not recipient.email:
+        return None
+    return Notification.objects.create(
+        kind=kind, recipient=recipient, to_email=recipient.email,
+        subject=subject, body=body, html_body=html_body, digestible=digestible,
+    )
+
+
+def notify_new_request(service_request, users):
+    """Tell each provider account in ``users`` about a request waiting for them."""
+    sr = service_request
+    body = f"{sr.homeowner.username} asked for {sr.service.name}."
+    if sr.description:
+        body += f"\n\n{sr.description}"
+    return Notification.objects.bulk_create([
+        Notification(
+            kind=Notification.KIND_REQUEST_NEW, recipient=user, to_email=user.email,
+            subject=f"New {sr.service.name} request from {sr.homeowner.username}", body=body,
+        )
+        for user in users if user.email
+    ])
+
+
+def notify_request_accepted(request_ids):
+    """Tell the homeowners of ``request_ids`` that a provider took their request."""
+    requests = ServiceRequest.objects.filter(pk__in=request_ids).select_related('homeowner', 'service', 'provider__user')
+    return Notification.objects.bulk_create([
+        Notification(
+            kind=Notification.KIND_REQUEST_ACCEPTED, recipient=sr.homeowner, to_email=sr.homeowner.email,
+            subject=f"Your {sr.service.name} request was accepted",
+            body=f"{provider_name(sr.provider)} accepted request {sr.pk} and will be in touch.",
+        )
+        for sr in requests if sr.homeowner.email and sr.provider_id
+    ])
+
+
+def notify_payment_received(payment_request, receipt=None):
+    body = f"We received KES {payment_request.amount} from {payment_request.phone_number}."
+    if receipt:
+        body += f"\n\nM-Pesa receipt: {receipt}"
+    return enqueue(payment_request.user, Notification.KIND_PAYMENT_RECEIVED,
+                   f"Payment of KES {payment_request.amount} received", body)
+
+
+# -------------------------
+# MESSAGE BUILDING
+# -------------------------
+def build_message(notification):
+    message = EmailMultiAlternatives(notification.subject, notification.body,
+                                     settings.DEFAULT_FROM_EMAIL, [notification.to_email])
+    if notification.html_body:
+        message.attach_alternative(notification.html_body, 'text/html')
+    return message
+
+
+def build_digest(notifications):
+    entries = "\n\n".join(f"{n.subject}\n{n.body}" for n in notifications)
+    return EmailMultiAlternatives(f"You have {len(notifications)} new notifications on HomeConnect", entries,
+                                  settings.DEFAULT_FROM_EMAIL, [notifications[-1].to_email])
+
+
+def build_messages(notifications):
+    """
+    The emails for a batch as (notifications, message) pairs: one per
+    notification, except that a recipient with ``digest_threshold()`` or
+    more digestible ones gets a single digest covering all of them.
+    """
+    by_recipient = defaultdict(list)
+    for n in notifications:
+        if n.digestible:
+            by_recipient[n.recipient_id].append(n)
+
+    messages = []
+    for n in notifications:
+        group = by_recipient.get(n.recipient_id, ()) if n.digestible else ()
+        if len(group) < digest_threshold():
+            messages.append(([n], build_message(n)))
+        elif group[0] is n:
+            messages.append((group, build_digest(group)))
+    return messages
+
+
+# -------------------------
+# WORKER
+# -------------------------
+def claim(batch_size):
+    """Lease and return the oldest unsent notifications, skipping rows another worker holds."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Notification.objects.filter(sent_at__isnull=True, attempts__lt=max_attempts())
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lte=now))
+            .select_for_update(skip_locked=True).order_by('pk')[:batch_size]
+        )
+        Notification.objects.filter(pk__in=[n.pk for n in batch]).update(
+            locked_until=now + timedelta(seconds=lease_seconds()),
+        )
+    return batch
+
+
+def release(batch, error=None):
+    """Drop the lease on ``batch``; with an ``error``, also charge each row an attempt."""
+    updates = {'locked_until': None}
+    if error is not None:
+        updates.update(attempts=F('attempts') + 1, last_error=repr(error))
+    Notification.objects.filter(pk__in=[n.pk for n in batch]).update(**updates)
+
+
+def mark_sent(batch):
+    pks = [n.pk for n in batch]
+    with transaction.atomic():
+        Notification.objects.filter(pk__in=pks).update(sent_at=timezone.now(), locked_until=None)
+        # A sent reset link has no business sitting in the database
+        Notification.objects.filter(pk__in=pks, kind=Notification.KIND_PASSWORD_RESET).update(body='', html_body='')
+
+
+def send(message, connection):
+    # send_messages only closes connections it opened itself, so once
+    # drain() has opened it the connection stays up for the next batch
+    try:
+        return connection.send_messages([message]) or 0
+    except smtplib.SMTPServerDisconnected:
+        # The server dropped the connection while we sat idle; reconnect once
+        connection.close()
+        connection.open()
+        return connection.send_messages([message]) or 0
+
+
+def drain(connection=None, batch_size=100):
+    """
+    Claim and send one batch.  Returns (notifications claimed, emails sent,
+    emails that failed).  Raises, with the batch released, only if the
+    connection cannot be opened at all.
+    """
+    batch = claim(batch_size)
+    if not batch:
+        return 0, 0, 0
+
+    own_connection = connection is None
+    connection = connection or get_connection()
+    sent = failed = 0
+    try:
+        try:
+            # A no-op while the connection is up
+            connection.open()
+        except Exception:
+            # No row is at fault, so none is charged an attempt
+            release(batch)
+            raise
+        for notifications, message in build_messages(batch):
+            try:
+                sent += send(message, connection)
+            except Exception as e:
+                release(notifications, error=e)
+                failed += 1
+            else:
+                mark_sent(notifications)
+    finally:
+        if own_connection:
+            connection.close()
+    return len(batch), sent, failed
@@ -0,0 +1,204 @@
+"""
+Reminder scheduling and delivery.
+
+Reminder rows are created when bookings and service requests are saved (see
+notifications.signals).  The ``run_reminders`` worker keeps the ones due in
+the next few minutes in a heap ordered by due time, tops the heap up with an
+indexed range query plus an id cursor for rows inserted since the last poll,
+and sends whatever is due in batches over one EMAIL_BACKEND connection.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from booking.models import Booking
+from booking.recurrence import expand
+from services.models import ServiceRequest
+from .models import Reminder
+
+
+def booking_lead():
+    return timedelta(minutes=getattr(settings, 'REMINDER_BOOKING_LEAD_MINUTES', 60))
+
+
+def request_pending_after():
+    return timedelta(hours=getattr(settings, 'REMINDER_REQUEST_PENDING_HOURS', 24))
+
+
+# -------------------------
+# SCHEDULING
+# -------------------------
+def schedule_booking_reminder(booking, after=None):
+    """
+    Schedule a reminder for the booking's next occurrence starting after
+    ``after``.  Recurring series only ever have one reminder queued; the next
+    one is scheduled when it fires.
+    """
+    after = after or timezone.now()
+    upcoming = sorted(expand(booking, after, after + timedelta(days=400)), key=lambda o: o.start)
+    upcoming = [o for o in upcoming if o.start > after]
+    if not upcoming:
+        return None
+
+    occ = upcoming[0]
+    return Reminder.objects.create(
+        kind=Reminder.KIND_BOOKING_UPCOMING,
+        recipient=booking.homeowner,
+        due_at=max(occ.start - booking_lead(), timezone.now()),
+        booking=booking,
+        occurrence_start=occ.original_start,
+    )
+
+
+def schedule_request_reminder(service_request):
+    return Reminder.objects.create(
+        kind=Reminder.KIND_REQUEST_PENDING,
+        recipient=service_request.provider.user,
+        due_at=service_request.created_at + request_pending_after(),
+        service_request=service_request,
+    )
+
+
+def schedule_request_reminders(service_requests):
+    """schedule_request_reminder for requests saved by bulk_create (which sends no post_save)."""
+    return Reminder.objects.bulk_create([
+        Reminder(
+            kind=Reminder.KIND_REQUEST_PENDING,
+            recipient_id=sr.provider.user_id,
+            due_at=sr.created_at + request_pending_after(),
+            service_request=sr,
+        )
+        for sr in service_requests
+    ])
+
+
+# -------------------------
+# MESSAGE BUILDING
+# -------------------------
+def build_message(reminder):
+    """Return the EmailMessage for a reminder, or None if it no longer applies."""
+    if not reminder.recipient.email:
+        return None
+
+    if reminder.kind == Reminder.KIND_BOOKING_UPCOMING:
+        booking = reminder.booking
+        if booking is None or booking.status not in Booking.ACTIVE_STATUSES:
+            return None
+        # The occurrence may have been skipped or moved since we scheduled it
+        occ = next((o for o in expand(booking, reminder.occurrence_start, reminder.occurrence_start + booking.duration)
+                    if o.original_start == reminder.occurrence_start), None)
+        if occ is None:
+            return None
+        when = timezone.localtime(occ.start)
+        provider = booking.provider.company_name or booking.provider.user.username
+        subject = f"Reminder: {booking.service.name} at {when:%H:%M}"
+        body = f"Hi {reminder.recipient.username},\n\nYour {booking.service.name} provider {provider} arrives at {when:%A %d %B, %H:%M}."
+
+    elif reminder.kind == Reminder.KIND_REQUEST_PENDING:
+        sr = reminder.service_request
+        if sr is None or sr.status != ServiceRequest.STATUS_PENDING:
+            return None
+        subject = f"Request {sr.id} is still waiting for you"
+        body = (f"Hi {reminder.recipient.username},\n\n{sr.homeowner.username}'s {sr.service.name} request "
+                f"has been pending for over {int(request_pending_after().total_seconds() // 3600)} hours.")
+    else:
+        return None
+
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [reminder.recipient.email])
+
+
+# -------------------------
+# WORKER
+# -------------------------
+class ReminderScheduler:
+    """
+    In-memory heap of reminders due within ``lookahead``.  ``refill`` only
+    reads rows that are new since the last poll (id cursor) or that slid
+    into the lookahead window, both served by indexes.
+    """
+
+    def __init__(self, lookahead=timedelta(minutes=10), batch_size=100, resync_every=timedelta(minutes=15)):
+        self.lookahead = lookahead
+        self.batch_size = batch_size
+        self.resync_every = resync_every
+        self.heap = []
+        self.queued = set()
+        self.cursor = 0
+        self.horizon = None
+        self.last_resync = None
+
+    def _push(self, pk, due_at):
+        if pk not in self.queued:
+            self.queued.add(pk)
+            heapq.heappush(self.heap, (due_at, pk))
+
+    def refill(self, now=None):
+        now = now or timezone.now()
+        horizon = now + self.lookahead
+        # Read the cursor first so rows inserted during the query are seen next time
+        newest = Reminder.objects.aggregate(newest=Max('pk'))['newest'] or 0
+
+        pending = Reminder.objects.filter(sent_at__isnull=True, cancelled=False, due_at__lte=horizon)
+        full_resync = self.horizon is None or now - self.last_resync >= self.resync_every
+        if full_resync:
+            self.last_resync = now
+        else:
+            pending = pending.filter(Q(pk__gt=self.cursor) | Q(due_at__gt=self.horizon))
+
+        for pk, due_at in pending.values_list('pk', 'due_at'):
+            self._push(pk, due_at)
+        self.cursor = max(self.cursor, newest)
+        self.horizon = horizon
+
+    def pop_due(self, now=None):
+        now = now or timezone.now()
+        batch = []
+        while self.heap and self.heap[0][0] <= now and len(batch) < self.batch_size:
+            _, pk = heapq.heappop(self.heap)
+            self.queued.discard(pk)
+            batch.append(pk)
+        return batch
+
+    def fire(self, pks, connection=None):
+        """
+        Claim and send a batch.  Returns the number of emails sent.  If the
+        send fails the batch is unstamped, so the next full resync retries it.
+        """
+        with transaction.atomic():
+            # Stamp before sending so another worker can't pick the same rows
+            reminders = list(
+                Reminder.objects.filter(pk__in=pks, sent_at__isnull=True, cancelled=False)
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('recipient', 'booking__provider__user', 'booking__service',
+                                'service_request__homeowner', 'service_request__service')
+            )
+            Reminder.objects.filter(pk__in=[r.pk for r in reminders]).update(sent_at=timezone.now())
+
+        sent = 0
+        try:
+            messages = [m for m in map(build_message, reminders) if m is not None]
+            if messages:
+                connection = connection or get_connection()
+                sent = connection.send_messages(messages) or 0
+        except Exception:
+            Reminder.objects.filter(pk__in=[r.pk for r in reminders]).update(sent_at=None)
+            raise
+
+        for reminder in reminders:
+            if reminder.kind == Reminder.KIND_BOOKING_UPCOMING and reminder.booking and reminder.booking.is_recurring:
+                schedule_booking_reminder(reminder.booking, after=reminder.occurrence_start)
+        return sent
+
+    def run_once(self, connection=None):
+        self.refill()
+        sent = 0
+        while True:
+            batch = self.pop_due()
+            if not batch:
+                return sent
+            sent += self.fire(batch, connection=connection)
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from booking.models import Booking
+from services.models import ServiceRequest
+from .models import Reminder
+from . import outbox, reminders
+
+
+@receiver(post_save, sender=Booking)
+def booking_reminders(sender, instance, created, **kwargs):
+    """Queue the "provider arrives soon" reminder; drop it if the booking is cancelled."""
+    if created:
+        transaction.on_commit(lambda: reminders.schedule_booking_reminder(instance))
+    elif instance.status not in Booking.ACTIVE_STATUSES:
+        Reminder.objects.filter(booking=instance, sent_at__isnull=True).update(cancelled=True)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def service_request_reminders(sender, instance, created, **kwargs):
+    """Nudge the provider if a new request is still pending a day later."""
+    # Broadcast requests have no provider yet; their offers go to several inboxes
+    if created and instance.provider_id:
+        transaction.on_commit(lambda: reminders.schedule_request_reminder(instance))
+
+
+@receiver(post_save, sender=ServiceRequest)
+def service_request_created_notification(sender, instance, created, **kwargs):
+    """Email the provider about a request made directly to them (ServiceRequest.save keeps this in its transaction)."""
+    if created and instance.provider_id:
+        outbox.notify_new_request(instance, [instance.provider.user])
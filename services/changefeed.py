@@ -0,0 +1,106 @@
+"""
+ServiceRequest change feed.
+
+Every insert, update and delete of a request appends a RequestChange
+tagged with the provider it concerns.  Saves and deletes are recorded by
+receivers in services.signals; the conditional updates in
+services.transitions and services.dispatch call ``record`` in the same
+transaction.  When a request moves to another provider the previous one
+gets a delete entry, so a provider's own entries are enough to keep their
+dashboard in step.
+
+Sequence numbers are handed out when an entry is written, not when its
+transaction commits, so a slow transaction can commit an entry below a
+cursor a client already holds.  Readers therefore only see entries older
+than CHANGE_FEED_SETTLE_SECONDS: the feed runs that far behind but never
+skips one.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import RequestChange, ServiceRequest
+
+
+class CursorExpired(Exception):
+    """Entries after the cursor have been pruned; the client must reload."""
+
+
+def settle_delay():
+    return timedelta(seconds=getattr(settings, 'CHANGE_FEED_SETTLE_SECONDS', 2))
+
+
+def retention():
+    return timedelta(days=getattr(settings, 'CHANGE_FEED_RETENTION_DAYS', 7))
+
+
+# -------------------------
+# WRITING
+# -------------------------
+def record(request_ids, op=RequestChange.OP_UPDATE):
+    """Append ``op`` for each of ``request_ids``, as its row stands now."""
+    last_provider = RequestChange.objects.filter(request_id=OuterRef('pk')).order_by('-id').values('provider_id')[:1]
+    rows = (
+        ServiceRequest.objects.filter(pk__in=request_ids)
+        .annotate(last_provider=Subquery(last_provider))
+        .values_list('pk', 'provider_id', 'status', 'last_provider')
+    )
+    changes = []
+    for pk, provider_id, status, previous in rows:
+        if previous is not None and previous != provider_id:
+            changes.append(RequestChange(request_id=pk, provider_id=previous, op=RequestChange.OP_DELETE, status=status))
+        changes.append(RequestChange(request_id=pk, provider_id=provider_id, op=op, status=status))
+    return RequestChange.objects.bulk_create(changes)
+
+
+def record_delete(service_request):
+    return RequestChange.objects.create(
+        request_id=service_request.pk, provider_id=service_request.provider_id,
+        op=RequestChange.OP_DELETE, status=service_request.status,
+    )
+
+
+def prune(older_than=None):
+    """Drop entries older than the retention period.  Returns how many went."""
+    cutoff = timezone.now() - (older_than or retention())
+    deleted, _ = RequestChange.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+# -------------------------
+# READING
+# -------------------------
+def head():
+    """The cursor to hand out with a full page load."""
+    settled = RequestChange.objects.filter(created_at__lte=timezone.now() - settle_delay())
+    return settled.aggregate(head=Max('id'))['head'] or 0
+
+
+def since(provider_id, cursor, limit=200):
+    """
+    ``(entries, next_cursor, more)``: the provider's settled entries after
+    ``cursor``, oldest first.  Raises CursorExpired if some may be pruned.
+    """
+    oldest = RequestChange.objects.aggregate(oldest=Min('id'))['oldest']
+    if cursor and (oldest is None or oldest > cursor + 1):
+        raise CursorExpired(cursor)
+
+    entries = list(
+        RequestChange.objects.filter(provider_id=provider_id, id__gt=cursor,
+                                     created_at__lte=timezone.now() - settle_delay())
+        .order_by('id')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    return entries, entries[-1].id if entries else cursor, more
+
+
+def collapse(entries):
+    """The last entry of each request, in the order those entries came."""
+    latest = {}
+    for entry in entries:
+        latest.pop(entry.request_id, None)
+        latest[entry.request_id] = entry
+    return list(latest.values())
@@ -0,0 +1,133 @@
+"""
+Broadcast dispatch of service requests.
+
+A broadcast request is offered to the K best-matching providers at once
+(see services.matching).  Accepting is a compare-and-set on the request --
+``UPDATE ... SET provider, status WHERE provider IS NULL AND status =
+'pending'`` -- so exactly one provider wins; the remaining open offers are
+then withdrawn with a single bulk update.
+
+``submit_to_providers`` is the other way to reach several providers: the
+homeowner picks them, and each gets a request of their own.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from notifications import outbox, reminders
+from . import changefeed
+from .models import RequestChange, RequestOffer, ServiceRequest
+
+
+class OfferUnavailable(Exception):
+    """The offer was withdrawn, answered, or another provider got there first."""
+
+
+class NoMatchingProviders(Exception):
+    """No provider the request hasn't already been offered to matches it."""
+
+
+def broadcast_size():
+    return getattr(settings, 'DISPATCH_BROADCAST_SIZE', 5)
+
+
+def broadcast(service_request, k=None):
+    """
+    Offer the request to the best ``k`` providers it hasn't been offered to
+    yet.  Returns the new RequestOffer rows.  Raises NoMatchingProviders,
+    before writing anything, when there is nobody left to offer it to.
+    """
+    from .matching import get_snapshot  # loads NumPy; kept off the boot path
+
+    k = k or broadcast_size()
+    already = set(service_request.offers.values_list('provider_id', flat=True))
+    # Over-fetch so providers who already had an offer can be skipped
+    ranked = get_snapshot().top_k(service_request.service.name, service_request.homeowner.city, k + len(already))
+    ranked = [(pk, score) for pk, score in ranked if pk not in already][:k]
+    if not ranked:
+        raise NoMatchingProviders(f"No provider offers {service_request.service.name} yet.")
+
+    with transaction.atomic():
+        # Two declines can re-broadcast concurrently; the unique constraint keeps one offer per provider
+        RequestOffer.objects.bulk_create(
+            [RequestOffer(service_request=service_request, provider_id=pk, score=score) for pk, score in ranked],
+            ignore_conflicts=True,
+        )
+        offers = list(
+            service_request.offers.open().filter(provider_id__in=[pk for pk, _ in ranked]).select_related('provider__user')
+        )
+        outbox.notify_new_request(service_request, [offer.provider.user for offer in offers])
+    return offers
+
+
+def submit_to_providers(homeowner, service, description, providers):
+    """
+    Send the same job to each of ``providers`` (with ``user`` loaded) as
+    separate requests, saved by one bulk_create.  bulk_create sends no
+    post_save, so the change feed, notifications and reminders the signal
+    receivers would write are written here, a fixed number of queries
+    whatever the number of providers.
+    """
+    with transaction.atomic():
+        requests = ServiceRequest.objects.bulk_create([
+            ServiceRequest(homeowner=homeowner, provider=provider, service=service, description=description)
+            for provider in providers
+        ])
+        if requests:
+            changefeed.record([sr.pk for sr in requests], RequestChange.OP_INSERT)
+            outbox.notify_new_request(requests[0], [provider.user for provider in providers])
+            transaction.on_commit(lambda: reminders.schedule_request_reminders(requests))
+    return requests
+
+
+def accept_offer(offer):
+    """
+    Give the request to the offer's provider if nobody else has it yet.
+    Raises OfferUnavailable when the offer is no longer open or lost the race.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if not RequestOffer.objects.open().filter(pk=offer.pk).update(status=RequestOffer.STATUS_ACCEPTED, responded_at=now):
+            raise OfferUnavailable("This offer is no longer open.")
+
+        won = ServiceRequest.objects.filter(
+            pk=offer.service_request_id, provider__isnull=True, status=ServiceRequest.STATUS_PENDING,
+        ).update(provider=offer.provider_id, status=ServiceRequest.STATUS_ACCEPTED, updated_at=now)
+        if won:
+            withdraw_offers([offer.service_request_id])
+            changefeed.record([offer.service_request_id])
+            outbox.notify_request_accepted([offer.service_request_id])
+        else:
+            RequestOffer.objects.filter(pk=offer.pk).update(status=RequestOffer.STATUS_WITHDRAWN)
+    if not won:
+        offer.status = RequestOffer.STATUS_WITHDRAWN
+        raise OfferUnavailable("This request has already been taken.")
+
+    offer.status, offer.responded_at = RequestOffer.STATUS_ACCEPTED, now
+    return offer
+
+
+def decline_offer(offer):
+    """Decline an open offer; once every offer is declined the next providers are asked."""
+    declined = RequestOffer.objects.open().filter(pk=offer.pk).update(
+        status=RequestOffer.STATUS_DECLINED, responded_at=timezone.now(),
+    )
+    if not declined:
+        raise OfferUnavailable("This offer is no longer open.")
+    offer.status = RequestOffer.STATUS_DECLINED
+
+    sr = offer.service_request
+    if sr.provider_id is None and sr.status == ServiceRequest.STATUS_PENDING and not sr.offers.open().exists():
+        try:
+            broadcast(sr)
+        except NoMatchingProviders:
+            # Everyone who matches has said no; the request stays pending for the homeowner
+            pass
+    return offer
+
+
+def withdraw_offers(request_ids):
+    """Withdraw the open offers of requests that left the pending state."""
+    return RequestOffer.objects.open().filter(service_request_id__in=request_ids).update(
+        status=RequestOffer.STATUS_WITHDRAWN, responded_at=timezone.now(),
+    )
@@ -0,0 +1,24 @@
+"""Export column layouts for service requests (see HomeConnect.exports)."""
+from .models import ServiceRequest
+
+SERVICE_REQUEST_COLUMNS = (
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('status', 'status'),
+    ('service', 'service.name'),
+    ('homeowner', 'homeowner.username'),
+    ('homeowner_email', 'homeowner.email'),
+    ('provider_id', 'provider_id'),
+    ('provider', 'provider.company_name'),
+    ('provider_username', 'provider.user.username'),
+    ('broadcast', 'broadcast'),
+    ('description', 'description'),
+)
+
+# What a provider may export about requests sent to them: no homeowner contact details
+PROVIDER_REQUEST_COLUMNS = tuple(column for column in SERVICE_REQUEST_COLUMNS if column[0] != 'homeowner_email')
+
+
+def service_request_export_queryset(queryset=None):
+    queryset = ServiceRequest.objects.all() if queryset is None else queryset
+    return queryset.select_related('homeowner', 'provider__user', 'service')
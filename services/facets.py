@@ -0,0 +1,168 @@
+"""
+Faceted filtering of the provider directory by offered service and city.
+
+Every facet value has a bitmap of provider ids (a Python int with bit
+``pk`` set), so a selection is an AND of a few bitmaps and each facet count
+is one more AND plus a popcount, whatever the number of providers.
+Services combine with AND ("Plumbing + Electrical" means providers who
+offer both); a provider has one city, so at most one city is selected.
+
+The index is built per process on first use.  Saves, deletes and M2M
+changes in this process patch it after commit (see services.signals);
+changes made by other processes are picked up by a full rebuild after
+FACET_INDEX_TTL seconds, as with services.matching.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from accounts.models import Service as OfferedService, ServiceProvider
+
+
+def city_key(city):
+    return (city or '').strip().casefold()
+
+
+def bitmap_of(pks):
+    bitmap = 0
+    for pk in pks:
+        bitmap |= 1 << pk
+    return bitmap
+
+
+def members(bitmap):
+    """The provider ids in ``bitmap``, ascending."""
+    pks = []
+    while bitmap:
+        low = bitmap & -bitmap
+        pks.append(low.bit_length() - 1)
+        bitmap ^= low
+    return pks
+
+
+class FacetIndex:
+    def __init__(self):
+        self.all = 0
+        self.by_service = defaultdict(int)
+        self.by_city = defaultdict(int)
+        self.service_names = {}
+        self.city_names = {}
+        # What each provider is currently filed under, so an update can unset it
+        self.provider_services = {}
+        self.provider_city = {}
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        index.service_names = dict(OfferedService.objects.values_list('pk', 'name'))
+        offered = defaultdict(set)
+        for provider_id, service_id in ServiceProvider.services.through.objects.values_list('serviceprovider_id', 'service_id'):
+            offered[provider_id].add(service_id)
+        for pk, city in ServiceProvider.objects.values_list('pk', 'user__city'):
+            index._file(pk, city, offered.get(pk, set()))
+        return index
+
+    # ---- updates ----
+    def _unfile(self, pk):
+        bit = 1 << pk
+        self.all &= ~bit
+        for service_id in self.provider_services.pop(pk, ()):
+            self.by_service[service_id] &= ~bit
+        key = self.provider_city.pop(pk, None)
+        if key is not None:
+            self.by_city[key] &= ~bit
+
+    def _file(self, pk, city, service_ids):
+        bit = 1 << pk
+        self.all |= bit
+        for service_id in service_ids:
+            self.by_service[service_id] |= bit
+        self.provider_services[pk] = frozenset(service_ids)
+        key = city_key(city)
+        if key:
+            self.by_city[key] |= bit
+            self.city_names.setdefault(key, city.strip())
+            self.provider_city[pk] = key
+
+    def refresh_providers(self, provider_ids):
+        """Re-read the given providers' city and services from the database."""
+        provider_ids = set(provider_ids)
+        cities = dict(ServiceProvider.objects.filter(pk__in=provider_ids).values_list('pk', 'user__city'))
+        offered = defaultdict(set)
+        for provider_id, service_id, name in ServiceProvider.services.through.objects.filter(
+            serviceprovider_id__in=cities,
+        ).values_list('serviceprovider_id', 'service_id', 'service__name'):
+            offered[provider_id].add(service_id)
+            self.service_names[service_id] = name
+        with self.lock:
+            for pk in provider_ids:
+                self._unfile(pk)
+                if pk in cities:
+                    self._file(pk, cities[pk], offered.get(pk, set()))
+
+    def rename_service(self, service_id, name):
+        self.service_names[service_id] = name
+
+    def remove_service(self, service_id):
+        with self.lock:
+            self.service_names.pop(service_id, None)
+            self.by_service.pop(service_id, None)
+            for pk, services in self.provider_services.items():
+                if service_id in services:
+                    self.provider_services[pk] = services - {service_id}
+
+    # ---- queries ----
+    def select(self, service_ids=(), city=None, within=None):
+        """Bitmap of providers offering every service in ``service_ids``, in ``city``, and in ``within``."""
+        bitmap = self.all if within is None else self.all & within
+        for service_id in service_ids:
+            bitmap &= self.by_service.get(service_id, 0)
+        if city:
+            bitmap &= self.by_city.get(city_key(city), 0)
+        return bitmap
+
+    def counts(self, service_ids=(), city=None, within=None):
+        """
+        ``(service counts, city counts)``: how many providers each value would
+        leave if picked next.  City counts ignore the current city, so they
+        show what switching city would give.
+        """
+        selected = self.select(service_ids, city, within)
+        any_city = self.select(service_ids, None, within)
+        services = {sid: (selected & bitmap).bit_count() for sid, bitmap in list(self.by_service.items())}
+        cities = {key: (any_city & bitmap).bit_count() for key, bitmap in list(self.by_city.items())}
+        return services, cities
+
+
+# -------------------------
+# PROCESS-WIDE INDEX
+# -------------------------
+_lock = threading.Lock()
+_index = None
+
+
+def get_index():
+    """The current index, rebuilt when older than FACET_INDEX_TTL seconds."""
+    global _index
+    ttl = getattr(settings, 'FACET_INDEX_TTL', 300)
+    index = _index
+    if index is None or time.monotonic() - index.built_at > ttl:
+        with _lock:
+            if _index is None or time.monotonic() - _index.built_at > ttl:
+                _index = FacetIndex.build()
+            index = _index
+    return index
+
+
+def loaded_index():
+    """The index if this process has built one; updates to an unbuilt index are pointless."""
+    return _index
+
+
+def reset():
+    global _index
+    _index = None
@@ -1,7 +1,15 @@
 from django import forms
-from .models import ServiceRequest, ServiceProvider, Service
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Review, ServiceRequest, ServiceProvider, Service
 
 class ServiceRequestForm(forms.ModelForm):
+    broadcast = forms.BooleanField(
+        required=False,
+        label="Offer to the best-matching providers instead (first to accept gets it)",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+
     class Meta:
         model = ServiceRequest
         fields = ('service', 'provider', 'description')
@@ -15,12 +23,83 @@ class ServiceRequestForm(forms.ModelForm):
             }),
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, city=None, allow_broadcast=False, **kwargs):
         super().__init__(*args, **kwargs)
+        if not allow_broadcast or self.instance.pk:
+            del self.fields['broadcast']
         # Dynamically populate providers
-        self.fields['provider'].queryset = ServiceProvider.objects.all()
+        self.fields['provider'].queryset = self.ranked_providers(city)
         self.fields['service'].empty_label = "Select a service"
         self.fields['provider'].empty_label = "Select a provider"
+        self.fields['provider'].required = False
+
+    def clean(self):
+        cleaned = super().clean()
+        if not cleaned.get('provider') and not cleaned.get('broadcast') and not self.instance.provider_id:
+            self.add_error('provider', "Choose a provider or offer the request to the best matches.")
+        return cleaned
+
+    def ranked_providers(self, city=None, k=50):
+        """All providers, best matches for the chosen service first."""
+        providers = ServiceProvider.objects.all()
+        service_id = self.data.get('service') or self.initial.get('service')
+        service = Service.objects.filter(pk=service_id).first() if str(service_id or '').isdigit() else None
+        if service is None:
+            return providers
+
+        from .matching import recommend_providers  # loads NumPy; kept off the boot path
+
+        ranked = [pk for pk, _ in recommend_providers(service, city=city, k=k)]
+        if not ranked:
+            return providers
+        rank = Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(ranked)],
+                    default=Value(len(ranked)), output_field=IntegerField())
+        return providers.order_by(rank, 'pk')
+
+
+class MultiProviderRequestForm(forms.Form):
+    """One job description sent to several providers at once."""
+
+    MAX_PROVIDERS = 10
+
+    service = forms.ModelChoiceField(
+        queryset=Service.objects.all(),
+        empty_label="Select a service",
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    # user is loaded with the providers so the submission needs no query per provider
+    providers = forms.ModelMultipleChoiceField(
+        queryset=ServiceProvider.objects.select_related('user'),
+        widget=forms.SelectMultiple(attrs={'class': 'form-select', 'size': 8}),
+        help_text=f"Hold Ctrl (Cmd on a Mac) to choose up to {MAX_PROVIDERS} providers.",
+    )
+    description = forms.CharField(
+        widget=forms.Textarea(attrs={
+            'rows': 4,
+            'class': 'form-control',
+            'placeholder': 'Describe your service request in detail...'
+        }),
+    )
+
+    def clean_providers(self):
+        providers = self.cleaned_data['providers']
+        if len(providers) > self.MAX_PROVIDERS:
+            raise forms.ValidationError(f"Choose at most {self.MAX_PROVIDERS} providers.")
+        return providers
+
+
+class ReviewForm(forms.ModelForm):
+    class Meta:
+        model = Review
+        fields = ('rating', 'comment')
+        widgets = {
+            'rating': forms.Select(choices=[(i, f"{i} / 5") for i in range(5, 0, -1)], attrs={'class': 'form-select'}),
+            'comment': forms.Textarea(attrs={
+                'rows': 4,
+                'class': 'form-control',
+                'placeholder': 'How did the job go?'
+            }),
+        }
 
 
 class ProviderEditForm(forms.ModelForm):
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from services.changefeed import prune
+
+
+class Command(BaseCommand):
+    help = "Delete request change-feed entries past their retention period. Run daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Keep this many days (default: CHANGE_FEED_RETENTION_DAYS).")
+
+    def handle(self, *args, **options):
+        deleted = prune(timedelta(days=options['days']) if options['days'] else None)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change-feed entr{'y' if deleted == 1 else 'ies'}."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from services.reviews import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute every provider's rating sum, count and average from its reviews."
+
+    def handle(self, *args, **options):
+        updated = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed ratings for {updated} provider(s)."))
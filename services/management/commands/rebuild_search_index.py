@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from services.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the fuzzy search index of services and providers from scratch."
+
+    def handle(self, *args, **options):
+        documents, words = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {documents} document(s), {words} distinct word(s)."))
@@ -0,0 +1,186 @@
+"""
+Provider ranking for service requests.
+
+Every candidate provider is scored on the same five signals at once using
+NumPy arrays taken from a periodically refreshed snapshot of the provider
+table, so ranking 100k providers is a handful of vector operations plus an
+``argpartition`` for the top K.  Stale snapshots are rebuilt off the
+request path (see ``get_snapshot``).
+
+Providers list their offerings through ``accounts.Service`` while requests
+point at ``services.Service``; the two catalogues are matched by name.
+Providers carry no coordinates, so locality is scored as "same city".
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Q
+
+from accounts.models import ServiceProvider
+from .models import ServiceRequest
+
+# Relative weight of each signal in the final score
+WEIGHTS = {
+    'service': 10.0,
+    'city': 3.0,
+    'experience': 1.5,
+    'load': 2.0,
+    'acceptance': 2.0,
+}
+
+
+def _key(name):
+    return (name or '').strip().lower()
+
+
+class ProviderSnapshot:
+    """Column arrays describing every provider, aligned by position."""
+
+    def __init__(self, ids, offers, service_index, city_codes, city_index,
+                 experience, pending, acceptance):
+        self.ids = ids                      # int64[n]  provider pks
+        self.offers = offers                # bool[n, s] provider offers service j
+        self.service_index = service_index  # service name -> column in offers
+        self.city_codes = city_codes        # int32[n]  -1 when unknown
+        self.city_index = city_index        # city name -> code
+        self.experience = experience        # float32[n] normalised to 0..1
+        self.pending = pending              # float32[n] normalised to 0..1
+        self.acceptance = acceptance        # float32[n] smoothed rate 0..1
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls):
+        """Read the provider table and request statistics into arrays."""
+        rows = list(ServiceProvider.objects.order_by('pk').values_list('pk', 'experience_years', 'user__city'))
+        n = len(rows)
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+        position = {pk: i for i, pk in enumerate(ids.tolist())}
+
+        city_index = {}
+        city_codes = np.full(n, -1, dtype=np.int32)
+        experience = np.zeros(n, dtype=np.float32)
+        for i, (_, years, city) in enumerate(rows):
+            experience[i] = years or 0
+            if city:
+                city_codes[i] = city_index.setdefault(_key(city), len(city_index))
+
+        through = ServiceProvider.services.through
+        links = list(through.objects.values_list('serviceprovider_id', 'service__name'))
+        service_index = {}
+        for _, name in links:
+            service_index.setdefault(_key(name), len(service_index))
+        offers = np.zeros((n, max(len(service_index), 1)), dtype=bool)
+        for provider_id, name in links:
+            i = position.get(provider_id)
+            if i is not None:
+                offers[i, service_index[_key(name)]] = True
+
+        pending = np.zeros(n, dtype=np.float32)
+        accepted = np.zeros(n, dtype=np.float32)
+        decided = np.zeros(n, dtype=np.float32)
+        stats = ServiceRequest.objects.values('provider_id').annotate(
+            pending=Count('pk', filter=Q(status=ServiceRequest.STATUS_PENDING)),
+            accepted=Count('pk', filter=Q(status__in=[ServiceRequest.STATUS_ACCEPTED, ServiceRequest.STATUS_COMPLETED])),
+            decided=Count('pk', filter=~Q(status=ServiceRequest.STATUS_PENDING)),
+        )
+        for row in stats:
+            i = position.get(row['provider_id'])
+            if i is not None:
+                pending[i], accepted[i], decided[i] = row['pending'], row['accepted'], row['decided']
+
+        return cls.from_arrays(ids, offers, service_index, city_codes, city_index,
+                               experience, pending, accepted, decided)
+
+    @classmethod
+    def from_arrays(cls, ids, offers, service_index, city_codes, city_index,
+                    experience_years, pending, accepted, decided):
+        """Normalise raw per-provider numbers into 0..1 signals."""
+        experience = np.log1p(experience_years.astype(np.float32))
+        experience /= max(float(experience.max(initial=0)), 1.0)
+        load = np.log1p(pending.astype(np.float32))
+        load /= max(float(load.max(initial=0)), 1.0)
+        # Laplace smoothing: new providers start at 50% instead of 0 or 100
+        acceptance = (accepted + 1) / (decided + 2)
+        return cls(ids, offers, service_index, city_codes, city_index,
+                   experience, load, acceptance.astype(np.float32))
+
+    def scores(self, service_name=None, city=None):
+        score = WEIGHTS['experience'] * self.experience
+        score -= WEIGHTS['load'] * self.pending
+        score += WEIGHTS['acceptance'] * self.acceptance
+
+        column = self.service_index.get(_key(service_name))
+        if column is not None:
+            score += WEIGHTS['service'] * self.offers[:, column]
+        code = self.city_index.get(_key(city))
+        if code is not None:
+            score += WEIGHTS['city'] * (self.city_codes == code)
+        return score
+
+    def top_k(self, service_name=None, city=None, k=10, require_service=True):
+        """Return [(provider_pk, score)] for the best ``k`` providers."""
+        if not len(self):
+            return []
+        score = self.scores(service_name, city)
+        column = self.service_index.get(_key(service_name))
+        if require_service and service_name:
+            if column is None:
+                return []
+            score = np.where(self.offers[:, column], score, -np.inf)
+
+        k = min(k, len(score))
+        best = np.argpartition(-score, k - 1)[:k]
+        best = best[np.argsort(-score[best], kind='stable')]
+        return [(int(self.ids[i]), float(score[i])) for i in best if np.isfinite(score[i])]
+
+
+# -------------------------
+# PROCESS-WIDE SNAPSHOT
+# -------------------------
+_lock = threading.Lock()
+_refreshing = threading.Lock()
+_snapshot = None
+
+
+def refresh():
+    """Build a new snapshot and swap it in."""
+    global _snapshot
+    _snapshot = ProviderSnapshot.build()
+
+
+def _refresh_in_background():
+    try:
+        refresh()
+    finally:
+        _refreshing.release()
+        connections.close_all()
+
+
+def get_snapshot():
+    """
+    The current snapshot.  Only the very first call builds one in the
+    request; once it is older than MATCHING_SNAPSHOT_TTL seconds a single
+    background thread rebuilds it while every caller keeps being served the
+    stale one.
+    """
+    ttl = getattr(settings, 'MATCHING_SNAPSHOT_TTL', 300)
+    snapshot = _snapshot
+    if snapshot is None:
+        with _lock:
+            if _snapshot is None:
+                refresh()
+            return _snapshot
+    if time.monotonic() - snapshot.built_at > ttl and _refreshing.acquire(blocking=False):
+        threading.Thread(target=_refresh_in_background, name='matching-snapshot', daemon=True).start()
+    return snapshot
+
+
+def recommend_providers(service, city=None, k=10):
+    """Top ``k`` (provider_pk, score) pairs for a services.Service."""
+    return get_snapshot().top_k(service.name if service else None, city, k)
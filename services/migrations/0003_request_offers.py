@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_profile_city_profile_phone'),
+        ('services', '0002_alter_servicerequest_provider_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='broadcast',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='servicerequest',
+            name='provider',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='provider_requests', to='accounts.serviceprovider'),
+        ),
+        migrations.CreateModel(
+            name='RequestOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('accepted', 'Accepted'), ('declined', 'Declined'), ('withdrawn', 'Withdrawn')], default='open', max_length=20)),
+                ('score', models.FloatField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('responded_at', models.DateTimeField(blank=True, null=True)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='request_offers', to='accounts.serviceprovider')),
+                ('service_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='services.servicerequest')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'open')), fields=['provider', '-created_at'], name='services_offer_inbox_idx')],
+                'constraints': [models.UniqueConstraint(fields=('service_request', 'provider'), name='services_offer_unique')],
+            },
+        ),
+    ]
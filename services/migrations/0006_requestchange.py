@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.BigIntegerField()),
+                ('provider_id', models.BigIntegerField(blank=True, null=True)),
+                ('op', models.CharField(choices=[('insert', 'Insert'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['provider_id', 'id'], name='services_change_feed_idx'), models.Index(fields=['request_id', '-id'], name='services_change_request_idx')],
+            },
+        ),
+    ]
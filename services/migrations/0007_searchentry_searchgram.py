@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_requestchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=64)),
+                ('kind', models.CharField(choices=[('service', 'Service'), ('provider', 'Provider')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('weight', models.FloatField(default=1.0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='services_search_doc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('word', 'kind', 'object_id'), name='services_search_entry_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('word', models.CharField(db_index=True, max_length=64)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('gram', 'word'), name='services_search_gram_unique')],
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+import time
+
+from django.db import models, transaction
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 
 # Import ServiceProvider from accounts app
 from accounts.models import ServiceProvider
@@ -10,6 +14,7 @@ class Service(models.Model):
 
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -18,15 +23,35 @@ class Service(models.Model):
 # -----------------------------
 # SAFE DEFAULT SERVICE HANDLER
 # -----------------------------
+# (id, time.monotonic() when remembered)
+_default_service = None
+
+
 def default_service():
     """
     Ensures the ServiceRequest model always has a valid service ID.
     If no service exists, automatically create a fallback.
+
+    Every ServiceRequest() built without a service calls this (so does each
+    blank ServiceRequestForm), so the id is remembered once it is committed.
+    This process forgets it when the catalogue changes (services.signals);
+    other processes after DEFAULT_SERVICE_TTL seconds.
     """
-    service = Service.objects.first()
-    if service:
-        return service.id
-    return Service.objects.create(name="General Service").id
+    remembered = _default_service
+    if remembered is not None and time.monotonic() - remembered[1] < getattr(settings, "DEFAULT_SERVICE_TTL", 300):
+        return remembered[0]
+    service = Service.objects.first() or Service.objects.create(name="General Service")
+    transaction.on_commit(lambda: remember_default_service(service.id))
+    return service.id
+
+
+def remember_default_service(service_id):
+    global _default_service
+    _default_service = None if service_id is None else (service_id, time.monotonic())
+
+
+def forget_default_service():
+    remember_default_service(None)
 
 
 class ServiceRequest(models.Model):
@@ -50,10 +75,13 @@ class ServiceRequest(models.Model):
         related_name="homeowner_requests",
     )
 
+    # Empty while a broadcast request is waiting for one of its offers to be accepted
     provider = models.ForeignKey(
         ServiceProvider,
         on_delete=models.CASCADE,
         related_name="provider_requests",
+        blank=True,
+        null=True,
     )
 
     service = models.ForeignKey(
@@ -69,7 +97,7 @@ class ServiceRequest(models.Model):
         null=True,
     )
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     status = models.CharField(
         max_length=20,
@@ -77,8 +105,216 @@ class ServiceRequest(models.Model):
         default=STATUS_PENDING,
     )
 
+    # Offered to several providers at once (see services.dispatch)
+    broadcast = models.BooleanField(default=False)
+    # Bumped by save() and by every queryset update() of the row; API ETags derive from it
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     class Meta:
         ordering = ["-created_at"]
 
+    def save(self, *args, **kwargs):
+        # post_save receivers queue outbox notifications; they must commit or roll back with the row
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        provider = self.provider.user.username if self.provider else "(awaiting provider)"
+        return f"Request {self.id} - {self.homeowner.username} → {provider}"
+
+
+class RequestOfferQuerySet(models.QuerySet):
+    def open(self):
+        return self.filter(status=RequestOffer.STATUS_OPEN)
+
+    def inbox(self, provider):
+        """Open offers for a provider, newest first (served by services_offer_inbox_idx)."""
+        return self.open().filter(provider=provider).order_by("-created_at")
+
+
+class RequestOffer(models.Model):
+    """A broadcast request offered to one provider."""
+
+    STATUS_OPEN = "open"
+    STATUS_ACCEPTED = "accepted"
+    STATUS_DECLINED = "declined"
+    STATUS_WITHDRAWN = "withdrawn"
+
+    STATUS_CHOICES = [
+        (STATUS_OPEN, "Open"),
+        (STATUS_ACCEPTED, "Accepted"),
+        (STATUS_DECLINED, "Declined"),
+        (STATUS_WITHDRAWN, "Withdrawn"),
+    ]
+
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name="offers")
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name="request_offers")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    score = models.FloatField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    responded_at = models.DateTimeField(blank=True, null=True)
+
+    objects = RequestOfferQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Provider inbox: only open offers are indexed, so the index stays
+            # small however many offers have been answered or withdrawn
+            models.Index(fields=["provider", "-created_at"], name="services_offer_inbox_idx",
+                         condition=models.Q(status="open")),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["service_request", "provider"], name="services_offer_unique"),
+        ]
+
+    def __str__(self):
+        return f"Offer of request {self.service_request_id} to {self.provider} ({self.status})"
+
+
+class RequestChange(models.Model):
+    """
+    One entry in the ServiceRequest change feed (see services.changefeed).
+    ``id`` is the feed sequence: clients keep the last one they saw and ask
+    for what came after it.  Request and provider are plain ids so entries
+    outlive the rows they describe.
+    """
+
+    OP_INSERT = "insert"
+    OP_UPDATE = "update"
+    OP_DELETE = "delete"
+
+    OP_CHOICES = [
+        (OP_INSERT, "Insert"),
+        (OP_UPDATE, "Update"),
+        (OP_DELETE, "Delete"),
+    ]
+
+    request_id = models.BigIntegerField()
+    provider_id = models.BigIntegerField(blank=True, null=True)
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    status = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # "Changes since N for provider P" is a range scan of this index
+            models.Index(fields=["provider_id", "id"], name="services_change_feed_idx"),
+            # Latest entry of a request, to spot a change of provider
+            models.Index(fields=["request_id", "-id"], name="services_change_request_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.op} request {self.request_id} ({self.status or '-'})"
+
+
+# -----------------------------
+# FUZZY SEARCH INDEX (services.search)
+# -----------------------------
+class SearchEntry(models.Model):
+    """One word of an indexed document (a catalogue service or a provider)."""
+
+    KIND_SERVICE = "service"
+    KIND_PROVIDER = "provider"
+
+    KIND_CHOICES = [
+        (KIND_SERVICE, "Service"),
+        (KIND_PROVIDER, "Provider"),
+    ]
+
+    word = models.CharField(max_length=64)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # How much a match on this word counts (names above free-text skills)
+    weight = models.FloatField(default=1.0)
+
+    class Meta:
+        constraints = [
+            # Also the index that turns matched words into documents
+            models.UniqueConstraint(fields=["word", "kind", "object_id"], name="services_search_entry_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["kind", "object_id"], name="services_search_doc_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.word} -> {self.kind} {self.object_id}"
+
+
+class SearchGram(models.Model):
+    """A trigram of a word that appears in some SearchEntry."""
+
+    gram = models.CharField(max_length=3)
+    word = models.CharField(max_length=64, db_index=True)
+
+    class Meta:
+        constraints = [
+            # Also the index behind the "words sharing these trigrams" lookup
+            models.UniqueConstraint(fields=["gram", "word"], name="services_search_gram_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.gram!r} in {self.word}"
+
+
+class Review(models.Model):
+    """A homeowner's rating of a completed request (see services.reviews)."""
+
+    service_request = models.OneToOneField(ServiceRequest, on_delete=models.CASCADE, related_name="review")
+    # Copied from the request so a provider's reviews are one indexed lookup
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name="reviews")
+    homeowner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reviews")
+    rating = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    comment = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["provider", "-created_at"], name="services_review_provider_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(rating__gte=1, rating__lte=5), name="services_review_rating_range"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        review = super().from_db(db, field_names, values)
+        # What the provider aggregates currently include for this review
+        review._counted = (review.provider_id, review.rating)
+        return review
+
+    def clean(self):
+        sr = self.service_request
+        if sr.status != ServiceRequest.STATUS_COMPLETED:
+            raise ValidationError("Only completed requests can be reviewed.")
+        if sr.provider_id != self.provider_id or sr.homeowner_id != self.homeowner_id:
+            raise ValidationError("The review must come from the request's homeowner and be about its provider.")
+
+    def save(self, *args, **kwargs):
+        # post_save adjusts the provider's aggregates; they must commit or roll back with the review
+        with transaction.atomic(using=kwargs.get("using")):
+            self._lock_counted(kwargs.get("using"))
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            self._lock_counted(kwargs.get("using"))
+            if self.pk is not None and self._counted is None:
+                # Deleted elsewhere already, and taken out of the aggregates then
+                return 0, {}
+            return super().delete(*args, **kwargs)
+
+    def _lock_counted(self, using=None):
+        """
+        Re-read what the aggregates hold for this review, with the row locked,
+        so an edit made through another instance since this one was loaded
+        isn't subtracted twice.
+        """
+        if self.pk is None:
+            return
+        counted = Review.objects.using(using).select_for_update().filter(pk=self.pk).values_list("provider_id", "rating")
+        # None when the row is gone, so the save counts it afresh
+        self._counted = next(iter(counted), None)
+
     def __str__(self):
-        return f"Request {self.id} - {self.homeowner.username} → {self.provider.user.username}"
+        return f"{self.rating}/5 for request {self.service_request_id}"
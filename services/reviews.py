@@ -0,0 +1,66 @@
+"""
+Provider ratings.
+
+A homeowner may review each completed request once.  ServiceProvider
+carries the sum, count and average of its ratings.  Every insert, edit
+and delete of a Review adjusts them with a single ``UPDATE ... SET
+rating_sum = rating_sum + delta, ...`` in the review's transaction (the
+receivers are in services.signals), so concurrent reviews never overwrite
+each other's contribution and the directory can sort on an indexed column
+instead of aggregating reviews per page view.
+
+``rebuild_provider_ratings`` recomputes every provider from its reviews.
+"""
+from django.db.models import Avg, Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from accounts.models import ServiceProvider
+from .models import Review
+
+
+def adjust(provider_id, rating_delta, count_delta):
+    """Add ``rating_delta`` to the provider's rating sum and ``count_delta`` to its count."""
+    new_sum = F('rating_sum') + rating_delta
+    new_count = F('rating_count') + count_delta
+    return ServiceProvider.objects.filter(pk=provider_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        # Right-hand sides all read the row as it was before this UPDATE
+        rating_avg=Case(
+            When(rating_count__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+            default=Value(0.0),
+        ),
+        # Provider pages are HTTP-cached on updated_at
+        updated_at=timezone.now(),
+    )
+
+
+def record_saved(review):
+    counted = getattr(review, '_counted', None)
+    if counted is None:
+        adjust(review.provider_id, review.rating, 1)
+    elif counted[0] == review.provider_id:
+        # Even a comment-only edit bumps updated_at, so the provider page is re-rendered
+        adjust(review.provider_id, review.rating - counted[1], 0)
+    else:
+        adjust(counted[0], -counted[1], -1)
+        adjust(review.provider_id, review.rating, 1)
+    review._counted = (review.provider_id, review.rating)
+
+
+def record_deleted(review):
+    provider_id, rating = getattr(review, '_counted', None) or (review.provider_id, review.rating)
+    adjust(provider_id, -rating, -1)
+    review._counted = None
+
+
+def rebuild():
+    """Recompute every provider's aggregates with one UPDATE.  Returns the number of providers."""
+    reviews = Review.objects.filter(provider=OuterRef('pk')).order_by().values('provider')
+    return ServiceProvider.objects.update(
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+        rating_count=Coalesce(Subquery(reviews.annotate(n=Count('pk')).values('n')), 0),
+        rating_avg=Coalesce(Subquery(reviews.annotate(avg=Avg('rating')).values('avg')), 0.0),
+        updated_at=timezone.now(),
+    )
@@ -0,0 +1,218 @@
+"""
+Typo-tolerant search over the service catalogue and the provider directory.
+
+The index is two tables (see services.models): SearchEntry maps each word
+of a document to that document, and SearchGram maps each trigram to the
+words containing it.  A query word is matched against that vocabulary by
+trigram similarity, shared / (query + word - shared) as in pg_trgm, so
+"plumbr" finds "plumber" and "plumbing", and each matched word's entries
+give the documents.
+
+A word can only reach SEARCH_SIMILARITY (t) if it shares at least
+t * |query trigrams| / (1 + t) trigrams with the query word, so the
+database counts shared trigrams per word and returns only the words over
+that bound; exact similarity is computed for those few.
+
+Documents are re-indexed from signal receivers (services.signals) as
+they are saved, writing only the words that changed.
+``rebuild_search_index`` rebuilds the whole index.
+"""
+import math
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from accounts.models import ServiceProvider
+from .models import SearchEntry, SearchGram, Service
+
+WORD_RE = re.compile(r"[^\W_]+")
+MAX_WORD_LENGTH = 64
+
+# Every query word costs one GROUP BY over SearchGram, so queries are capped
+MAX_QUERY_LENGTH = 200
+MAX_QUERY_WORDS = 8
+MAX_QUERY_WORD_LENGTH = 32
+
+NAME_WEIGHT = 1.0
+TEXT_WEIGHT = 0.6
+
+
+def similarity_threshold():
+    return getattr(settings, 'SEARCH_SIMILARITY', 0.3)
+
+
+def words(text):
+    return {w[:MAX_WORD_LENGTH] for w in WORD_RE.findall((text or '').lower()) if len(w) > 1}
+
+
+def query_words(query):
+    """The first MAX_QUERY_WORDS distinct words of ``query``, each cut to MAX_QUERY_WORD_LENGTH."""
+    found = dict.fromkeys(
+        w[:MAX_QUERY_WORD_LENGTH] for w in WORD_RE.findall((query or '')[:MAX_QUERY_LENGTH].lower()) if len(w) > 1
+    )
+    return list(found)[:MAX_QUERY_WORDS]
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# -------------------------
+# DOCUMENTS
+# -------------------------
+def weigh(*fields):
+    """{word: weight} from ``(text, weight)`` pairs; a word keeps its best weight."""
+    document = {}
+    for text, weight in fields:
+        for word in words(text):
+            document[word] = max(weight, document.get(word, 0))
+    return document
+
+
+def service_document(service):
+    return weigh((service.name, NAME_WEIGHT), (service.description, TEXT_WEIGHT))
+
+
+def provider_document(provider):
+    return weigh(
+        (provider.company_name, NAME_WEIGHT),
+        (provider.user.username, NAME_WEIGHT),
+        *((s.name, NAME_WEIGHT) for s in provider.services.all()),
+        (provider.skills, TEXT_WEIGHT),
+    )
+
+
+# -------------------------
+# INDEXING
+# -------------------------
+def add_words(new_words):
+    """Put words that aren't in the vocabulary yet into SearchGram."""
+    known = set(SearchGram.objects.filter(word__in=new_words).values_list('word', flat=True).distinct())
+    SearchGram.objects.bulk_create(
+        [SearchGram(gram=gram, word=word) for word in set(new_words) - known for gram in trigrams(word)],
+        ignore_conflicts=True,
+    )
+
+
+def drop_orphans(old_words):
+    """Take words no document uses any more out of SearchGram."""
+    used = set(SearchEntry.objects.filter(word__in=old_words).values_list('word', flat=True).distinct())
+    orphans = set(old_words) - used
+    if orphans:
+        SearchGram.objects.filter(word__in=orphans).delete()
+
+
+def index_document(kind, object_id, document):
+    """Bring a document's entries in line with ``document`` ({word: weight}), writing only the difference."""
+    current = dict(SearchEntry.objects.filter(kind=kind, object_id=object_id).values_list('word', 'weight'))
+    if current == document:
+        return
+    stale = [word for word, weight in current.items() if document.get(word) != weight]
+    fresh = [word for word, weight in document.items() if current.get(word) != weight]
+    with transaction.atomic():
+        if stale:
+            SearchEntry.objects.filter(kind=kind, object_id=object_id, word__in=stale).delete()
+        SearchEntry.objects.bulk_create(
+            [SearchEntry(word=word, kind=kind, object_id=object_id, weight=document[word]) for word in fresh],
+            ignore_conflicts=True,
+        )
+        add_words(fresh)
+        drop_orphans(set(current) - set(document))
+
+
+def index_service(service):
+    index_document(SearchEntry.KIND_SERVICE, service.pk, service_document(service))
+
+
+def index_providers(provider_ids):
+    providers = ServiceProvider.objects.filter(pk__in=provider_ids).select_related('user').prefetch_related('services')
+    found = set()
+    for provider in providers:
+        found.add(provider.pk)
+        index_document(SearchEntry.KIND_PROVIDER, provider.pk, provider_document(provider))
+    for pk in set(provider_ids) - found:
+        remove_document(SearchEntry.KIND_PROVIDER, pk)
+
+
+def remove_document(kind, object_id):
+    index_document(kind, object_id, {})
+
+
+def rebuild(chunk_size=1000):
+    """Re-create the whole index.  Returns (documents, words)."""
+    entries = []
+    for service in Service.objects.all():
+        entries += [SearchEntry(word=w, kind=SearchEntry.KIND_SERVICE, object_id=service.pk, weight=weight)
+                    for w, weight in service_document(service).items()]
+    providers = ServiceProvider.objects.select_related('user').prefetch_related('services')
+    for provider in providers.iterator(chunk_size=chunk_size):
+        entries += [SearchEntry(word=w, kind=SearchEntry.KIND_PROVIDER, object_id=provider.pk, weight=weight)
+                    for w, weight in provider_document(provider).items()]
+
+    vocabulary = {entry.word for entry in entries}
+    with transaction.atomic():
+        SearchEntry.objects.all().delete()
+        SearchGram.objects.all().delete()
+        SearchEntry.objects.bulk_create(entries, batch_size=chunk_size)
+        SearchGram.objects.bulk_create(
+            [SearchGram(gram=gram, word=word) for word in vocabulary for gram in trigrams(word)],
+            batch_size=chunk_size,
+        )
+    return len({(e.kind, e.object_id) for e in entries}), len(vocabulary)
+
+
+# -------------------------
+# QUERYING
+# -------------------------
+def similar_words(word, limit=5):
+    """[(vocabulary word, similarity)] for ``word``, best first."""
+    grams = trigrams(word[:MAX_QUERY_WORD_LENGTH])
+    t = similarity_threshold()
+    min_shared = max(1, math.ceil(t * len(grams) / (1 + t)))
+    candidates = (
+        SearchGram.objects.filter(gram__in=grams)
+        .values('word').annotate(shared=Count('pk')).filter(shared__gte=min_shared)
+        .values_list('word', 'shared')
+    )
+    scored = []
+    for candidate, shared in candidates:
+        score = shared / (len(grams) + len(trigrams(candidate)) - shared)
+        if score >= t:
+            scored.append((candidate, score))
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
+
+
+def search(query, kinds=None, limit=20):
+    """
+    [(kind, object_id, score)] best first.  A document scores, for each
+    query word, its best similarity times weight over the words it matched.
+    Only the first MAX_QUERY_WORDS words of the query are looked up.
+    """
+    matches = {word: similar_words(word) for word in query_words(query)}
+    vocabulary = {candidate for matched in matches.values() for candidate, _ in matched}
+    if not vocabulary:
+        return []
+
+    entries = SearchEntry.objects.filter(word__in=vocabulary)
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    postings = defaultdict(list)
+    for word, kind, object_id, weight in entries.values_list('word', 'kind', 'object_id', 'weight'):
+        postings[word].append((kind, object_id, weight))
+
+    scores = defaultdict(float)
+    for matched in matches.values():
+        best = {}
+        for candidate, similarity in matched:
+            for kind, object_id, weight in postings[candidate]:
+                best[kind, object_id] = max(best.get((kind, object_id), 0), similarity * weight)
+        for key, score in best.items():
+            scores[key] += score
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [(kind, object_id, score) for (kind, object_id), score in ranked[:limit]]
@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from HomeConnect.page_cache import invalidate_anonymous_pages
+from accounts.models import Service as OfferedService, ServiceProvider
+from . import changefeed, facets, reviews, search
+from .models import RequestChange, Review, SearchEntry, Service, ServiceRequest, forget_default_service
+
+
+# -----------------------------
+# CATALOG CHANGES
+# -----------------------------
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def catalog_changed(sender, **kwargs):
+    """The registration page lists the catalog; drop cached anonymous pages and the default service."""
+    # Only once committed: a page rendered before then would be cached under the new version
+    transaction.on_commit(invalidate_anonymous_pages)
+    forget_default_service()
+
+
+# -----------------------------
+# REQUEST CHANGE FEED
+# -----------------------------
+@receiver(post_save, sender=ServiceRequest)
+def request_saved(sender, instance, created, **kwargs):
+    """Runs inside ServiceRequest.save's transaction, like the row itself."""
+    changefeed.record([instance.pk], RequestChange.OP_INSERT if created else RequestChange.OP_UPDATE)
+
+
+@receiver(post_delete, sender=ServiceRequest)
+def request_deleted(sender, instance, **kwargs):
+    changefeed.record_delete(instance)
+
+
+# -----------------------------
+# SEARCH INDEX AND DIRECTORY FACETS
+# -----------------------------
+@receiver(post_save, sender=Service)
+def service_indexed(sender, instance, **kwargs):
+    search.index_service(instance)
+
+
+@receiver(post_delete, sender=Service)
+def service_unindexed(sender, instance, **kwargs):
+    search.remove_document(SearchEntry.KIND_SERVICE, instance.pk)
+
+
+@receiver(post_save, sender=ServiceProvider)
+@receiver(post_delete, sender=ServiceProvider)
+def provider_changed(sender, instance, **kwargs):
+    # User edits (username, city) reach here through accounts' save_user_related_profiles
+    providers_changed([instance.pk])
+
+
+@receiver(m2m_changed, sender=ServiceProvider.services.through)
+def provider_services_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            providers_changed([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        providers_changed(pk_set)
+    elif action == 'pre_clear':
+        providers_changed_after_commit(instance.providers.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=OfferedService)
+def offered_service_saved(sender, instance, created, **kwargs):
+    index = facets.loaded_index()
+    if index is not None:
+        transaction.on_commit(lambda: index.rename_service(instance.pk, instance.name))
+    if not created:
+        search.index_providers(list(instance.providers.values_list('pk', flat=True)))
+
+
+@receiver(pre_delete, sender=OfferedService)
+def offered_service_deleted(sender, instance, **kwargs):
+    # The links are gone once the delete runs; re-index whoever had them afterwards
+    providers_changed_after_commit(instance.providers.values_list('pk', flat=True))
+    index = facets.loaded_index()
+    if index is not None:
+        service_id = instance.pk
+        transaction.on_commit(lambda: index.remove_service(service_id))
+
+
+def providers_changed(provider_ids):
+    """Search entries are rewritten in the change's transaction; the in-memory facets once it commits."""
+    search.index_providers(provider_ids)
+    index = facets.loaded_index()
+    if index is not None:
+        provider_ids = list(provider_ids)
+        transaction.on_commit(lambda: index.refresh_providers(provider_ids))
+
+
+def providers_changed_after_commit(provider_ids):
+    provider_ids = list(provider_ids)
+    if provider_ids:
+        transaction.on_commit(lambda: providers_changed(provider_ids))
+
+
+# -----------------------------
+# PROVIDER RATING AGGREGATES
+# -----------------------------
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, **kwargs):
+    """Runs inside Review.save's transaction."""
+    reviews.record_saved(instance)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    reviews.record_deleted(instance)
@@ -1,3 +1,663 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Service as OfferedService, ServiceProvider, User
+from HomeConnect.admin_utils import EstimatedCountPaginator
+from notifications.models import Notification, Reminder
+from .forms import MultiProviderRequestForm
+from .models import RequestChange, RequestOffer, Review, SearchEntry, SearchGram, Service, ServiceRequest
+from . import changefeed, dispatch, facets, matching, reviews, search, transitions
+
+
+class ServiceRequestAdminQueryTests(TestCase):
+    """Changelist pages must cost the same number of queries at any table size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        cls.service = Service.objects.create(name='Plumbing')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_requests(self, count):
+        start = ServiceRequest.objects.count()
+        for i in range(start, start + count):
+            homeowner = User.objects.create(username=f'home{i}')
+            provider = User.objects.create(username=f'pro{i}', user_type='service_provider').provider_profile
+            ServiceRequest.objects.create(homeowner=homeowner, provider=provider, service=self.service)
+
+    def assertChangelistQueries(self, url, expected):
+        for rows in (2, 20):
+            self.add_requests(rows)
+            with self.assertNumQueries(expected):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_changelist(self):
+        # session, user, count, page (homeowner/provider/service joined), date hierarchy (2)
+        self.assertChangelistQueries('/admin/services/servicerequest/', 7)
+
+    def test_filtered_changelist(self):
+        self.assertChangelistQueries('/admin/services/servicerequest/?status__exact=pending', 6)
+
+    def test_change_form_uses_autocomplete(self):
+        self.add_requests(3)
+        response = self.client.get(f'/admin/services/servicerequest/{ServiceRequest.objects.first().pk}/change/')
+        # Autocomplete widgets render only the selected option, not every user
+        self.assertContains(response, 'class="admin-autocomplete"', count=3)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        self.service = Service.objects.create(name='Plumbing')
+        homeowner = User.objects.create(username='home')
+        provider = User.objects.create(username='pro', user_type='service_provider').provider_profile
+        for _ in range(8):
+            ServiceRequest.objects.create(homeowner=homeowner, provider=provider, service=self.service)
+
+    def test_small_tables_are_counted_exactly(self):
+        self.assertEqual(EstimatedCountPaginator(ServiceRequest.objects.all(), 5).count, 8)
+
+    @mock.patch('HomeConnect.admin_utils.FILTERED_COUNT_CAP', 5)
+    def test_large_tables_use_the_estimate(self):
+        ServiceRequest.objects.filter(pk=ServiceRequest.objects.order_by('pk').first().pk).delete()
+        # SQLite estimates from the highest rowid, so deleted rows still count
+        self.assertEqual(EstimatedCountPaginator(ServiceRequest.objects.all(), 5).count, 8)
+
+    @mock.patch('HomeConnect.admin_utils.FILTERED_COUNT_CAP', 5)
+    def test_filtered_counts_are_capped(self):
+        queryset = ServiceRequest.objects.filter(status=ServiceRequest.STATUS_PENDING)
+        self.assertEqual(EstimatedCountPaginator(queryset, 5).count, 5)
+
+
+class ReviewAggregateTests(TestCase):
+    """Provider rating aggregates must always equal what rebuild() computes from the reviews."""
+
+    def setUp(self):
+        self.service = Service.objects.create(name='Plumbing')
+        self.homeowner = User.objects.create(username='home')
+        self.providers = [
+            User.objects.create(username=f'pro{i}', user_type='service_provider').provider_profile for i in range(2)
+        ]
+
+    def completed_request(self, provider):
+        return ServiceRequest.objects.create(homeowner=self.homeowner, provider=provider, service=self.service,
+                                             status=ServiceRequest.STATUS_COMPLETED)
+
+    def review(self, rating, provider=None):
+        sr = self.completed_request(provider or self.providers[0])
+        return Review.objects.create(service_request=sr, provider=sr.provider, homeowner=self.homeowner, rating=rating)
+
+    def aggregates(self):
+        return list(ServiceProvider.objects.order_by('pk').values_list('rating_sum', 'rating_count', 'rating_avg'))
+
+    def assertAggregates(self, *expected):
+        incremental = self.aggregates()
+        self.assertEqual(incremental, list(expected))
+        reviews.rebuild()
+        self.assertEqual(self.aggregates(), incremental)
+
+    def test_create(self):
+        self.review(5)
+        self.review(2)
+        self.assertAggregates((7, 2, 3.5), (0, 0, 0.0))
+
+    def test_edit(self):
+        review = self.review(5)
+        self.review(3)
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 1
+        review.save()
+        self.assertAggregates((4, 2, 2.0), (0, 0, 0.0))
+
+    def test_edits_through_stale_instances_do_not_drift(self):
+        review = self.review(5)
+        first, second = Review.objects.get(pk=review.pk), Review.objects.get(pk=review.pk)
+        first.rating = 1
+        first.save()
+        # ``second`` still thinks the aggregates hold a 5
+        second.rating = 3
+        second.save()
+        self.assertAggregates((3, 1, 3.0), (0, 0, 0.0))
+
+        first.delete()
+        second.delete()
+        self.assertAggregates((0, 0, 0.0), (0, 0, 0.0))
+
+    def test_provider_change(self):
+        review = self.review(4)
+        review.provider = self.providers[1]
+        review.save()
+        self.assertAggregates((0, 0, 0.0), (4, 1, 4.0))
+
+    def test_delete(self):
+        self.review(5)
+        self.review(3).delete()
+        self.assertAggregates((5, 1, 5.0), (0, 0, 0.0))
+        Review.objects.all().delete()
+        self.assertAggregates((0, 0, 0.0), (0, 0, 0.0))
+
+    def test_request_delete_cascades(self):
+        self.review(2, self.providers[1])
+        ServiceRequest.objects.filter(pk=self.review(4, self.providers[1]).service_request_id).delete()
+        self.assertAggregates((0, 0, 0.0), (2, 1, 2.0))
+
+    def test_double_submission_edits_the_first_review(self):
+        sr = self.completed_request(self.providers[0])
+        self.client.force_login(self.homeowner)
+        Review.objects.create(service_request=sr, provider=sr.provider, homeowner=self.homeowner, rating=5)
+        # The view looked for an existing review before the other submission saved one
+        with mock.patch.object(QuerySet, 'first', return_value=None):
+            response = self.client.post(f'/services/requests/{sr.pk}/review/', {'rating': 3, 'comment': ''})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Review.objects.get().rating, 3)
+        self.assertAggregates((3, 1, 3.0), (0, 0, 0.0))
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=60)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.service = Service.objects.create(name='Plumbing')
+        self.homeowner = User.objects.create(username='home')
+        self.providers = [
+            User.objects.create(username=f'pro{i}', user_type='service_provider').provider_profile for i in range(2)
+        ]
+
+    def settle(self):
+        RequestChange.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+
+    def ops(self, provider, cursor=0):
+        entries, _, _ = changefeed.since(provider.pk, cursor)
+        return [(e.request_id, e.op) for e in entries]
+
+    def test_reassignment_tells_the_old_provider(self):
+        sr = ServiceRequest.objects.create(homeowner=self.homeowner, provider=self.providers[0], service=self.service)
+        sr.provider = self.providers[1]
+        sr.save()
+        self.settle()
+        self.assertEqual(self.ops(self.providers[0]), [(sr.pk, RequestChange.OP_INSERT), (sr.pk, RequestChange.OP_DELETE)])
+        self.assertEqual(self.ops(self.providers[1]), [(sr.pk, RequestChange.OP_UPDATE)])
+
+    def test_settle_window_hides_fresh_entries(self):
+        ServiceRequest.objects.create(homeowner=self.homeowner, provider=self.providers[0], service=self.service)
+        self.assertEqual(self.ops(self.providers[0]), [])
+        self.assertEqual(changefeed.head(), 0)
+        self.settle()
+        self.assertEqual(len(self.ops(self.providers[0])), 1)
+        self.assertEqual(changefeed.head(), RequestChange.objects.get().pk)
+
+    def test_cursor_behind_pruned_entries_expires(self):
+        for _ in range(3):
+            ServiceRequest.objects.create(homeowner=self.homeowner, provider=self.providers[0], service=self.service)
+        first, second, third = RequestChange.objects.order_by('pk').values_list('pk', flat=True)
+        RequestChange.objects.filter(pk__in=[first, second]).update(created_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(changefeed.prune(), 2)
+
+        with self.assertRaises(changefeed.CursorExpired):
+            changefeed.since(self.providers[0].pk, first)
+        # Nothing after this cursor was pruned
+        changefeed.since(self.providers[0].pk, second)
+
+        self.client.force_login(self.providers[0].user)
+        response = self.client.get('/services/provider/dashboard/changes/', {'cursor': first})
+        self.assertEqual(response.json(), {'status': 'reset'})
+
+    def test_collapse_keeps_each_requests_last_entry_in_feed_order(self):
+        a = ServiceRequest.objects.create(homeowner=self.homeowner, provider=self.providers[0], service=self.service)
+        b = ServiceRequest.objects.create(homeowner=self.homeowner, provider=self.providers[0], service=self.service)
+        a.save()
+        b_pk = b.pk
+        b.delete()
+        a.save()
+        self.settle()
+        entries, _, _ = changefeed.since(self.providers[0].pk, 0)
+        # a changed last, so it comes after b although it was created first
+        self.assertEqual([(e.request_id, e.op) for e in changefeed.collapse(entries)],
+                         [(b_pk, RequestChange.OP_DELETE), (a.pk, RequestChange.OP_UPDATE)])
+
+
+class ProviderFacetTests(TestCase):
+    def setUp(self):
+        self.plumbing = OfferedService.objects.create(name='Plumbing')
+        self.wiring = OfferedService.objects.create(name='Wiring')
+        self.providers = []
+        for i, (city, offered) in enumerate([
+            ('Nairobi', [self.plumbing, self.wiring]),
+            ('Nairobi', [self.plumbing]),
+            ('Mombasa', [self.plumbing]),
+        ]):
+            provider = User.objects.create(username=f'pro{i}', user_type='service_provider', city=city).provider_profile
+            provider.services.set(offered)
+            self.providers.append(provider)
+        # Index updates run on commit, which TestCase never reaches
+        facets.reset()
+        self.addCleanup(facets.reset)
+
+    def listed(self, **params):
+        response = self.client.get('/services/providers/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, sorted(p.pk for p in response.context['providers'])
+
+    def test_services_combine_with_and_and_city_narrows(self):
+        p0, p1, p2 = (p.pk for p in self.providers)
+        self.assertEqual(self.listed(service=[self.plumbing.pk])[1], [p0, p1, p2])
+        self.assertEqual(self.listed(service=[self.plumbing.pk, self.wiring.pk])[1], [p0])
+        self.assertEqual(self.listed(service=[self.plumbing.pk], city='nairobi')[1], [p0, p1])
+
+    def test_counts(self):
+        services, cities = facets.get_index().counts([self.plumbing.pk], 'Nairobi')
+        self.assertEqual(services, {self.plumbing.pk: 2, self.wiring.pk: 1})
+        # City counts ignore the selected city
+        self.assertEqual(cities, {'nairobi': 2, 'mombasa': 1})
+
+        response, _ = self.listed(service=[self.plumbing.pk], city='Nairobi')
+        self.assertEqual([(f['name'], f['count']) for f in response.context['facet_cities']],
+                         [('Nairobi', 2), ('Mombasa', 1)])
+
+    def test_non_ascii_digits_are_ignored(self):
+        # '²'.isdigit() is True but int('²') raises
+        _, listed = self.listed(service=['\u00b2', 'x', str(self.wiring.pk)])
+        self.assertEqual(listed, [self.providers[0].pk])
+
+
+class AsyncDashboardTests(TestCase):
+    def setUp(self):
+        self.homeowner = User.objects.create(username='homeowner', user_type='homeowner')
+        self.provider = User.objects.create(username='pro', user_type='service_provider').provider_profile
+        self.service = Service.objects.create(name='Plumbing')
+        self.assigned = ServiceRequest.objects.create(homeowner=self.homeowner, provider=self.provider,
+                                                      service=self.service)
+        broadcast = ServiceRequest.objects.create(homeowner=self.homeowner, service=self.service, broadcast=True)
+        self.offer = RequestOffer.objects.create(service_request=broadcast, provider=self.provider)
+
+    async def test_homeowner_dashboard(self):
+        await self.async_client.aforce_login(self.homeowner)
+        response = await self.async_client.get('/services/homeowner/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['requests']), 2)
+
+        await self.async_client.aforce_login(await User.objects.aget(username='pro'))
+        response = await self.async_client.get('/services/homeowner/dashboard/')
+        self.assertEqual(response.status_code, 302)
+
+    async def test_provider_dashboards(self):
+        await self.async_client.aforce_login(await User.objects.aget(username='pro'))
+        for url in ('/services/provider/dashboard/', '/accounts/provider/dashboard/'):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([r.pk for r in response.context['requests']], [self.assigned.pk])
+            self.assertEqual([o.pk for o in response.context['offers']], [self.offer.pk])
+
+        await self.async_client.aforce_login(self.homeowner)
+        response = await self.async_client.get('/services/provider/dashboard/')
+        self.assertEqual(response.status_code, 403)
+
+
+class TransitionTests(TestCase):
+    def setUp(self):
+        self.homeowner = User.objects.create(username='homeowner', email='home@example.com')
+        self.provider = User.objects.create(username='pro', user_type='service_provider').provider_profile
+        self.service = Service.objects.create(name='Plumbing')
+
+    def make(self, status=ServiceRequest.STATUS_PENDING, provider=True):
+        return ServiceRequest.objects.create(homeowner=self.homeowner, service=self.service, status=status,
+                                             provider=self.provider if provider else None)
+
+    def test_allowed_transition_records_and_notifies(self):
+        sr = self.make()
+        transitions.transition(sr, ServiceRequest.STATUS_ACCEPTED)
+        sr.refresh_from_db()
+        self.assertEqual(sr.status, ServiceRequest.STATUS_ACCEPTED)
+        self.assertTrue(RequestChange.objects.filter(request_id=sr.pk).exists())
+        self.assertEqual(self.homeowner.notifications.count(), 1)
+
+    def test_disallowed_transitions(self):
+        with self.assertRaises(transitions.InvalidTransition):
+            transitions.transition(self.make(ServiceRequest.STATUS_COMPLETED), ServiceRequest.STATUS_PENDING)
+        with self.assertRaises(transitions.InvalidTransition):
+            transitions.transition(self.make(ServiceRequest.STATUS_PENDING), ServiceRequest.STATUS_COMPLETED)
+        # Broadcast requests are only accepted through an offer
+        with self.assertRaises(transitions.InvalidTransition):
+            transitions.transition(self.make(provider=False), ServiceRequest.STATUS_ACCEPTED)
+
+    def test_stale_instance_loses(self):
+        sr = self.make()
+        ServiceRequest.objects.filter(pk=sr.pk).update(status=ServiceRequest.STATUS_CANCELLED)
+        with self.assertRaises(transitions.TransitionConflict):
+            transitions.transition(sr, ServiceRequest.STATUS_ACCEPTED)
+        self.assertEqual(sr.status, ServiceRequest.STATUS_CANCELLED)
+        self.assertFalse(self.homeowner.notifications.exists())
+
+    def test_bulk_reports_rows_changed_between_read_and_update(self):
+        moved, kept, done = self.make(), self.make(), self.make(ServiceRequest.STATUS_COMPLETED)
+        real = transitions.can_transition
+
+        def cancel_first_then_check(current, target):
+            # Another writer cancels ``moved`` after bulk_transition read its status
+            ServiceRequest.objects.filter(pk=moved.pk).update(status=ServiceRequest.STATUS_CANCELLED)
+            return real(current, target)
+
+        with mock.patch.object(transitions, 'can_transition', side_effect=cancel_first_then_check):
+            result = transitions.bulk_transition(ServiceRequest.objects.all(), ServiceRequest.STATUS_ACCEPTED)
+
+        self.assertEqual(result.updated, [kept.pk])
+        self.assertEqual(result.invalid, {done.pk: ServiceRequest.STATUS_COMPLETED})
+        self.assertEqual(result.lost, {moved.pk: ServiceRequest.STATUS_CANCELLED})
+        self.assertEqual(ServiceRequest.objects.get(pk=moved.pk).status, ServiceRequest.STATUS_CANCELLED)
+
+    def test_admin_action_messages(self):
+        admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        pending, completed = self.make(), self.make(ServiceRequest.STATUS_COMPLETED)
+
+        response = self.client.post('/admin/services/servicerequest/', {
+            'action': 'mark_as_cancelled', '_selected_action': [pending.pk, completed.pk],
+        }, follow=True)
+        self.assertEqual([str(m) for m in response.context['messages']], [
+            "1 request(s) marked as Cancelled.",
+            f"Not allowed to move to Cancelled: #{completed.pk} (completed).",
+        ])
+
+        raced = self.make()
+        with mock.patch.object(transitions, 'can_transition', side_effect=lambda current, target: (
+                ServiceRequest.objects.filter(pk=raced.pk).delete() or True)):
+            response = self.client.post('/admin/services/servicerequest/', {
+                'action': 'mark_as_accepted', '_selected_action': [raced.pk],
+            }, follow=True)
+        self.assertEqual([str(m) for m in response.context['messages']], [
+            f"Changed by someone else before the update, left alone: #{raced.pk} (deleted).",
+        ])
+
+
+class MatchingTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(matching, '_snapshot', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = Service.objects.create(name='Plumbing')
+        self.offered = OfferedService.objects.create(name='plumbing')
+        self.providers = [self.provider(f'pro{i}', city, years)
+                          for i, (city, years) in enumerate([('Mombasa', 20), ('Nairobi', 2), ('Nairobi', 8)])]
+        self.providers.append(self.provider('roofer', 'Nairobi', 30, offers=False))
+        self.client.force_login(User.objects.create(username='homeowner', city='Nairobi'))
+
+    def provider(self, username, city, years, offers=True):
+        provider = User.objects.create(username=username, user_type='service_provider', city=city).provider_profile
+        provider.experience_years = years
+        provider.save()
+        if offers:
+            provider.services.add(self.offered)
+        return provider
+
+    def test_top_k_ranks_service_then_city_then_experience(self):
+        snapshot = matching.get_snapshot()
+        ranked = [pk for pk, _ in snapshot.top_k('Plumbing', 'nairobi', k=10)]
+        self.assertEqual(ranked, [self.providers[2].pk, self.providers[1].pk, self.providers[0].pk])
+        self.assertEqual([pk for pk, _ in snapshot.top_k('Plumbing', 'Nairobi', k=1)], [self.providers[2].pk])
+        # Without the service requirement the experienced roofer ranks on the other signals
+        self.assertIn(self.providers[3].pk, [pk for pk, _ in snapshot.top_k('Plumbing', require_service=False)])
+        self.assertEqual(snapshot.top_k('Plastering'), [])
+
+    def test_recommended_providers_validates_its_parameters(self):
+        for params, status in (({}, 400), ({'service': 'abc'}, 400), ({'service': '²'}, 400),
+                               ({'service': self.service.pk + 100}, 404),
+                               ({'service': self.service.pk, 'k': 'many'}, 400)):
+            self.assertEqual(self.client.get('/services/providers/recommended/', params).status_code, status)
+
+        data = self.client.get('/services/providers/recommended/', {'service': self.service.pk, 'k': 2}).json()
+        self.assertEqual([p['id'] for p in data['providers']], [self.providers[2].pk, self.providers[1].pk])
+
+    def test_stale_snapshot_is_served_while_one_thread_rebuilds(self):
+        stale = matching.get_snapshot()
+        stale.built_at -= 3600
+        newcomer = self.provider('newcomer', 'Nairobi', 1)
+
+        threads = []
+        with mock.patch.object(matching.threading, 'Thread',
+                               lambda target, **kwargs: mock.Mock(start=lambda: threads.append(target))):
+            self.assertIs(matching.get_snapshot(), stale)
+            self.assertIs(matching.get_snapshot(), stale)
+        self.assertEqual(len(threads), 1)
+
+        # Run the rebuild here; the test's connection must stay open
+        with mock.patch.object(matching, 'connections'):
+            threads[0]()
+        fresh = matching.get_snapshot()
+        self.assertIsNot(fresh, stale)
+        self.assertIn(newcomer.pk, fresh.ids.tolist())
+        self.assertFalse(matching._refreshing.locked())
+
+
+@override_settings(DISPATCH_BROADCAST_SIZE=2)
+class DispatchTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(matching, '_snapshot', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.homeowner = User.objects.create(username='homeowner', user_type='homeowner', city='Nairobi')
+        self.service = Service.objects.create(name='Plumbing')
+        offered = OfferedService.objects.create(name='Plumbing')
+        self.providers = []
+        for i, years in enumerate([10, 5, 1]):
+            user = User.objects.create(username=f'pro{i}', email=f'pro{i}@example.com', user_type='service_provider',
+                                       city='Nairobi')
+            provider = user.provider_profile
+            provider.experience_years = years
+            provider.save()
+            provider.services.add(offered)
+            self.providers.append(provider)
+        self.request = ServiceRequest.objects.create(homeowner=self.homeowner, service=self.service, broadcast=True)
+
+    def offered_to(self):
+        return sorted(self.request.offers.open().values_list('provider_id', flat=True))
+
+    def test_broadcast_offers_the_best_matches_and_notifies_them(self):
+        offers = dispatch.broadcast(self.request)
+        self.assertEqual(self.offered_to(), sorted(p.pk for p in self.providers[:2]))
+        self.assertEqual(sorted(n.to_email for n in Notification.objects.all()),
+                         ['pro0@example.com', 'pro1@example.com'])
+        self.assertEqual(len(offers), 2)
+
+    def test_broadcast_without_a_match_writes_nothing(self):
+        plastering = ServiceRequest.objects.create(homeowner=self.homeowner, broadcast=True,
+                                                   service=Service.objects.create(name='Plastering'))
+        with self.assertRaises(dispatch.NoMatchingProviders):
+            dispatch.broadcast(plastering)
+        self.assertFalse(plastering.offers.exists())
+
+    def test_dashboard_broadcast_without_a_match_saves_no_request(self):
+        self.client.force_login(self.homeowner)
+        plastering = Service.objects.create(name='Plastering')
+        response = self.client.post('/services/homeowner/dashboard/', {'service': plastering.pk, 'broadcast': 'on'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('broadcast', response.context['form'].errors)
+        self.assertFalse(ServiceRequest.objects.filter(service=plastering).exists())
+
+        response = self.client.post('/services/homeowner/dashboard/', {'service': self.service.pk, 'broadcast': 'on'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(RequestOffer.objects.exclude(service_request=self.request).count(), 2)
+
+    def test_only_one_offer_can_win(self):
+        first, second = dispatch.broadcast(self.request)
+        dispatch.accept_offer(second)
+        self.request.refresh_from_db()
+        self.assertEqual((self.request.provider_id, self.request.status),
+                         (second.provider_id, ServiceRequest.STATUS_ACCEPTED))
+        with self.assertRaises(dispatch.OfferUnavailable):
+            dispatch.accept_offer(first)
+        self.assertEqual(RequestOffer.objects.get(pk=first.pk).status, RequestOffer.STATUS_WITHDRAWN)
+
+    def test_offer_still_open_when_the_request_was_taken(self):
+        first, _ = dispatch.broadcast(self.request)
+        # Another writer assigned the request without going through the offers
+        ServiceRequest.objects.filter(pk=self.request.pk).update(provider=self.providers[2],
+                                                                 status=ServiceRequest.STATUS_ACCEPTED)
+        with self.assertRaisesMessage(dispatch.OfferUnavailable, "already been taken"):
+            dispatch.accept_offer(first)
+        self.assertEqual(RequestOffer.objects.get(pk=first.pk).status, RequestOffer.STATUS_WITHDRAWN)
+
+    def test_declining_every_offer_asks_the_next_providers(self):
+        first, second = dispatch.broadcast(self.request)
+        dispatch.decline_offer(first)
+        self.assertEqual(self.offered_to(), [second.provider_id])
+        dispatch.decline_offer(second)
+        self.assertEqual(self.offered_to(), [self.providers[2].pk])
+
+        # Nobody is left; the request stays pending
+        dispatch.decline_offer(self.request.offers.open().get())
+        self.assertEqual(self.offered_to(), [])
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, ServiceRequest.STATUS_PENDING)
+        with self.assertRaises(dispatch.OfferUnavailable):
+            dispatch.decline_offer(first)
+
+    def test_withdraw_offers(self):
+        first, _ = dispatch.broadcast(self.request)
+        dispatch.decline_offer(first)
+        # Only the offer still open is withdrawn; the decline stands
+        self.assertEqual(dispatch.withdraw_offers([self.request.pk]), 1)
+        self.assertEqual(self.offered_to(), [])
+        self.assertEqual(RequestOffer.objects.get(pk=first.pk).status, RequestOffer.STATUS_DECLINED)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.plumbing = Service.objects.create(name='Plumbing', description='Leaking pipes and taps')
+        user = User.objects.create(username='sparky', user_type='service_provider')
+        self.electrician = user.provider_profile
+        self.electrician.company_name = 'Bright Electrician Co'
+        self.electrician.save()
+
+    def found(self, query):
+        return [(kind, pk) for kind, pk, _ in search.search(query)]
+
+    def test_typos_still_match(self):
+        self.assertEqual(self.found('plumbr'), [(SearchEntry.KIND_SERVICE, self.plumbing.pk)])
+        self.assertEqual(self.found('electrition'), [(SearchEntry.KIND_PROVIDER, self.electrician.pk)])
+        self.assertEqual(self.found('zzz'), [])
+
+    def test_long_queries_are_capped(self):
+        query = ' '.join(f'word{i}' for i in range(50))
+        self.assertEqual(len(search.query_words(query)), search.MAX_QUERY_WORDS)
+        self.assertEqual(search.query_words('plumbr plumbr ' + 'x' * 500), ['plumbr', 'x' * search.MAX_QUERY_WORD_LENGTH])
+        # One GROUP BY per looked-up word, plus the postings
+        with self.assertNumQueries(search.MAX_QUERY_WORDS + 1):
+            search.search('plumbr ' + query)
+
+    def test_reindex_writes_the_difference_and_drops_orphans(self):
+        self.assertTrue(SearchGram.objects.filter(word='leaking').exists())
+        self.plumbing.description = 'Dripping pipes'
+        self.plumbing.save()
+
+        words = set(SearchEntry.objects.filter(kind=SearchEntry.KIND_SERVICE, object_id=self.plumbing.pk)
+                    .values_list('word', flat=True))
+        self.assertEqual(words, {'plumbing', 'dripping', 'pipes'})
+        self.assertFalse(SearchGram.objects.filter(word__in=['leaking', 'taps']).exists())
+        self.assertEqual(self.found('driping'), [(SearchEntry.KIND_SERVICE, self.plumbing.pk)])
+
+        self.plumbing.delete()
+        self.assertFalse(SearchGram.objects.filter(word='dripping').exists())
+
+    def test_rebuild_search_index(self):
+        SearchEntry.objects.all().delete()
+        SearchGram.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn("Indexed 2 document(s)", out.getvalue())
+        self.assertEqual(self.found('plumbr'), [(SearchEntry.KIND_SERVICE, self.plumbing.pk)])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.homeowner = User.objects.create(username='homeowner', email='home@example.com')
+        self.provider = User.objects.create(username='pro', user_type='service_provider').provider_profile
+        ServiceRequest.objects.create(homeowner=self.homeowner, provider=self.provider,
+                                      service=Service.objects.create(name='Plumbing'),
+                                      description='=HYPERLINK("http://evil.example","click")')
+
+    def export(self, user, **params):
+        self.client.force_login(user)
+        response = self.client.get('/services/requests/export/', params)
+        if response.status_code != 200:
+            return response, None
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_cells_that_look_like_formulas_are_neutralised(self):
+        _, body = self.export(self.homeowner)
+        self.assertIn('home@example.com', body)
+        self.assertIn('"\'=HYPERLINK(""http://evil.example"",""click"")"', body)
+
+        _, body = self.export(self.homeowner, format='jsonl')
+        self.assertEqual(json.loads(body)['description'], '=HYPERLINK("http://evil.example","click")')
+
+    def test_providers_do_not_get_homeowner_contact_details(self):
+        _, body = self.export(self.provider.user)
+        header, row = body.splitlines()
+        self.assertNotIn('homeowner_email', header.split(','))
+        self.assertIn('homeowner', header.split(','))
+        self.assertNotIn('home@example.com', row)
+
+    def test_since_is_validated(self):
+        for since in ('2025-02-30', 'yesterday'):
+            response, _ = self.export(self.homeowner, since=since)
+            self.assertEqual(response.status_code, 400)
+        _, body = self.export(self.homeowner, since='2999-01-01')
+        self.assertEqual(len(body.splitlines()), 1)
+
+
+class MultiProviderRequestTests(TestCase):
+    def setUp(self):
+        self.homeowner = User.objects.create(username='homeowner', email='home@example.com')
+        self.service = Service.objects.create(name='Plumbing')
+        self.providers = [
+            User.objects.create(username=f'pro{i}', email=f'pro{i}@example.com',
+                                user_type='service_provider').provider_profile
+            for i in range(MultiProviderRequestForm.MAX_PROVIDERS + 1)
+        ]
+        self.client.force_login(self.homeowner)
+
+    def submit(self, providers):
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/services/requests/multi/', {
+                'service': self.service.pk, 'description': 'Leaking tap', 'providers': [p.pk for p in providers],
+            })
+        return response, len(queries)
+
+    def test_at_most_max_providers(self):
+        response, _ = self.submit(self.providers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('providers', response.context['form'].errors)
+        self.assertFalse(ServiceRequest.objects.exists())
+
+        response, _ = self.submit(self.providers[:MultiProviderRequestForm.MAX_PROVIDERS])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ServiceRequest.objects.count(), MultiProviderRequestForm.MAX_PROVIDERS)
+
+    def test_query_count_does_not_grow_with_the_providers(self):
+        _, few = self.submit(self.providers[:2])
+        _, many = self.submit(self.providers[:MultiProviderRequestForm.MAX_PROVIDERS])
+        self.assertEqual(few, many)
+
+    def test_feed_notifications_and_reminders_are_written(self):
+        chosen = self.providers[:3]
+        self.submit(chosen)
+        requests = ServiceRequest.objects.filter(homeowner=self.homeowner)
+        self.assertEqual(sorted(requests.values_list('provider_id', flat=True)), sorted(p.pk for p in chosen))
+
+        ids = sorted(requests.values_list('pk', flat=True))
+        self.assertEqual(sorted(RequestChange.objects.filter(op=RequestChange.OP_INSERT)
+                                .values_list('request_id', flat=True)), ids)
+        self.assertEqual(sorted(Notification.objects.filter(kind=Notification.KIND_REQUEST_NEW)
+                                .values_list('to_email', flat=True)), [f'pro{i}@example.com' for i in range(3)])
+        self.assertEqual(sorted(Reminder.objects.filter(kind=Reminder.KIND_REQUEST_PENDING)
+                                .values_list('service_request_id', flat=True)), ids)
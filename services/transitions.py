@@ -0,0 +1,130 @@
+"""
+ServiceRequest status transitions.
+
+Every status change is a conditional ``UPDATE ... SET status = <new> WHERE
+status = <expected>`` so two concurrent actions on the same request (say an
+accept and a cancel) cannot both win: the second one matches zero rows and
+is reported as having lost the race instead of silently overwriting.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from notifications import outbox
+from . import changefeed
+from .dispatch import withdraw_offers
+from .models import ServiceRequest
+
+# status -> statuses it may move to
+TRANSITIONS = {
+    ServiceRequest.STATUS_PENDING: {ServiceRequest.STATUS_ACCEPTED, ServiceRequest.STATUS_CANCELLED},
+    ServiceRequest.STATUS_ACCEPTED: {ServiceRequest.STATUS_COMPLETED, ServiceRequest.STATUS_CANCELLED},
+    ServiceRequest.STATUS_COMPLETED: set(),
+    # Staff can reopen a cancelled request
+    ServiceRequest.STATUS_CANCELLED: {ServiceRequest.STATUS_PENDING},
+}
+
+# Provider-facing action names
+ACTIONS = {
+    'accept': ServiceRequest.STATUS_ACCEPTED,
+    'complete': ServiceRequest.STATUS_COMPLETED,
+    'cancel': ServiceRequest.STATUS_CANCELLED,
+}
+
+# updated: pks moved to the target status
+# invalid: {pk: status} for rows whose status cannot move to the target
+# lost: {pk: status} for rows another writer changed between read and update
+TransitionResult = namedtuple('TransitionResult', 'updated invalid lost')
+
+
+class InvalidTransition(Exception):
+    """The request's current status cannot move to the requested one."""
+
+    def __init__(self, current, target):
+        self.current, self.target = current, target
+        super().__init__(f"Cannot move a {current} request to {target}.")
+
+
+class TransitionConflict(Exception):
+    """Someone else changed the request's status first."""
+
+    def __init__(self, current, target):
+        self.current, self.target = current, target
+        super().__init__(f"The request was changed to {current} before it could be moved to {target}.")
+
+
+def can_transition(current, target):
+    return target in TRANSITIONS.get(current, ())
+
+
+def sources(target):
+    """Statuses that may move to ``target``."""
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+def transition(service_request, target, expected=None):
+    """
+    Move one request from ``expected`` (default: its in-memory status) to
+    ``target``.  Raises InvalidTransition or TransitionConflict; on success
+    the instance's status is updated in place.
+    """
+    expected = expected or service_request.status
+    if not can_transition(expected, target):
+        raise InvalidTransition(expected, target)
+    if target == ServiceRequest.STATUS_ACCEPTED and service_request.provider_id is None:
+        # Broadcast requests are accepted through their offers (services.dispatch)
+        raise InvalidTransition('unassigned', target)
+
+    with transaction.atomic():
+        won = ServiceRequest.objects.filter(pk=service_request.pk, status=expected).update(status=target, updated_at=timezone.now())
+        if won:
+            changefeed.record([service_request.pk])
+            if expected == ServiceRequest.STATUS_PENDING:
+                withdraw_offers([service_request.pk])
+            if target == ServiceRequest.STATUS_ACCEPTED:
+                outbox.notify_request_accepted([service_request.pk])
+    if not won:
+        service_request.refresh_from_db(fields=['status'])
+        raise TransitionConflict(service_request.status, target)
+    service_request.status = target
+    return service_request
+
+
+def bulk_transition(queryset, target):
+    """
+    Move every request in ``queryset`` that is allowed to reach ``target``.
+    Runs one conditional UPDATE per source status, so a row changed by
+    someone else after it was read is left alone and reported in ``lost``.
+    """
+    rows = list(queryset.values_list('pk', 'status', 'provider_id'))
+    current = {pk: status for pk, status, _ in rows}
+    invalid = {pk: status for pk, status in current.items() if not can_transition(status, target)}
+    if target == ServiceRequest.STATUS_ACCEPTED:
+        invalid.update({pk: 'unassigned' for pk, _, provider_id in rows if provider_id is None})
+
+    by_source = {}
+    for pk, status in current.items():
+        if pk not in invalid:
+            by_source.setdefault(status, []).append(pk)
+
+    updated, lost = [], {}
+    with transaction.atomic():
+        for status, pks in by_source.items():
+            won = ServiceRequest.objects.filter(pk__in=pks, status=status).update(status=target, updated_at=timezone.now())
+            if won == len(pks):
+                updated.extend(pks)
+                continue
+            # Some rows moved underneath us; find out which (None = deleted)
+            now = dict(ServiceRequest.objects.filter(pk__in=pks).values_list('pk', 'status'))
+            for pk in pks:
+                if now.get(pk) == target:
+                    updated.append(pk)
+                else:
+                    lost[pk] = now.get(pk)
+        withdraw_offers([pk for pk in by_source.get(ServiceRequest.STATUS_PENDING, ()) if pk not in lost])
+        changefeed.record(updated)
+        if target == ServiceRequest.STATUS_ACCEPTED and updated:
+            outbox.notify_request_accepted(updated)
+
+    return TransitionResult(sorted(updated), invalid, lost)
@@ -8,18 +8,26 @@ urlpatterns = [
     path('', views.homeowner_dashboard, name='dashboard'),
     path('homeowner/dashboard/',views.homeowner_dashboard, name='homeowner_dashboard'),
     path('provider/dashboard/', views.provider_dashboard, name='provider_dashboard'),
+    path('provider/dashboard/changes/', views.provider_dashboard_changes, name='provider_dashboard_changes'),
 
     # PROVIDERS
     path('providers/', views.providers_list, name='providers'),
+    path('search/', views.search_json, name='search'),
+    path('providers/recommended/', views.recommended_providers, name='recommended_providers'),
     path('providers/<int:pk>/', views.provider_detail, name='provider_detail'),
     path('providers/<int:pk>/update/', views.provider_update, name='provider_update'),
     path('providers/<int:pk>/delete/', views.provider_delete, name='provider_delete'),
 
     # REQUESTS (homeowner)
+    path('requests/multi/', views.submit_multi_request, name='submit_multi_request'),
+    path('requests/export/', views.export_requests, name='export_requests'),
     path('requests/<int:pk>/', views.request_detail, name='request_detail'),
     path('requests/<int:pk>/update/', views.update_request, name='update_request'),
     path('requests/<int:pk>/delete/', views.delete_request, name='delete_request'),
+    path('requests/<int:pk>/review/', views.review_request, name='review_request'),
+    path('requests/<int:pk>/review/delete/', views.delete_review, name='delete_review'),
 
     # REQUEST ACTIONS (provider side)
     path('requests/<int:pk>/action/', views.request_action, name='request_action'),
+    path('offers/<int:pk>/action/', views.offer_action, name='offer_action'),
 ]
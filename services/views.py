@@ -2,55 +2,79 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_POST
-from django.http import HttpResponseForbidden, JsonResponse
-
-from .models import ServiceRequest
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
+from django.template.loader import render_to_string
+from django.db import IntegrityError, transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.utils.dateparse import parse_date
+from asgiref.sync import sync_to_async
+
+from .models import ServiceRequest, Service, RequestOffer, Review, SearchEntry
+from accounts.caching import provider_directory_state, provider_page_state
 from accounts.models import ServiceProvider
-from .forms import ServiceRequestForm, ProviderEditForm
+from .forms import MultiProviderRequestForm, ReviewForm, ServiceRequestForm, ProviderEditForm
+from HomeConnect.aio import arender, login_required_async
+from HomeConnect.exports import FORMATS as EXPORT_FORMATS, export_response
+from HomeConnect.http_cache import conditional_page
+from . import changefeed, dispatch, facets, search
+from .exports import PROVIDER_REQUEST_COLUMNS, SERVICE_REQUEST_COLUMNS, service_request_export_queryset
+from .transitions import ACTIONS, TRANSITIONS, InvalidTransition, TransitionConflict, transition
 
-from django.conf import settings
-from django_daraja.mpesa.core import MpesaClient
+from connectmpesa import daraja
 
 
 # ----------------------
 # HOMEOWNER VIEWS
 # ----------------------
 
-@login_required
-def homeowner_dashboard(request):
+def save_and_broadcast(service_request):
+    """Save a broadcast request and offer it out together; no offers means no request."""
+    with transaction.atomic():
+        service_request.save()
+        return dispatch.broadcast(service_request)
+
+
+@login_required_async
+async def homeowner_dashboard(request):
     """Homeowner dashboard: list requests and create new ones"""
     if request.user.user_type != 'homeowner':
         return redirect('accounts:redirect_after_login')
 
     requests_qs = ServiceRequest.objects.filter(
         homeowner=request.user
-    ).select_related('provider', 'service').order_by('-created_at')
+    ).select_related('provider', 'service', 'review').order_by('-created_at')
 
     if request.method == 'POST':
-        form = ServiceRequestForm(request.POST)
-        if form.is_valid():
+        # Building and validating the form query the catalogue and provider ranking
+        form = await sync_to_async(ServiceRequestForm)(request.POST, city=request.user.city, allow_broadcast=True)
+        if await sync_to_async(form.is_valid)():
             service_request = form.save(commit=False)
             service_request.homeowner = request.user
-            service_request.save()
+            if form.cleaned_data['broadcast']:
+                service_request.provider = None
+                service_request.broadcast = True
+                try:
+                    offers = await sync_to_async(save_and_broadcast)(service_request)
+                except dispatch.NoMatchingProviders as e:
+                    form.add_error('broadcast', f"{e} Pick a provider instead.")
+                    return await arender(request, 'services/dashboard.html', {'requests': requests_qs, 'form': form})
+                messages.success(request, f"Request offered to {len(offers)} matching providers.")
+                return redirect('services:homeowner_dashboard')
+            await service_request.asave()
 
             # Optional: initiate STK Push payment
             phone = request.POST.get('phone')
             if phone and hasattr(service_request.service, 'price'):
                 try:
-                    cl = MpesaClient(
-                        consumer_key=settings.MPESA_CONSUMER_KEY,
-                        consumer_secret=settings.MPESA_CONSUMER_SECRET,
-                        environment=settings.MPESA_ENVIRONMENT
-                    )
-                    response = cl.stk_push(
+                    response = await daraja.astk_push(
                         phone_number=phone,
                         amount=service_request.service.price,
                         account_reference=f"SR-{service_request.pk}",
                         transaction_desc=f"Payment for {service_request.service.name}",
-                        callback_url=request.build_absolute_uri('/mpesa/callback/')
+                        callback_url=daraja.build_callback_url(),
                     )
-                    service_request.checkout_request_id = response.json().get('CheckoutRequestID')
-                    service_request.save()
+                    service_request.checkout_request_id = response.get('CheckoutRequestID')
+                    await service_request.asave()
                     messages.success(request, f"Request sent and payment initiated to {service_request.provider.company_name}")
                 except Exception as e:
                     messages.warning(request, f"Request sent but payment failed: {e}")
@@ -59,9 +83,11 @@ def homeowner_dashboard(request):
 
             return redirect('services:homeowner_dashboard')
     else:
-        form = ServiceRequestForm()
+        form = await sync_to_async(ServiceRequestForm)(
+            initial={'service': request.GET.get('service')}, city=request.user.city, allow_broadcast=True,
+        )
 
-    return render(request, 'services/dashboard.html', {'requests': requests_qs, 'form': form})
+    return await arender(request, 'services/dashboard.html', {'requests': requests_qs, 'form': form})
 
 
 @login_required
@@ -71,11 +97,9 @@ def create_service_request(request, provider_pk=None):
         messages.error(request, "Only homeowners can create service requests.")
         return redirect('services:provider_dashboard')
 
-    form = ServiceRequestForm(request.POST or None)
+    form = ServiceRequestForm(request.POST or None, city=request.user.city)
     if provider_pk:
         form.fields['provider'].queryset = ServiceProvider.objects.filter(pk=provider_pk)
-    else:
-        form.fields['provider'].queryset = ServiceProvider.objects.all()
 
     if request.method == 'POST' and form.is_valid():
         service_request = form.save(commit=False)
@@ -87,6 +111,62 @@ def create_service_request(request, provider_pk=None):
     return render(request, 'services/service_request_form.html', {'form': form})
 
 
+@login_required
+def submit_multi_request(request):
+    """Send one job description to several chosen providers"""
+    if request.user.user_type != 'homeowner':
+        messages.error(request, "Only homeowners can create service requests.")
+        return redirect('services:provider_dashboard')
+
+    form = MultiProviderRequestForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        created = dispatch.submit_to_providers(
+            request.user, form.cleaned_data['service'], form.cleaned_data['description'], form.cleaned_data['providers'],
+        )
+        messages.success(request, f"Request sent to {len(created)} providers.")
+        return redirect('services:homeowner_dashboard')
+
+    return render(request, 'services/multi_request_form.html', {'form': form})
+
+
+@login_required
+def review_request(request, pk):
+    """Homeowner rates a completed request, or edits their review of it"""
+    sr = get_object_or_404(ServiceRequest.objects.select_related('provider__user', 'service'), pk=pk, homeowner=request.user)
+    if sr.status != ServiceRequest.STATUS_COMPLETED or sr.provider_id is None:
+        messages.error(request, "Only completed requests can be reviewed.")
+        return redirect('services:homeowner_dashboard')
+
+    review = Review.objects.filter(service_request=sr).first()
+    form = ReviewForm(
+        request.POST or None,
+        instance=review or Review(service_request=sr, provider_id=sr.provider_id, homeowner=request.user),
+    )
+    if request.method == 'POST' and form.is_valid():
+        try:
+            with transaction.atomic():
+                form.save()
+        except IntegrityError:
+            # A concurrent first submission (a double-click) created the review; edit that one
+            form = ReviewForm(request.POST, instance=Review.objects.get(service_request=sr))
+            if form.is_valid():
+                form.save()
+        messages.success(request, "Thanks for your review!")
+        return redirect('services:homeowner_dashboard')
+
+    return render(request, 'services/review_form.html', {'form': form, 'service_request': sr, 'review': review})
+
+
+@login_required
+@require_POST
+def delete_review(request, pk):
+    """Homeowner withdraws their review of a request"""
+    review = get_object_or_404(Review, service_request_id=pk, homeowner=request.user)
+    review.delete()
+    messages.success(request, "Review deleted.")
+    return redirect('services:homeowner_dashboard')
+
+
 @login_required
 def request_detail(request, pk):
     """Homeowner views details of their request"""
@@ -125,21 +205,156 @@ def delete_request(request, pk):
     return JsonResponse({"success": True})
 
 
+@login_required
+def export_requests(request):
+    """
+    Stream the user's requests (received, for providers) as CSV or JSONL.
+    ?format=csv|jsonl&status=&since=YYYY-MM-DD
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("format must be csv or jsonl")
+
+    if request.user.user_type == 'service_provider':
+        requests_qs = ServiceRequest.objects.filter(provider__user=request.user)
+        columns = PROVIDER_REQUEST_COLUMNS
+    else:
+        requests_qs = ServiceRequest.objects.filter(homeowner=request.user)
+        columns = SERVICE_REQUEST_COLUMNS
+    if request.GET.get('status'):
+        requests_qs = requests_qs.filter(status=request.GET['status'])
+    try:
+        since = parse_date(request.GET.get('since') or '')
+    except ValueError:
+        since = None
+    if request.GET.get('since') and since is None:
+        return HttpResponseBadRequest("since must be a valid YYYY-MM-DD date")
+    if since:
+        requests_qs = requests_qs.filter(created_at__date__gte=since)
+
+    return export_response(
+        service_request_export_queryset(requests_qs).order_by('-created_at'),
+        columns, fmt, 'service-requests',
+    )
+
+
 # ----------------------
 # SERVICE PROVIDER VIEWS
 # ----------------------
 
-@login_required
+def ranked(queryset, pks):
+    """``queryset`` limited to ``pks``, in that order."""
+    order = Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(pks)], output_field=IntegerField())
+    return queryset.filter(pk__in=pks).order_by(order)
+
+
+@conditional_page(provider_directory_state)
 def providers_list(request):
-    """List all service providers"""
+    """
+    List service providers (public, HTTP-cacheable).  ?q= ranks fuzzy
+    matches; ?service=<id> (repeatable, all must match) and ?city= filter
+    through the facet bitmaps, which also give the count next to each value.
+    ?sort=rating puts the best-rated first when there is no ?q=.
+    """
     providers = ServiceProvider.objects.select_related('user').prefetch_related('services')
-    return render(request, 'services/providers_list.html', {'providers': providers})
+    query = request.GET.get('q', '').strip()
+    city = request.GET.get('city', '').strip()
+    service_ids = []
+    for sid in request.GET.getlist('service'):
+        try:
+            service_ids.append(int(sid))
+        except ValueError:
+            # '²'.isdigit() is True, so parse rather than pre-check
+            pass
+
+    services, matched = [], None
+    if query:
+        hits = search.search(query, limit=60)
+        matched = [pk for kind, pk, _ in hits if kind == SearchEntry.KIND_PROVIDER][:50]
+        services = ranked(Service.objects.all(), [pk for kind, pk, _ in hits if kind == SearchEntry.KIND_SERVICE][:5])
+
+    index = facets.get_index()
+    within = facets.bitmap_of(matched) if matched is not None else None
+    selected = index.select(service_ids, city, within)
+    if matched is not None:
+        providers = ranked(providers, [pk for pk in matched if selected >> pk & 1])
+    elif service_ids or city:
+        providers = providers.filter(pk__in=facets.members(selected))
+    sort = request.GET.get('sort', '')
+    if sort == 'rating' and matched is None:
+        # Served by accounts_provider_rating_idx; the aggregates are kept by services.reviews
+        providers = providers.order_by('-rating_avg', '-rating_count', 'pk')
+
+    service_counts, city_counts = index.counts(service_ids, city, within)
+    facet_services = sorted(
+        ({'id': sid, 'name': index.service_names.get(sid, ''), 'count': count, 'selected': sid in service_ids}
+         for sid, count in service_counts.items() if count or sid in service_ids),
+        key=lambda f: f['name'].lower(),
+    )
+    facet_cities = sorted(
+        ({'name': index.city_names[key], 'count': count, 'selected': key == facets.city_key(city)}
+         for key, count in city_counts.items() if count),
+        key=lambda f: (-f['count'], f['name']),
+    )
+    return render(request, 'services/providers_list.html', {
+        'providers': providers, 'query': query, 'services': services, 'city': city, 'sort': sort,
+        'facet_services': facet_services, 'facet_cities': facet_cities,
+    })
+
+
+def search_json(request):
+    """Typo-tolerant lookup of services and providers, as JSON (?q=&limit=20)"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'limit must be a number.'}, status=400)
+    hits = search.search(request.GET.get('q', ''), limit=limit)
+    services = Service.objects.in_bulk([pk for kind, pk, _ in hits if kind == SearchEntry.KIND_SERVICE])
+    providers = ServiceProvider.objects.select_related('user').in_bulk(
+        [pk for kind, pk, _ in hits if kind == SearchEntry.KIND_PROVIDER]
+    )
+    results = []
+    for kind, pk, score in hits:
+        obj = (services if kind == SearchEntry.KIND_SERVICE else providers).get(pk)
+        if obj is not None:
+            results.append({'kind': kind, 'id': pk, 'name': str(obj), 'score': round(score, 3)})
+    return JsonResponse({'status': 'ok', 'results': results})
 
 
 @login_required
+def recommended_providers(request):
+    """Best-matching providers for a service, as JSON (?service=<id>&k=10&city=)"""
+    try:
+        service_id = int(request.GET.get('service', ''))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'service must be a number.'}, status=400)
+    service = get_object_or_404(Service, pk=service_id)
+    try:
+        k = min(max(int(request.GET.get('k', 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'k must be a number.'}, status=400)
+    city = request.GET.get('city') or request.user.city
+
+    from .matching import recommend_providers  # loads NumPy; kept off the boot path
+
+    ranked = recommend_providers(service, city=city, k=k)
+    providers = ServiceProvider.objects.select_related('user').in_bulk([pk for pk, _ in ranked])
+    return JsonResponse({'status': 'ok', 'service': service.name, 'providers': [
+        {
+            'id': pk,
+            'name': providers[pk].company_name or providers[pk].user.username,
+            'city': providers[pk].user.city,
+            'experience_years': providers[pk].experience_years,
+            'score': round(score, 3),
+        }
+        for pk, score in ranked if pk in providers
+    ]})
+
+
+@conditional_page(provider_page_state)
 def provider_detail(request, pk):
-    """View provider details and allow homeowners to create requests"""
-    provider = get_object_or_404(ServiceProvider, pk=pk)
+    """View provider details (public, HTTP-cacheable) and allow homeowners to create requests"""
+    provider = get_object_or_404(ServiceProvider.objects.select_related('user'), pk=pk)
     form = ServiceRequestForm()
 
     if request.method == 'POST' and request.user.user_type == 'homeowner':
@@ -152,19 +367,84 @@ def provider_detail(request, pk):
             messages.success(request, "Service request sent successfully!")
             return redirect('services:providers')
 
-    return render(request, 'services/provider_detail.html', {'provider': provider, 'form': form})
+    reviews = provider.reviews.select_related('homeowner').order_by('-created_at')[:10]
+    return render(request, 'services/provider_detail.html', {'provider': provider, 'form': form, 'reviews': reviews})
 
 
-@login_required
-def provider_dashboard(request):
+@login_required_async
+async def provider_dashboard(request):
     """Provider sees all requests assigned to them"""
     if request.user.user_type != "service_provider":
         return HttpResponseForbidden("Access denied")
 
-    provider = request.user.provider_profile
-    requests_qs = ServiceRequest.objects.filter(provider=provider)
+    provider = await ServiceProvider.objects.aget(user=request.user)
+    # Taken before the rows are read, so nothing changed during the read is missed
+    cursor = await sync_to_async(changefeed.head)()
+    requests_qs = await sync_to_async(list)(
+        ServiceRequest.objects.filter(provider=provider).select_related('homeowner', 'service')
+    )
+    offers = await sync_to_async(list)(
+        RequestOffer.objects.inbox(provider).select_related('service_request__homeowner', 'service_request__service')
+    )
 
-    return render(request, "services/provider_dashboard.html", {"provider": provider, "requests": requests_qs})
+    return await arender(request, "services/provider_dashboard.html", {
+        "provider": provider, "requests": requests_qs, "offers": offers, "cursor": cursor,
+    })
+
+
+@login_required
+def provider_dashboard_changes(request):
+    """Incoming-request rows changed after ?cursor=, for the dashboard to patch in place"""
+    if request.user.user_type != "service_provider":
+        return HttpResponseForbidden("Access denied")
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'cursor must be a number.'}, status=400)
+    provider = get_object_or_404(ServiceProvider, user=request.user)
+
+    try:
+        entries, cursor, more = changefeed.since(provider.pk, cursor)
+    except changefeed.CursorExpired:
+        return JsonResponse({'status': 'reset'})
+
+    latest = changefeed.collapse(entries)
+    live = ServiceRequest.objects.filter(
+        pk__in=[e.request_id for e in latest if e.op != e.OP_DELETE], provider=provider,
+    ).select_related('homeowner', 'service').in_bulk()
+
+    changes = []
+    for entry in latest:
+        req = live.get(entry.request_id)
+        changes.append({
+            'id': entry.request_id,
+            'op': entry.op if req else 'delete',
+            'html': render_to_string('services/provider_request_row.html', {'req': req}, request=request) if req else None,
+        })
+    return JsonResponse({'status': 'ok', 'cursor': cursor, 'more': more, 'changes': changes})
+
+
+@login_required
+@require_POST
+def offer_action(request, pk):
+    """Provider accepts or declines a broadcast offer"""
+    if request.user.user_type != "service_provider":
+        return HttpResponseForbidden("Access denied")
+    offer = get_object_or_404(RequestOffer.objects.select_related('service_request'), pk=pk, provider=request.user.provider_profile)
+
+    action = request.POST.get('action')
+    try:
+        if action == 'accept':
+            dispatch.accept_offer(offer)
+            messages.success(request, f"Request {offer.service_request_id} is yours.")
+        elif action == 'decline':
+            dispatch.decline_offer(offer)
+            messages.info(request, f"Offer for request {offer.service_request_id} declined.")
+        else:
+            messages.error(request, "Invalid action.")
+    except dispatch.OfferUnavailable as e:
+        messages.warning(request, str(e))
+    return redirect('services:provider_dashboard')
 
 
 @login_required
@@ -177,19 +457,25 @@ def request_action(request, pk):
     if not (hasattr(request.user, 'provider_profile') and request.user.provider_profile == sr.provider) and not request.user.is_staff:
         return HttpResponseForbidden("Not allowed.")
 
-    action = request.POST.get('action')
-    if action == 'accept':
-        sr.status = ServiceRequest.STATUS_ACCEPTED
-    elif action == 'complete':
-        sr.status = ServiceRequest.STATUS_COMPLETED
-    elif action == 'cancel':
-        sr.status = ServiceRequest.STATUS_CANCELLED
-    else:
+    target = ACTIONS.get(request.POST.get('action'))
+    if target is None:
         messages.error(request, "Invalid action.")
         return redirect('services:provider_dashboard')
 
-    sr.save()
-    messages.success(request, f"Request {sr.id} updated to {sr.status}.")
+    # The status the provider was looking at when they clicked; if it has
+    # changed since, the action is refused rather than overwriting it
+    expected = request.POST.get('expected')
+    if expected not in TRANSITIONS:
+        expected = sr.status
+
+    try:
+        transition(sr, target, expected=expected)
+    except InvalidTransition as e:
+        messages.error(request, f"Request {sr.id}: {e}")
+    except TransitionConflict as e:
+        messages.warning(request, f"Request {sr.id}: {e}")
+    else:
+        messages.success(request, f"Request {sr.id} updated to {sr.status}.")
     return redirect('services:provider_dashboard')
 
 